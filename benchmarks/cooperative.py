@@ -0,0 +1,119 @@
+# coding=utf-8
+
+"""benchmarks.cooperative file.
+
+Measure concurrent redirect throughput in cooperative mode (gevent) at different greenlet counts, optionally
+with logins running meanwhile (bcrypt runs off the hub, so redirect latency should not follow the cost factor).
+Requires gevent; run it against a local Redis: ``python -m benchmarks.cooperative --greenlets 1 10 50 100``.
+"""
+
+from argparse import ArgumentParser
+from random import Random
+from secrets import token_bytes, token_hex
+from time import perf_counter
+
+from gevent import monkey, spawn
+from gevent.event import Event
+from gevent.pool import Pool
+
+monkey.patch_all()  # Before Flask, Redis and the application are imported.
+
+# pylint: disable=wrong-import-position
+from flask import Flask
+
+from shortipy import create_app
+from shortipy.services.auth import insert_user, delete_user
+from shortipy.services.benchmark import BENCHMARK_URL_VALUE, SEED_BATCH_SIZE, _percentiles
+from shortipy.services.url import insert_urls, delete_urls
+
+USERNAME = f'benchmark-{token_hex(8)}'  # A new user (insert_user refuses existing ones).
+PASSWORD = 'Benchmark1234'
+
+
+def run(app: Flask, keys: list[str], greenlets: int, requests: int, logins: int) -> dict:
+    """Run redirect benchmark with the passed number of greenlets.
+
+    :param app: The Flask application instance (cooperative mode).
+    :type app: Flask
+    :param keys: Seeded url keys.
+    :type keys: list[str]
+    :param greenlets: Number of concurrent greenlets.
+    :type greenlets: int
+    :param requests: Number of redirects.
+    :type requests: int
+    :param logins: Number of greenlets logging in meanwhile.
+    :type logins: int
+    :return: Redirects per second and latency percentiles (milliseconds).
+    :rtype: dict
+    """
+    targets = Random(0).choices(keys, k=requests)
+    latencies = []
+    done = Event()
+
+    def redirect(key: str) -> int:
+        start = perf_counter()
+        status = app.test_client().get(f'/{key}').status_code
+        latencies.append(perf_counter() - start)
+        return status
+
+    def login():
+        while not done.is_set():
+            app.test_client().post('/api/auth/', json={'username': USERNAME, 'password': PASSWORD})
+
+    loggers = [spawn(login) for _ in range(logins)]
+    start = perf_counter()
+    statuses = list(Pool(greenlets).imap_unordered(redirect, targets))
+    elapsed = perf_counter() - start
+    done.set()
+    for logger in loggers:
+        logger.join()
+    if any(status != 302 for status in statuses):
+        raise Exception(f'Unexpected responses: {sorted(set(statuses))}')
+    return {'per_second': round(requests / elapsed, 1), **_percentiles(latencies)}
+
+
+def main():
+    """Parse arguments, seed links and run the benchmark for every greenlet count."""
+    parser = ArgumentParser(description='Concurrent redirect throughput in cooperative mode (gevent).')
+    parser.add_argument('--greenlets', type=int, nargs='+', default=[1, 10, 50, 100])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--links', type=int, default=1000)
+    parser.add_argument('--logins', type=int, default=0, help='Greenlets logging in during redirects.')
+    parser.add_argument('--rounds', type=int, default=12, help='Bcrypt cost factor.')
+    parser.add_argument('--max-connections', type=int, default=None, help='Redis pool size (default: 64).')
+    parser.add_argument('--redis-url', default='redis://127.0.0.1:6379/15',
+                        help='Redis database to seed (use a dedicated one).')
+    args = parser.parse_args()
+
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': token_bytes(32),
+        'REDIS_URL': args.redis_url,
+        'COOPERATIVE_MODE': True,
+        'REDIS_MAX_CONNECTIONS': args.max_connections,
+        'BCRYPT_LOG_ROUNDS': args.rounds,
+        'HASH_POOL_QUEUE_SIZE': max(args.logins, 1),
+        'URL_HITS_ENABLED': False
+    })
+    with app.app_context():
+        insert_user(USERNAME, PASSWORD)
+    keys = []
+    try:
+        with app.app_context():
+            for batch in range(0, args.links, SEED_BATCH_SIZE):
+                keys.extend(insert_urls([BENCHMARK_URL_VALUE.format(index=index)
+                                         for index in range(batch, min(batch + SEED_BATCH_SIZE, args.links))]))
+        baseline = None
+        for greenlets in args.greenlets:
+            result = run(app, keys, greenlets, args.requests, args.logins)
+            baseline = baseline or result['per_second']
+            print(f'greenlets={greenlets} redirects/s={result["per_second"]:.1f} '
+                  f'(x{result["per_second"] / baseline:.2f}) p50={result["p50_ms"]}ms p99={result["p99_ms"]}ms')
+    finally:
+        with app.app_context():
+            delete_urls(keys)
+            delete_user(USERNAME)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# coding=utf-8
+
+"""benchmarks.login file.
+
+Measure login throughput (POST /api/auth/) at different bcrypt cost factors.
+Run it against a dedicated Redis database: ``python -m benchmarks.login --rounds 4 8 10 12``.
+"""
+
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from secrets import token_bytes, token_hex
+from time import perf_counter
+
+from shortipy import create_app
+from shortipy.services.auth import insert_user, delete_user
+
+USERNAME = f'benchmark-{token_hex(8)}'  # A new user (insert_user refuses existing ones).
+PASSWORD = 'Benchmark1234'
+
+
+def run(rounds: int, requests: int, concurrency: int, workers: int, redis_url: str) -> float:
+    """Run login benchmark.
+
+    :param rounds: Bcrypt cost factor.
+    :type rounds: int
+    :param requests: Number of logins.
+    :type requests: int
+    :param concurrency: Number of concurrent clients.
+    :type concurrency: int
+    :param workers: Number of hash pool workers.
+    :type workers: int
+    :param redis_url: Redis URL.
+    :type redis_url: str
+    :return: Logins per second.
+    :rtype: float
+    """
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': token_bytes(32),
+        'REDIS_URL': redis_url,
+        'BCRYPT_LOG_ROUNDS': rounds,
+        'HASH_POOL_WORKERS': workers,
+        'HASH_POOL_QUEUE_SIZE': concurrency
+    })
+    with app.app_context():
+        insert_user(USERNAME, PASSWORD)
+    try:
+        def login(_) -> int:
+            return app.test_client().post('/api/auth/', json={'username': USERNAME, 'password': PASSWORD}).status_code
+
+        start = perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            statuses = list(executor.map(login, range(requests)))
+        elapsed = perf_counter() - start
+        if any(status != 200 for status in statuses):
+            raise Exception(f'Unexpected responses: {sorted(set(statuses))}')
+        return requests / elapsed
+    finally:
+        with app.app_context():
+            delete_user(USERNAME)
+
+
+def main():
+    """Parse arguments and run the benchmark for every cost factor."""
+    parser = ArgumentParser(description='Login throughput at different bcrypt cost factors.')
+    parser.add_argument('--rounds', type=int, nargs='+', default=[4, 8, 10, 12])
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--redis-url', default='redis://127.0.0.1:6379/15',
+                        help='Redis database to seed (use a dedicated one).')
+    args = parser.parse_args()
+    for rounds in args.rounds:
+        throughput = run(rounds, args.requests, args.concurrency, args.workers, args.redis_url)
+        print(f'rounds={rounds} logins/s={throughput:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# coding=utf-8
+
+"""benchmarks.serialization file.
+
+Measure the url list serialization (schema dump and JSON response) of the marshmallow path
+against the fast path: ``python -m benchmarks.serialization --records 100000``.
+No Redis is needed.
+"""
+
+from argparse import ArgumentParser
+from secrets import token_bytes
+from time import perf_counter
+
+from shortipy import create_app
+from shortipy.controllers.api.url import UrlSchema
+from shortipy.services.url import generate_key
+
+
+def main():
+    """Parse arguments and run the benchmark."""
+    parser = ArgumentParser(description='Url list serialization speed.')
+    parser.add_argument('--records', type=int, default=100000)
+    args = parser.parse_args()
+
+    urls = {generate_key(): f'https://example.com/{index}' for index in range(args.records)}
+    results = {}
+    for provider in ('default', 'orjson'):
+        app = create_app({'TESTING': True, 'SECRET_KEY': token_bytes(32), 'JSON_PROVIDER': provider})
+        with app.test_request_context():
+            start = perf_counter()
+            body = app.json.response({'urls': UrlSchema(many=True).dump(
+                [{'key': key, 'value': value} for key, value in urls.items()]
+            )}).get_data()
+            results[f'schema+{provider}'] = (perf_counter() - start, body)
+
+            start = perf_counter()
+            body = app.json.response({'urls': UrlSchema.dump_fast(urls)}).get_data()
+            results[f'fast+{provider}'] = (perf_counter() - start, body)
+
+    reference = results['schema+default'][1]
+    for name, (elapsed, body) in results.items():
+        print(f'{name}: {elapsed * 1000:.1f} ms, identical={body == reference}')
+
+
+if __name__ == '__main__':
+    main()
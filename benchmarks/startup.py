@@ -0,0 +1,54 @@
+# coding=utf-8
+
+"""benchmarks.startup file.
+
+Measure cold start (import and application factory) time and resident memory of the full application
+against the resolver one, each in a fresh interpreter: ``python -m benchmarks.startup --runs 5``.
+No Redis is needed.
+"""
+
+from argparse import ArgumentParser
+from json import loads
+from statistics import median
+from subprocess import run
+from sys import executable
+
+PROBE = '''
+from json import dumps
+from resource import getrusage, RUSAGE_SELF
+from time import perf_counter
+start = perf_counter()
+import shortipy
+app = shortipy.{factory}({{'TESTING': True, 'SECRET_KEY': 'benchmark'}})
+elapsed = perf_counter() - start
+print(dumps({{'seconds': elapsed, 'max_rss_kib': getrusage(RUSAGE_SELF).ru_maxrss}}))
+'''
+
+
+def measure(factory: str, runs: int) -> tuple[float, float]:
+    """Measure application factory in fresh interpreters.
+
+    :param factory: Factory name.
+    :type factory: str
+    :param runs: Number of runs.
+    :type runs: int
+    :return: Median startup time (seconds) and median max RSS (KiB).
+    :rtype: tuple[float, float]
+    """
+    results = [loads(run([executable, '-c', PROBE.format(factory=factory)], capture_output=True, check=True,
+                         text=True).stdout) for _ in range(runs)]
+    return median(result['seconds'] for result in results), median(result['max_rss_kib'] for result in results)
+
+
+def main():
+    """Parse arguments and run the benchmark."""
+    parser = ArgumentParser(description='Startup time and memory of the application factories.')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    for factory in ('create_app', 'create_resolver_app'):
+        seconds, max_rss = measure(factory, args.runs)
+        print(f'{factory}: startup={seconds * 1000:.1f} ms, max_rss={max_rss / 1024:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
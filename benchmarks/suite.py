@@ -0,0 +1,76 @@
+# coding=utf-8
+
+"""benchmarks.suite file.
+
+Seed links and run the resolve, insert, list and login benchmarks (see ``flask bench``), write the results as JSON
+and optionally compare them with the results of another release:
+``python -m benchmarks.suite --fake --output new.json --compare old.json``.
+"""
+
+from argparse import ArgumentParser
+from json import dumps, load
+
+from shortipy import create_app
+from shortipy.services.benchmark import BENCHMARKS, get_fake_provider, run_benchmarks
+
+# Metrics where higher is better; for all other metrics (latencies) lower is better.
+HIGHER_IS_BETTER = ('per_second', 'urls')
+
+
+def compare(old: dict, new: dict) -> list[str]:
+    """Compare two benchmark results.
+
+    :param old: Baseline results.
+    :type old: dict
+    :param new: New results.
+    :type new: dict
+    :return: Lines with the relative change of every metric present in both results.
+    :rtype: list[str]
+    """
+    lines = [f'{old.get("version")} ({old.get("backend")}) -> {new.get("version")} ({new.get("backend")})']
+    for name, result in new.items():
+        if not isinstance(result, dict) or not isinstance(old.get(name), dict):
+            continue
+        for metric, value in result.items():
+            baseline = old[name].get(metric)
+            if not baseline or metric == 'rounds':
+                continue
+            change = (value - baseline) / baseline * 100
+            better = change >= 0 if metric in HIGHER_IS_BETTER else change <= 0
+            lines.append(f'{name}.{metric}: {baseline} -> {value} ({change:+.1f}%{"" if better else ", worse"})')
+    return lines
+
+
+def main():
+    """Parse arguments and run the benchmarks."""
+    parser = ArgumentParser(description='Resolve, insert, list and login benchmarks.')
+    parser.add_argument('--redis-url', default='redis://127.0.0.1:6379/15',
+                        help='Redis database to seed (use a dedicated one).')
+    parser.add_argument('--fake', action='store_true', help='Use an in-process Redis stand-in (fakeredis[lua]).')
+    parser.add_argument('--links', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--benchmark', action='append', choices=list(BENCHMARKS), dest='benchmarks')
+    parser.add_argument('--output', help='File to write JSON results to.')
+    parser.add_argument('--compare', help='File with JSON results to compare with.')
+    args = parser.parse_args()
+
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'benchmark',
+        'REDIS_URL': 'fake://' if args.fake else args.redis_url,
+        'REDIS_PROVIDER_CLASS': get_fake_provider() if args.fake else None
+    })
+    results = run_benchmarks(app, args.links, args.requests, args.benchmarks or list(BENCHMARKS))
+    results['backend'] = 'fake' if args.fake else 'redis'
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf8') as file:
+            file.write(dumps(results, indent=2))
+    if args.compare is not None:
+        with open(args.compare, encoding='utf8') as file:
+            print('\n'.join(compare(load(file), results)))
+    else:
+        print(dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 # coding=utf-8
 
+# pylint: disable=import-outside-toplevel
+
 """shortipy module."""
 
 from typing import Final
@@ -9,12 +11,8 @@ from flask import Flask
 
 from shortipy.services.config import Config
 from shortipy.services.redis import init_app as init_redis
-from shortipy.services.hash import init_app as init_hash
-from shortipy.services.auth import init_app as init_auth
-from shortipy.services.serialization import init_app as init_serialization
 from shortipy.services.url import init_app as init_url
 from shortipy.controllers.resolution import resolution_blueprint
-from shortipy.controllers.api import init_app as init_api
 
 VERSION: Final = '1.3.2'
 CONFIG_FILENAME: Final = 'config.py'
@@ -22,12 +20,100 @@ CONFIG_FILENAME: Final = 'config.py'
 
 def create_app(options: dict | None = None) -> Flask | None:
     """Application factory.
+    Auth, serialization and API modules are imported here, so that the resolver application never loads them.
+
+    :param options: Optional application options (default: None).
+    :type: dict | None
+    :return: An application instance.
+    :rtype: Flask | None
+    """
+    app = _create_app(options)
+
+    if app.config.get('SECRET_KEY') is None:
+        raise Exception('Set variable SECRET_KEY with cryptographically strong random')
+
+    _init_cooperative(app)
+
+    from shortipy.services.hash import init_app as init_hash
+    from shortipy.services.auth import init_app as init_auth
+    from shortipy.services.serialization import init_app as init_serialization
+    from shortipy.services.ratelimit import init_app as init_ratelimit
+    from shortipy.services.urlchanges import init_app as init_url_changes
+    from shortipy.services.urlindex import init_app as init_url_index
+    from shortipy.services.benchmark import init_app as init_benchmark
+    from shortipy.controllers.api import init_app as init_api
+
+    init_url_index(init_url_changes(init_url(init_serialization(init_auth(init_hash(init_redis(app)))))))
+    init_benchmark(init_ratelimit(app))
+
+    app.register_blueprint(resolution_blueprint)
+    app.register_blueprint(init_api())
+
+    _init_optional(app)
+    return app
+
+
+def create_resolver_app(options: dict | None = None) -> Flask | None:
+    """Resolver application factory: only Redis and the resolution are loaded, for redirect-only workers.
 
     :param options: Optional application options (default: None).
     :type: dict | None
     :return: An application instance.
     :rtype: Flask | None
     """
+    app = _create_app(options)
+
+    _init_cooperative(app)
+    init_url(init_redis(app))
+    if app.config.get('RATELIMIT_ENABLED'):
+        from shortipy.services.ratelimit import init_app as init_ratelimit
+        init_ratelimit(app)
+
+    app.register_blueprint(resolution_blueprint)
+
+    _init_optional(app)
+    return app
+
+
+def _init_cooperative(app: Flask):
+    """Initializes the cooperative (gevent) mode, if enabled by configuration (before Redis).
+
+    :param app: The Flask application instance.
+    :type app: Flask
+    """
+    if app.config.get('COOPERATIVE_MODE'):
+        from shortipy.services.cooperative import init_app as init_cooperative
+        init_cooperative(app)
+
+
+def _init_optional(app: Flask):
+    """Initializes the optional application services, enabled by configuration.
+
+    :param app: The Flask application instance.
+    :type app: Flask
+    """
+    if app.config.get('METRICS_ENABLED'):
+        from shortipy.services.metrics import init_app as init_metrics
+        init_metrics(app)
+    if app.config.get('PROFILING_ENABLED'):
+        from shortipy.services.profiling import init_app as init_profiling
+        init_profiling(app)
+    if app.config.get('URL_WARMUP_SIZE'):
+        from shortipy.services.warmup import init_app as init_warmup
+        init_warmup(app)
+    if app.config.get('HEALTH_ENABLED'):
+        from shortipy.services.health import init_app as init_health
+        init_health(app)
+
+
+def _create_app(options: dict | None) -> Flask:
+    """Create the application and load its configuration.
+
+    :param options: Optional application options.
+    :type: dict | None
+    :return: An application instance.
+    :rtype: Flask
+    """
     app = Flask(__name__, instance_relative_config=True)
 
     app.config.from_object(Config())
@@ -49,14 +135,6 @@ def create_app(options: dict | None = None) -> Flask | None:
     if options is not None:
         app.config.from_mapping(options)
 
-    if app.config.get('SECRET_KEY') is None:
-        raise Exception('Set variable SECRET_KEY with cryptographically strong random')
-
-    init_url(init_serialization(init_auth(init_hash(init_redis(app)))))
-
-    app.register_blueprint(resolution_blueprint)
-    app.register_blueprint(init_api())
-
     @app.cli.command('version', help='Display version.')
     def version():
         """Print Shortipy version."""
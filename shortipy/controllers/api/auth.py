@@ -4,13 +4,14 @@
 
 from flask import Flask, Blueprint, request
 from flask.views import MethodView
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from webargs import fields
 from webargs.flaskparser import use_args
 from marshmallow.validate import Length
 
 from shortipy.services.exceptions import MethodVersionNotFound
 from shortipy.services.serialization import marshmallow
-from shortipy.services.auth import login
+from shortipy.services.auth import login, refresh, revoke
 
 
 class AuthSchema(marshmallow.Schema):
@@ -20,7 +21,7 @@ class AuthSchema(marshmallow.Schema):
         """Class Meta."""
 
         ordered = True
-        fields = ('username', 'access_token')
+        fields = ('username', 'access_token', 'refresh_token')
 
 
 class AuthListAPI(MethodView):
@@ -45,9 +46,48 @@ class AuthListAPI(MethodView):
         :rtype: dict[str, str]
         """
         if request.headers.get('Accept-Version', '1.0') == '1.0':
+            access_token, refresh_token = login(args['username'], args['password'])
             return {'auth': self.auth_schema.dump({
                 'username': args['username'],
-                'access_token': login(args['username'], args['password'])
+                'access_token': access_token,
+                'refresh_token': refresh_token
+            })}
+        raise MethodVersionNotFound()
+
+    @staticmethod
+    @jwt_required(verify_type=False)
+    def delete():
+        """Delete (revoke) the token used to authenticate the request, access or refresh one.
+
+        :return: Empty response.
+        :rtype: tuple[str, int]
+        """
+        if request.headers.get('Accept-Version', '1.0') == '1.0':
+            revoke(get_jwt())
+            return '', 204
+        raise MethodVersionNotFound()
+
+
+class AuthRefreshAPI(MethodView):
+    """Auth refresh API."""
+
+    init_every_request = False
+
+    def __init__(self):
+        """AuthRefreshAPI constructor."""
+        self.auth_schema = AuthSchema()
+
+    @jwt_required(refresh=True)
+    def post(self):
+        """Post refresh token to get a new access token.
+
+        :return: New access token.
+        :rtype: dict[str, str]
+        """
+        if request.headers.get('Accept-Version', '1.0') == '1.0':
+            return {'auth': self.auth_schema.dump({
+                'username': get_jwt_identity(),
+                'access_token': refresh()
             })}
         raise MethodVersionNotFound()
 
@@ -61,4 +101,5 @@ def register_api(app: Flask | Blueprint) -> Flask | Blueprint:
     :rtype: Flask | Blueprint
     """
     app.add_url_rule('/auth/', view_func=AuthListAPI.as_view('auth'))
+    app.add_url_rule('/auth/refresh', view_func=AuthRefreshAPI.as_view('auth_refresh'))
     return app
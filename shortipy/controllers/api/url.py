@@ -2,16 +2,32 @@
 
 """shortipy.controllers.api.url file."""
 
-from flask import Flask, Blueprint, request, abort
+from typing import Callable
+from hashlib import sha256
+from datetime import datetime, timezone
+
+from flask import Flask, Blueprint, Response, request, abort, current_app, make_response, url_for
 from flask.views import MethodView
-from flask_jwt_extended import jwt_required
 from webargs import fields
 from webargs.flaskparser import use_args
-from marshmallow.validate import Length
+from marshmallow.validate import Length, OneOf, Range, Regexp
 
 from shortipy.services.exceptions import MethodVersionNotFound
 from shortipy.services.serialization import marshmallow
-from shortipy.services.url import get_urls, get_url_value, insert_url, update_url, delete_url
+from shortipy.services.auth import API_KEY_HEADER, auth_required, get_identity, is_admin
+from shortipy.services.url import (
+    URL_RESOLVE_MAX_KEYS, URL_LIST_MAX_COUNT, URL_SEARCH_MAX_LENGTH, REDIRECT_CODES, REDIRECT_DEFAULT_CODE,
+    RESERVED_KEYS, scan_urls, get_url, get_url_redirect, get_urls_version, get_url_values, insert_url, update_url,
+    delete_url
+)
+from shortipy.services.urlchanges import URL_STREAM_MAX_COUNT, get_url_changes
+from shortipy.services.urlindex import get_user_urls, get_created_urls, search_urls
+
+URL_ARGS = {
+    'value': fields.Str(required=True, validate=Length(min=1)),
+    'redirect_code': fields.Int(validate=OneOf(REDIRECT_CODES)),
+    'max_age': fields.Int(validate=Range(min=0))
+}
 
 
 class UrlSchema(marshmallow.Schema):
@@ -21,7 +37,7 @@ class UrlSchema(marshmallow.Schema):
         """Class Meta."""
 
         ordered = True
-        fields = ('key', 'value', 'links')
+        fields = ('key', 'value', 'redirect_code', 'max_age', 'links')
 
     links = marshmallow.Hyperlinks(  # pylint: disable=no-member
         {
@@ -29,6 +45,49 @@ class UrlSchema(marshmallow.Schema):
         }
     )
 
+    def dump_url(self, key: str, value: str, redirect: tuple[int, int | None] | None) -> dict:
+        """Dump url, with its redirect policy if not default.
+
+        :param key: Url key.
+        :type key: str
+        :param value: Url value.
+        :type value: str
+        :param redirect: Redirect policy (redirect code and max age) or None if default.
+        :type redirect: tuple[int, int | None] | None
+        :return: Serialized url.
+        :rtype: dict
+        """
+        url = {'key': key, 'value': value}
+        if redirect is not None:
+            url['redirect_code'], max_age = redirect
+            if max_age is not None:
+                url['max_age'] = max_age
+        return self.dump(url)
+
+    @staticmethod
+    def get_self_link_builder() -> Callable[[str], str]:
+        """Get a function building the self link of an url from a template computed once per call,
+        with the same output of url_for('api.url', key=key).
+
+        :return: Function building the self link from the url key.
+        :rtype: Callable[[str], str]
+        """
+        prefix = url_for('api.url', key='_')[:-1]
+        to_url = current_app.url_map.converters['default'](current_app.url_map).to_url
+        return lambda key: f'{prefix}{to_url(key)}'
+
+    @staticmethod
+    def dump_fast(urls: dict[str, str]) -> list[dict]:
+        """Dump urls with the same output of UrlSchema(many=True).dump, without per-item URL building.
+
+        :param urls: Dictionary of urls (keys and values).
+        :type urls: dict[str, str]
+        :return: Serialized urls.
+        :rtype: list[dict]
+        """
+        build_self_link = UrlSchema.get_self_link_builder()
+        return [{'key': key, 'value': value, 'links': {'self': build_self_link(key)}} for key, value in urls.items()]
+
 
 class UrlListAPI(MethodView):
     """Urls list API."""
@@ -38,24 +97,47 @@ class UrlListAPI(MethodView):
     def __init__(self):
         """UrlListAPI constructor."""
         self.url_schema = UrlSchema()
-        self.urls_schema = UrlSchema(many=True)
 
-    @jwt_required()
-    def get(self):
-        """Get urls.
+    @staticmethod
+    @auth_required()
+    @use_args({
+        'all': fields.Bool(load_default=False),
+        'cursor': fields.Int(load_default=0, validate=Range(min=0)),
+        'count': fields.Int(load_default=100, validate=Range(min=1, max=URL_LIST_MAX_COUNT))
+    }, location='query')
+    def get(args: dict):
+        """Get a page of the caller's urls, oldest first ("next_cursor" is the "cursor" of the next page),
+        or a page of all urls, in no particular order, if "all" is true (administrators only).
+        The ETag is the urls (collection) version of the caller's view (their own urls or all urls):
+        if it matches "If-None-Match" urls are not even read.
 
-        :return: All urls.
-        :rtype: dict[str, str]
+        :param args: Arguments.
+        :type args: dict
+        :return: Urls.
+        :rtype: Response
         """
         if request.headers.get('Accept-Version', '1.0') == '1.0':
-            urls = get_urls()
-            if len(urls) < 1:
+            identity = get_identity()
+            if args['all'] and not is_admin(identity):
+                abort(403)
+            view = sha256(bytes('' if args['all'] else identity, 'utf-8')).hexdigest()[:16]
+            etag = f'{get_urls_version()}-{view}'
+            if request.if_none_match.contains(etag):
+                return vary_by_caller(not_modified(etag))
+            if args['all']:
+                urls, next_cursor = scan_urls(args['cursor'], args['count'])
+            else:
+                urls, next_cursor = get_user_urls(identity, args['cursor'], args['count'])
+            # Scanned pages may be empty (the last one too): only the first page without urls means there are none.
+            if len(urls) < 1 and (not args['all'] or (args['cursor'] == 0 and next_cursor is None)):
                 abort(404)
-            return {'urls': self.urls_schema.dump([{'key': key, 'value': value} for key, value in urls.items()])}
+            response = make_response({'urls': UrlSchema.dump_fast(urls), 'next_cursor': next_cursor})
+            response.set_etag(etag)
+            return vary_by_caller(response)
         raise MethodVersionNotFound()
 
-    @jwt_required()
-    @use_args({'value': fields.Str(required=True, validate=Length(min=1))}, location='json')
+    @auth_required()
+    @use_args(URL_ARGS, location='json')
     def post(self, args: dict):
         """Post url.
 
@@ -65,12 +147,170 @@ class UrlListAPI(MethodView):
         :rtype: dict[str, str]
         """
         if request.headers.get('Accept-Version', '1.0') == '1.0':
-            return {'url': self.url_schema.dump({'key': insert_url(args['value']), 'value': args['value']})}, 201
+            redirect = get_redirect_arg(args)
+            key = insert_url(args['value'], redirect, get_identity())
+            return {'url': self.url_schema.dump_url(key, args['value'], redirect)}, 201
+        raise MethodVersionNotFound()
+
+
+class UrlCreatedAPI(MethodView):
+    """Urls by creation time API (reporting, administrators only)."""
+
+    init_every_request = False
+
+    @staticmethod
+    @auth_required()
+    @use_args({
+        'since': fields.AwareDateTime(default_timezone=timezone.utc),
+        'until': fields.AwareDateTime(default_timezone=timezone.utc),
+        'order': fields.Str(load_default='asc', validate=OneOf(('asc', 'desc'))),
+        'cursor': fields.Int(validate=Range(min=0)),
+        'count': fields.Int(load_default=100, validate=Range(min=1, max=URL_LIST_MAX_COUNT))
+    }, location='query')
+    def get(args: dict):
+        """Get a page of the urls created between "since" and "until" (ISO 8601, UTC if no offset, both included),
+        oldest first or newest first ("order"); "next_cursor" is the "cursor" of the next page.
+        Only available if the creation index is enabled (URL_CREATED_INDEX).
+
+        :param args: Arguments.
+        :type args: dict
+        :return: Urls, with their creation time.
+        :rtype: Response
+        """
+        if request.headers.get('Accept-Version', '1.0') == '1.0':
+            if not is_admin(get_identity()):
+                abort(403)
+            if not current_app.config.get('URL_CREATED_INDEX'):
+                abort(404)
+            etag = str(get_urls_version())
+            if request.if_none_match.contains(etag):
+                return not_modified(etag)
+            urls, next_cursor = get_created_urls(
+                args['since'].timestamp() if 'since' in args else None,
+                args['until'].timestamp() if 'until' in args else None,
+                args['order'] == 'desc', args.get('cursor'), args['count']
+            )
+            if len(urls) < 1:
+                abort(404)
+            build_self_link = UrlSchema.get_self_link_builder()
+            response = make_response({'urls': [{
+                'key': key,
+                'value': value,
+                'created': datetime.fromtimestamp(created, timezone.utc).isoformat(),
+                'links': {'self': build_self_link(key)}
+            } for key, value, created in urls], 'next_cursor': next_cursor})
+            response.set_etag(etag)
+            return response
+        raise MethodVersionNotFound()
+
+
+class UrlSearchAPI(MethodView):
+    """Urls search API (administrators only)."""
+
+    init_every_request = False
+
+    @staticmethod
+    @auth_required()
+    @use_args({
+        'domain': fields.Str(validate=Length(min=1)),
+        'q': fields.Str(validate=Length(min=3, max=URL_SEARCH_MAX_LENGTH)),
+        'cursor': fields.Str(validate=Length(min=1)),
+        'count': fields.Int(load_default=100, validate=Range(min=1, max=URL_LIST_MAX_COUNT))
+    }, location='query', validate=lambda args: 'domain' in args or 'q' in args)
+    def get(args: dict):
+        """Get a page of the urls pointing at "domain" (or its subdomains) and/or containing "q" (case-insensitive),
+        by key order; "next_cursor" is the "cursor" of the next page.
+        Only available if the search index is enabled (URL_SEARCH_INDEX).
+
+        :param args: Arguments.
+        :type args: dict
+        :return: Urls.
+        :rtype: Response
+        """
+        if request.headers.get('Accept-Version', '1.0') == '1.0':
+            if not is_admin(get_identity()):
+                abort(403)
+            if not current_app.config.get('URL_SEARCH_INDEX'):
+                abort(404)
+            etag = str(get_urls_version())
+            if request.if_none_match.contains(etag):
+                return not_modified(etag)
+            urls, next_cursor = search_urls(args.get('domain'), args.get('q'), args.get('cursor'), args['count'])
+            if len(urls) < 1:
+                abort(404)
+            response = make_response({'urls': UrlSchema.dump_fast(urls), 'next_cursor': next_cursor})
+            response.set_etag(etag)
+            return response
+        raise MethodVersionNotFound()
+
+
+class UrlResolveAPI(MethodView):
+    """Urls batch resolve API."""
+
+    init_every_request = False
+
+    @staticmethod
+    @auth_required()
+    @use_args({
+        'keys': fields.List(fields.Str(validate=Length(min=1)), required=True,
+                            validate=Length(min=1, max=URL_RESOLVE_MAX_KEYS))
+    }, location='json')
+    def post(args: dict):
+        """Post keys to resolve.
+        Missing keys are reported inline with a null value.
+
+        :param args: Arguments.
+        :type args: dict
+        :return: Resolved urls, in the order of passed keys.
+        :rtype: dict[str, list]
+        """
+        if request.headers.get('Accept-Version', '1.0') == '1.0':
+            build_self_link = UrlSchema.get_self_link_builder()
+            return {'urls': [
+                {'key': key, 'value': value, 'links': {'self': build_self_link(key)}} if value is not None
+                else {'key': key, 'value': None}
+                for key, value in get_url_values(args['keys']).items()
+            ]}
+        raise MethodVersionNotFound()
+
+
+class UrlChangesAPI(MethodView):
+    """Url changes feed API (administrators only: it carries every user's urls)."""
+
+    init_every_request = False
+
+    @staticmethod
+    @auth_required()
+    @use_args({
+        'since': fields.Str(load_default='0', validate=Regexp(r'^[0-9]+(-[0-9]+)?$')),
+        'count': fields.Int(load_default=100, validate=Range(min=1, max=URL_STREAM_MAX_COUNT))
+    }, location='query')
+    def get(args: dict):
+        """Get url changes after the "since" change id, for incremental sync.
+        If "truncated" is true, changes after "since" were trimmed from the feed and a full resync is needed.
+
+        :param args: Arguments.
+        :type args: dict
+        :return: Changes, last change id (to pass as "since" next) and truncated flag.
+        :rtype: dict
+        """
+        if request.headers.get('Accept-Version', '1.0') == '1.0':
+            if not is_admin(get_identity()):
+                abort(403)
+            changes, truncated = get_url_changes(args['since'], args['count'])
+            return {
+                'changes': [dump_change(change) for change in changes],
+                'last_id': changes[-1]['id'] if changes else args['since'],
+                'truncated': truncated
+            }
         raise MethodVersionNotFound()
 
 
 class UrlAPI(MethodView):
-    """Url API."""
+    """Url API.
+    Reserved keys are never urls: "GET /urls/search" and the like reach their own APIs, so urls stored with
+    a reserved key (before it was reserved) are not found here either, whatever the method.
+    """
 
     init_every_request = False
 
@@ -78,26 +318,47 @@ class UrlAPI(MethodView):
         """UrlAPI constructor."""
         self.url_schema = UrlSchema()
 
-    @jwt_required()
+    def dispatch_request(self, **kwargs):
+        """Dispatch request, if the key is not a reserved one.
+
+        :param kwargs: View arguments.
+        :return: Response.
+        :rtype: Response
+        """
+        if kwargs.get('key') in RESERVED_KEYS:
+            abort(404)
+        return super().dispatch_request(**kwargs)
+
+    @auth_required()
     def get(self, key: str):
         """Get url.
+        The ETag is the url version, only for urls written through this service (unversioned ones have none):
+        "If-None-Match" is checked once the url is found, so missing urls are never "304 Not Modified".
 
         :param key: Url key.
         :type key: str
         :return: Url.
-        :rtype: dict[str, str]
+        :rtype: Response
         """
         if request.headers.get('Accept-Version', '1.0') == '1.0':
-            value = get_url_value(key)
+            value, redirect, version = get_url(key)
             if value is None:
                 abort(404)
-            return {'url': self.url_schema.dump({'key': key, 'value': value})}
+            if version < 1:
+                return {'url': self.url_schema.dump_url(key, value, redirect)}
+            etag = str(version)
+            if request.if_none_match.contains(etag):
+                return not_modified(etag)
+            response = make_response({'url': self.url_schema.dump_url(key, value, redirect)})
+            response.set_etag(etag)
+            return response
         raise MethodVersionNotFound()
 
-    @jwt_required()
-    @use_args({'value': fields.Str(required=True, validate=Length(min=1))}, location='json')
+    @auth_required()
+    @use_args(URL_ARGS, location='json')
     def put(self, args: dict, key: str):
         """Put url.
+        The redirect policy is replaced only if "redirect_code" or "max_age" is passed.
 
         :param args: Arguments.
         :type args: dict
@@ -107,11 +368,16 @@ class UrlAPI(MethodView):
         :rtype: dict[str, str]
         """
         if request.headers.get('Accept-Version', '1.0') == '1.0':
-            return {'url': self.url_schema.dump({'key': key, 'value': update_url(key, args['value'])})}
+            keep_redirect = 'redirect_code' not in args and 'max_age' not in args
+            redirect = get_redirect_arg(args)
+            value = update_url(key, args['value'], redirect, keep_redirect)
+            if keep_redirect:
+                redirect = get_url_redirect(key)
+            return {'url': self.url_schema.dump_url(key, value, redirect)}
         raise MethodVersionNotFound()
 
     @staticmethod
-    @jwt_required()
+    @auth_required()
     def delete(key: str):
         """Delete url.
 
@@ -126,6 +392,60 @@ class UrlAPI(MethodView):
         raise MethodVersionNotFound()
 
 
+def get_redirect_arg(args: dict) -> tuple[int, int | None] | None:
+    """Get redirect policy from parsed arguments.
+
+    :param args: Arguments.
+    :type args: dict
+    :return: Redirect policy (redirect code and max age) or None if default.
+    :rtype: tuple[int, int | None] | None
+    """
+    if 'redirect_code' not in args and 'max_age' not in args:
+        return None
+    return args.get('redirect_code', REDIRECT_DEFAULT_CODE), args.get('max_age')
+
+
+def dump_change(change: dict) -> dict:
+    """Dump url change, with its redirect policy if not default.
+
+    :param change: Url change.
+    :type change: dict
+    :return: Serialized url change.
+    :rtype: dict
+    """
+    result = {key: change[key] for key in ('id', 'op', 'key', 'value', 'version')}
+    if change['redirect'] is not None:
+        result['redirect_code'], max_age = change['redirect']
+        if max_age is not None:
+            result['max_age'] = max_age
+    return result
+
+
+def not_modified(etag: str) -> Response:
+    """Get a "304 Not Modified" response.
+
+    :param etag: Entity tag.
+    :type etag: str
+    :return: Flask response.
+    :rtype: Response
+    """
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def vary_by_caller(response: Response) -> Response:
+    """Mark response as depending on the caller (its credentials), for shared caches.
+
+    :param response: Flask response.
+    :type response: Response
+    :return: Flask response.
+    :rtype: Response
+    """
+    response.vary.update(('Authorization', API_KEY_HEADER))
+    return response
+
+
 def register_api(app: Flask | Blueprint) -> Flask | Blueprint:
     """Register API controller.
 
@@ -135,5 +455,9 @@ def register_api(app: Flask | Blueprint) -> Flask | Blueprint:
     :rtype: Flask | Blueprint
     """
     app.add_url_rule('/urls/', view_func=UrlListAPI.as_view('urls'))
+    app.add_url_rule('/urls/created', view_func=UrlCreatedAPI.as_view('urls_created'))
+    app.add_url_rule('/urls/search', view_func=UrlSearchAPI.as_view('urls_search'))
+    app.add_url_rule('/urls/resolve', view_func=UrlResolveAPI.as_view('urls_resolve'))
+    app.add_url_rule('/urls/changes', view_func=UrlChangesAPI.as_view('urls_changes'))
     app.add_url_rule('/urls/<key>', view_func=UrlAPI.as_view('url'))
     return app
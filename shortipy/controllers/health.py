@@ -0,0 +1,31 @@
+# coding=utf-8
+
+"""shortipy.controllers.health file."""
+
+from flask import Blueprint, Response, jsonify
+
+from shortipy.services.health import get_readiness
+
+health_blueprint = Blueprint('health', __name__)
+
+
+@health_blueprint.route('/healthz')
+def healthz() -> Response:
+    """Liveness: the process serves requests (no backend is checked).
+
+    :return: Flask response.
+    :rtype: Response
+    """
+    return jsonify(status='ok')
+
+
+@health_blueprint.route('/readyz')
+def readyz() -> Response | tuple[Response, int]:
+    """Readiness: Redis reachable (last background probe), circuit breaker not open and cache warm-up done.
+
+    :return: Flask response.
+    :rtype: Response | tuple[Response, int]
+    """
+    ready, checks = get_readiness()
+    response = jsonify(status='ready' if ready else 'not_ready', checks=checks)
+    return response if ready else (response, 503)
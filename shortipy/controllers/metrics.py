@@ -0,0 +1,19 @@
+# coding=utf-8
+
+"""shortipy.controllers.metrics file."""
+
+from flask import Blueprint, Response
+
+from shortipy.services.metrics import metrics
+
+metrics_blueprint = Blueprint('metrics', __name__)
+
+
+@metrics_blueprint.route('/metrics')
+def get_metrics() -> Response:
+    """Get metrics in the Prometheus text format.
+
+    :return: Flask response.
+    :rtype: Response
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -5,21 +5,29 @@
 from flask import Blueprint, Response, redirect, abort
 from markupsafe import escape
 
-from shortipy.services.redis import redis_client
+from shortipy.services.url import resolve_url
 
 resolution_blueprint = Blueprint('resolution', __name__)
 
 
 @resolution_blueprint.route('/<key>')
 def resolve(key: str) -> Response:
-    """Resolve the key in the correspondent url and redirect.
+    """Resolve the key in the correspondent url and redirect, following the url redirect policy.
 
     :param key: Key to resolve.
     :type key: str
     :return: Flask response.
     :rtype: Response
     """
-    value = redis_client.get(f'url:{escape(key)}')
+    value, redirect_policy = resolve_url(escape(key))
     if value is None:
         abort(404)
-    return redirect(value)
+    if redirect_policy is None:
+        return redirect(value)
+
+    code, max_age = redirect_policy
+    response = redirect(value, code)
+    if max_age is not None:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    return response
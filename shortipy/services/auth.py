@@ -2,20 +2,96 @@
 
 """shortipy.services.auth file."""
 
-from typing import Final
+from typing import Final, Callable
+from functools import wraps
+from hashlib import sha256
+from hmac import compare_digest
+from os import linesep
+from secrets import token_hex, token_urlsafe
+from threading import Lock
+from time import monotonic, time
 
 from click import option, STRING
-from flask import Flask
+from flask import Flask, current_app, g, request
 from flask.cli import AppGroup
-from flask_jwt_extended import JWTManager, create_access_token
+from flask_jwt_extended import (
+    JWTManager, create_access_token, create_refresh_token, get_jwt_identity, verify_jwt_in_request
+)
 from werkzeug.exceptions import NotFound, Unauthorized
 
 from shortipy.services.redis import redis_client
-from shortipy.services.hash import bcrypt, normalize_input
+from shortipy.services.hash import bcrypt, hash_pool, normalize_input
+from shortipy.services.cache import LocalCache
 
 USER_KEYS_DOMAIN: Final = 'user'
+API_KEY_FIELD_PREFIX: Final = 'api_key'
+ADMIN_FIELD: Final = 'admin'
+API_KEY_HEADER: Final = 'X-API-Key'
+REVOKED_TOKENS_KEY: Final = 'revoked_token'
+
+
+class RevocationList:
+    """Class to check revoked tokens against a local copy of the Redis revocation list, synced periodically.
+    Deleted API keys (and users) are listed too, until cached keys expire, so that no process keeps accepting them.
+    """
+
+    def __init__(self):
+        """RevocationList constructor."""
+        self.sync_interval = 5.0
+        self._lock = Lock()
+        self._revoked: set[str] = set()
+        self._synced_at: float | None = None
+
+    def init_app(self, app: Flask):
+        """Initializes the revocation list.
+
+        :param app: The Flask application instance.
+        :type app: Flask
+        """
+        self.sync_interval = app.config.get('JWT_REVOCATION_SYNC_INTERVAL', 5.0)
+        with self._lock:
+            self._revoked = set()
+            self._synced_at = None
+
+    def is_revoked(self, jti: str) -> bool:
+        """Check if token is revoked, syncing the local copy first if it is older than the sync interval.
+
+        :param jti: Token unique identifier.
+        :type jti: str
+        :return: True if token is revoked, otherwise False.
+        :rtype: bool
+        """
+        if self._synced_at is None or monotonic() - self._synced_at >= self.sync_interval:
+            self.sync()
+        return jti in self._revoked
+
+    def revoke(self, jti: str, expires: float | None):
+        """Revoke token, dropping tokens that are expired anyway from Redis (so that syncs only read).
+
+        :param jti: Token unique identifier.
+        :type jti: str
+        :param expires: Token expiration timestamp (None if it never expires).
+        :type expires: float | None
+        """
+        with redis_client.pipeline(transaction=False) as pipeline:
+            pipeline.zremrangebyscore(REVOKED_TOKENS_KEY, '-inf', time())
+            pipeline.zadd(REVOKED_TOKENS_KEY, {jti: expires if expires is not None else float('inf')})
+            pipeline.execute()
+        with self._lock:
+            self._revoked.add(jti)
+
+    def sync(self):
+        """Sync the local copy with Redis, leaving out tokens that are expired anyway (read only)."""
+        with self._lock:
+            if self._synced_at is not None and monotonic() - self._synced_at < self.sync_interval:
+                return
+            self._revoked = set(redis_client.zrangebyscore(REVOKED_TOKENS_KEY, time(), '+inf'))
+            self._synced_at = monotonic()
+
 
 jwt = JWTManager()
+revocation_list = RevocationList()
+api_key_cache = LocalCache()
 cli = AppGroup('users', help='Manage users.')
 
 
@@ -28,17 +104,23 @@ def init_app(app: Flask) -> Flask:
     :rtype: Flask
     """
     jwt.init_app(app)
+    revocation_list.init_app(app)
+    api_key_cache.max_size = app.config.get('API_KEY_CACHE_SIZE', 1024)
+    api_key_cache.ttl = app.config.get('API_KEY_CACHE_TTL', 60.0)
+    api_key_cache.clear()
     app.cli.add_command(cli)
     return app
 
 
-def insert_user(username: str, password: str | bytes):
+def insert_user(username: str, password: str | bytes, admin: bool = False):
     """Insert new user.
 
     :param username: User's username.
     :type username: str
     :param password: User's password.
     :type password: str | bytes
+    :param admin: Whether the user is an administrator (default: False).
+    :type admin: bool
     """
     if redis_client.hget(f'{USER_KEYS_DOMAIN}:{username}', 'password') is not None:
         raise Exception(f'User "{username}" already exists')
@@ -46,6 +128,36 @@ def insert_user(username: str, password: str | bytes):
     password_hash = bcrypt.generate_password_hash(normalize_input(password))
 
     redis_client.hset(f'{USER_KEYS_DOMAIN}:{username}', 'password', password_hash)
+    if admin:
+        redis_client.hset(f'{USER_KEYS_DOMAIN}:{username}', ADMIN_FIELD, 1)
+
+
+def set_admin(username: str, admin: bool):
+    """Grant or revoke user's administrator flag.
+
+    :param username: User's username.
+    :type username: str
+    :param admin: Whether the user is an administrator.
+    :type admin: bool
+    """
+    if redis_client.hget(f'{USER_KEYS_DOMAIN}:{username}', 'password') is None:
+        raise NotFound(f'User "{username}" not found')
+
+    if admin:
+        redis_client.hset(f'{USER_KEYS_DOMAIN}:{username}', ADMIN_FIELD, 1)
+    else:
+        redis_client.hdel(f'{USER_KEYS_DOMAIN}:{username}', ADMIN_FIELD)
+
+
+def is_admin(username: str | None) -> bool:
+    """Check if user is an administrator.
+
+    :param username: User's username.
+    :type username: str | None
+    :return: True if user is an administrator, otherwise False.
+    :rtype: bool
+    """
+    return username is not None and redis_client.hget(f'{USER_KEYS_DOMAIN}:{username}', ADMIN_FIELD) == '1'
 
 
 def delete_user(username: str):
@@ -58,41 +170,225 @@ def delete_user(username: str):
         raise NotFound(f'User "{username}" not found')
 
     redis_client.delete(f'{USER_KEYS_DOMAIN}:{username}')
+    _revoke_api_keys(username)
 
 
-def login(username: str, password: str | bytes) -> str:
+def login(username: str, password: str | bytes) -> tuple[str, str]:
     """Do login.
 
     :param username: User's username.
     :type username: str
     :param password: User's password.
     :type password: str | bytes
-    :return: Access token.
-    :rtype: str
+    :return: Access token and refresh token.
+    :rtype: tuple[str, str]
     """
-    if not bcrypt.check_password_hash(
+    if not hash_pool.check_password_hash(
             redis_client.hget(f'{USER_KEYS_DOMAIN}:{username}', 'password'), normalize_input(password)
     ):
         raise Unauthorized('Bad username or password')
 
-    access_token = create_access_token(identity=username)
-    return access_token
+    return create_access_token(identity=username), create_refresh_token(identity=username)
+
+
+def refresh() -> str:
+    """Issue a new access token for the identity of the current (refresh) token.
+
+    :return: Access token.
+    :rtype: str
+    """
+    return create_access_token(identity=get_jwt_identity())
+
+
+def revoke(jwt_payload: dict):
+    """Revoke token.
+
+    :param jwt_payload: Token payload.
+    :type jwt_payload: dict
+    """
+    revocation_list.revoke(jwt_payload['jti'], jwt_payload.get('exp'))
+
+
+@jwt.token_in_blocklist_loader
+def is_token_revoked(_: dict, jwt_payload: dict) -> bool:
+    """Check if token is revoked (JWT blocklist loader).
+
+    :param _: Token header.
+    :type _: dict
+    :param jwt_payload: Token payload.
+    :type jwt_payload: dict
+    :return: True if token is revoked, otherwise False.
+    :rtype: bool
+    """
+    return revocation_list.is_revoked(jwt_payload['jti'])
+
+
+def insert_api_key(username: str) -> str:
+    """Issue new API key for user.
+    Only a sha256 digest of the key is stored, so the key is returned here and never again.
+
+    :param username: User's username.
+    :type username: str
+    :return: API key ("<username>.<key id>.<secret>").
+    :rtype: str
+    """
+    if redis_client.hget(f'{USER_KEYS_DOMAIN}:{username}', 'password') is None:
+        raise NotFound(f'User "{username}" not found')
+
+    key_id = token_hex(4)
+    secret = token_urlsafe(32)
+    redis_client.hset(f'{USER_KEYS_DOMAIN}:{username}', f'{API_KEY_FIELD_PREFIX}:{key_id}', _digest(secret))
+    return f'{username}.{key_id}.{secret}'
+
+
+def get_api_keys(username: str) -> list[str]:
+    """Get user's API key ids.
+
+    :param username: User's username.
+    :type username: str
+    :return: API key ids.
+    :rtype: list[str]
+    """
+    return sorted(field.removeprefix(f'{API_KEY_FIELD_PREFIX}:')
+                  for field in redis_client.hkeys(f'{USER_KEYS_DOMAIN}:{username}')
+                  if field.startswith(f'{API_KEY_FIELD_PREFIX}:'))
+
+
+def delete_api_key(username: str, key_id: str):
+    """Revoke user's API key.
+
+    :param username: User's username.
+    :type username: str
+    :param key_id: API key id.
+    :type key_id: str
+    """
+    if not redis_client.hdel(f'{USER_KEYS_DOMAIN}:{username}', f'{API_KEY_FIELD_PREFIX}:{key_id}'):
+        raise NotFound(f'API key "{key_id}" of user "{username}" not found')
+    _revoke_api_keys(username, key_id)
+
+
+def verify_api_key(api_key: str) -> str | None:
+    """Verify API key, with a single Redis lookup backed by a local cache.
+    Cached keys are used only if neither they nor their user are in the revocation list (deleted in any process).
+
+    :param api_key: API key ("<username>.<key id>.<secret>").
+    :type api_key: str
+    :return: User's username (identity) or None if key is invalid.
+    :rtype: str | None
+    """
+    parts = api_key.rsplit('.', 2)
+    if len(parts) != 3 or not all(parts):
+        return None
+    username, key_id, secret = parts
+    digest = _digest(secret)
+
+    cache_key = f'{key_id}:{digest}'
+    identity = api_key_cache.get(cache_key)
+    if identity is not None and not revocation_list.is_revoked(f'{API_KEY_FIELD_PREFIX}:{username}') and \
+            not revocation_list.is_revoked(f'{API_KEY_FIELD_PREFIX}:{username}.{key_id}'):
+        return identity if identity == username else None
+
+    stored_digest = redis_client.hget(f'{USER_KEYS_DOMAIN}:{username}', f'{API_KEY_FIELD_PREFIX}:{key_id}')
+    if stored_digest is None or not compare_digest(stored_digest, digest):
+        return None
+    api_key_cache.set(cache_key, username)
+    return username
+
+
+def auth_required() -> Callable:
+    """Decorator to protect a view with an API key ("X-API-Key" header) or, otherwise, a JWT.
+
+    :return: Decorator.
+    :rtype: Callable
+    """
+    def wrapper(function: Callable) -> Callable:
+        @wraps(function)
+        def decorator(*args, **kwargs):
+            api_key = request.headers.get(API_KEY_HEADER)
+            if api_key is not None:
+                identity = verify_api_key(api_key)
+                if identity is None:
+                    raise Unauthorized('Bad API key')
+                g.api_key_identity = identity
+            else:
+                verify_jwt_in_request()
+            return current_app.ensure_sync(function)(*args, **kwargs)
+        return decorator
+    return wrapper
+
+
+def get_identity() -> str | None:
+    """Get the identity of the current request, authenticated through API key or JWT.
+
+    :return: User's username (identity).
+    :rtype: str | None
+    """
+    return g.get('api_key_identity') or get_jwt_identity()
+
+
+def _revoke_api_keys(username: str, key_id: str | None = None):
+    """Evict deleted API keys from the local cache and list them in the revocation list until cached keys expire,
+    so that the other processes evict them too.
+
+    :param username: User's username.
+    :type username: str
+    :param key_id: API key id (default: None, all the keys of the user).
+    :type key_id: str | None
+    """
+    if key_id is None:
+        api_key_cache.delete_where(lambda _, identity: identity == username)
+        revocation_list.revoke(f'{API_KEY_FIELD_PREFIX}:{username}', time() + api_key_cache.ttl)
+    else:
+        api_key_cache.delete_where(
+            lambda cache_key, identity: identity == username and cache_key.startswith(f'{key_id}:')
+        )
+        revocation_list.revoke(f'{API_KEY_FIELD_PREFIX}:{username}.{key_id}', time() + api_key_cache.ttl)
+
+
+def _digest(secret: str) -> str:
+    """Get the digest of an API key secret.
+
+    :param secret: API key secret.
+    :type secret: str
+    :return: Digest.
+    :rtype: str
+    """
+    return sha256(bytes(secret, 'utf-8')).hexdigest()
 
 
 # region CLI functions
 @cli.command('new', help='Insert new user.')
 @option('-u', '--username', type=STRING, prompt='Enter the user\'s username', help='Specify the user\'s username.')
 @option('-p', '--password', type=STRING, prompt='Enter the user\'s password', help='Specify the user\'s password.')
-def new_user(username: str, password: str):
+@option('--admin', is_flag=True, help='Make the user an administrator.')
+def new_user(username: str, password: str, admin: bool):
     """Insert new user.
 
     :param username: User's username.
     :type username: str
     :param password: User's password.
     :type password: str
+    :param admin: Make the user an administrator.
+    :type admin: bool
     """
     print(f'Insert user: {username}...')
-    insert_user(username, password)
+    insert_user(username, password, admin)
+    print('Done.')
+
+
+@cli.command('admin', help='Grant (or revoke) user\'s administrator flag.')
+@option('-u', '--username', type=STRING, prompt='Enter the user\'s username', help='Specify the user\'s username.')
+@option('--revoke', 'remove', is_flag=True, help='Revoke the flag instead of granting it.')
+def admin_user(username: str, remove: bool):
+    """Grant (or revoke) user's administrator flag.
+
+    :param username: User's username.
+    :type username: str
+    :param remove: Revoke the flag instead of granting it.
+    :type remove: bool
+    """
+    print(f'{"Revoking" if remove else "Granting"} administrator flag of user: {username}...')
+    set_admin(username, not remove)
     print('Done.')
 
 
@@ -107,4 +403,45 @@ def del_url(username: str):
     print(f'Deleting user: {username}...')
     delete_user(username)
     print('Done.')
+
+
+@cli.command('new-key', help='Issue new API key for user.')
+@option('-u', '--username', type=STRING, prompt='Enter the user\'s username', help='Specify the user\'s username.')
+def new_api_key(username: str):
+    """Issue new API key for user.
+
+    :param username: User's username.
+    :type username: str
+    """
+    print(f'Issuing API key for user: {username}...')
+    api_key = insert_api_key(username)
+    print(f'Done.{linesep}Use the following API key (it will not be shown again): {api_key}')
+
+
+@cli.command('keys', help='List user\'s API keys.')
+@option('-u', '--username', type=STRING, prompt='Enter the user\'s username', help='Specify the user\'s username.')
+def list_api_keys(username: str):
+    """List user's API key ids.
+
+    :param username: User's username.
+    :type username: str
+    """
+    for key_id in get_api_keys(username):
+        print(key_id)
+
+
+@cli.command('del-key', help='Revoke user\'s API key.')
+@option('-u', '--username', type=STRING, prompt='Enter the user\'s username', help='Specify the user\'s username.')
+@option('-i', '--key-id', type=STRING, prompt='Enter the API key id', help='Specify the API key id.')
+def del_api_key(username: str, key_id: str):
+    """Revoke user's API key.
+
+    :param username: User's username.
+    :type username: str
+    :param key_id: API key id.
+    :type key_id: str
+    """
+    print(f'Revoking API key {key_id} of user: {username}...')
+    delete_api_key(username, key_id)
+    print('Done.')
 # endregion
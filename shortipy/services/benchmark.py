@@ -0,0 +1,276 @@
+# coding=utf-8
+
+"""shortipy.services.benchmark file."""
+
+from typing import Final, Callable
+from json import dumps
+from random import Random
+from secrets import token_hex
+from statistics import mean
+from time import perf_counter
+
+from click import Choice, INT, STRING, UsageError, command, option
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+
+from shortipy import VERSION, create_app
+from shortipy.services.auth import API_KEY_HEADER, insert_user, delete_user, insert_api_key
+from shortipy.services.url import URL_LIST_MAX_COUNT, insert_url, insert_urls, delete_urls
+
+BENCHMARK_USERNAME_PREFIX: Final = 'benchmark-'
+BENCHMARK_URL_VALUE: Final = 'https://example.com/benchmark/{index}'
+SEED_BATCH_SIZE: Final = 1000
+
+
+def init_app(app: Flask) -> Flask:
+    """Initializes the application benchmarks.
+
+    :param app: The Flask application instance.
+    :type app: Flask
+    :return: The Flask application instance.
+    :rtype: Flask
+    """
+    app.cli.add_command(bench)
+    return app
+
+
+def run_benchmarks(app: Flask, links: int, requests: int, benchmarks: list[str]) -> dict:
+    """Seed links and run benchmarks; seeded links and the benchmark user (a new one, with a random username)
+    are removed afterwards.
+
+    :param app: The Flask application instance (full application).
+    :type app: Flask
+    :param links: Number of links to seed.
+    :type links: int
+    :param requests: Number of requests (or operations) per benchmark.
+    :type requests: int
+    :param benchmarks: Benchmarks to run (see BENCHMARKS).
+    :type benchmarks: list[str]
+    :return: Results (machine-readable).
+    :rtype: dict
+    """
+    results = {'version': VERSION, 'links': links, 'requests': requests}
+    context = {'app': app, 'keys': [], 'username': f'{BENCHMARK_USERNAME_PREFIX}{token_hex(8)}',
+               'password': token_hex(16)}
+    with app.app_context():
+        insert_user(context['username'], context['password'], admin=True)
+    try:
+        with app.app_context():
+            context['api_key'] = insert_api_key(context['username'])
+            start = perf_counter()
+            for batch in range(0, links, SEED_BATCH_SIZE):
+                context['keys'].extend(insert_urls([BENCHMARK_URL_VALUE.format(index=index)
+                                                    for index in range(batch, min(batch + SEED_BATCH_SIZE, links))]))
+            results['seed'] = _throughput(links, perf_counter() - start)
+        for name in benchmarks:
+            results[name] = BENCHMARKS[name](context, requests)
+    finally:
+        with app.app_context():
+            delete_urls(context['keys'])
+            delete_user(context['username'])
+    return results
+
+
+def bench_resolve(context: dict, requests: int) -> dict:
+    """Benchmark resolve latency on random seeded links.
+
+    :param context: Benchmark context.
+    :type context: dict
+    :param requests: Number of requests.
+    :type requests: int
+    :return: Latency percentiles (milliseconds) and throughput.
+    :rtype: dict
+    """
+    client = context['app'].test_client()
+    keys = context['keys'] or ['missing']
+    randomizer = Random(0)
+    latencies = []
+    for _ in range(requests):
+        key = randomizer.choice(keys)
+        start = perf_counter()
+        client.get(f'/{key}')
+        latencies.append(perf_counter() - start)
+    return {**_percentiles(latencies), **_throughput(requests, sum(latencies))}
+
+
+def bench_insert(context: dict, requests: int) -> dict:
+    """Benchmark insert throughput with the keyspace occupied by seeded links.
+
+    :param context: Benchmark context.
+    :type context: dict
+    :param requests: Number of inserts.
+    :type requests: int
+    :return: Latency percentiles (milliseconds) and throughput.
+    :rtype: dict
+    """
+    latencies = []
+    with context['app'].app_context():
+        for index in range(requests):
+            start = perf_counter()
+            context['keys'].append(insert_url(BENCHMARK_URL_VALUE.format(index=f'insert/{index}')))
+            latencies.append(perf_counter() - start)
+    return {**_percentiles(latencies), **_throughput(requests, sum(latencies))}
+
+
+def bench_list(context: dict, requests: int) -> dict:
+    """Benchmark list (export) speed of the url list API.
+
+    :param context: Benchmark context.
+    :type context: dict
+    :param requests: Number of listings (capped to 10, a listing reads all links, page by page).
+    :type requests: int
+    :return: Latency percentiles (milliseconds) of listings, listed urls and throughput (urls per second).
+    :rtype: dict
+    """
+    client = context['app'].test_client()
+    latencies = []
+    listed = 0
+    for _ in range(min(requests, 10)):
+        start = perf_counter()
+        listed, cursor = 0, 0
+        while cursor is not None:
+            response = client.get('/api/urls/', headers={API_KEY_HEADER: context['api_key']},
+                                  query_string={'all': True, 'cursor': cursor, 'count': URL_LIST_MAX_COUNT})
+            if response.status_code != 200:
+                break
+            listed += len(response.json['urls'])
+            cursor = response.json['next_cursor']
+        latencies.append(perf_counter() - start)
+    return {**_percentiles(latencies), 'urls': listed, **_throughput(listed * len(latencies), sum(latencies))}
+
+
+def bench_login(context: dict, requests: int) -> dict:
+    """Benchmark login throughput (bcrypt cost factor is BCRYPT_LOG_ROUNDS).
+
+    :param context: Benchmark context.
+    :type context: dict
+    :param requests: Number of logins (capped to 50, a login costs a bcrypt check).
+    :type requests: int
+    :return: Latency percentiles (milliseconds) and throughput.
+    :rtype: dict
+    """
+    client = context['app'].test_client()
+    latencies = []
+    for _ in range(min(requests, 50)):
+        start = perf_counter()
+        client.post('/api/auth/', json={'username': context['username'], 'password': context['password']})
+        latencies.append(perf_counter() - start)
+    return {**_percentiles(latencies), 'rounds': context['app'].config.get('BCRYPT_LOG_ROUNDS'),
+            **_throughput(len(latencies), sum(latencies))}
+
+
+BENCHMARKS: Final[dict[str, Callable[[dict, int], dict]]] = {
+    'resolve': bench_resolve,
+    'insert': bench_insert,
+    'list': bench_list,
+    'login': bench_login
+}
+
+
+def get_fake_provider() -> type:
+    """Get the in-process Redis stand-in provider class (to pass as REDIS_PROVIDER_CLASS).
+
+    :return: Provider class.
+    :rtype: type
+    """
+    try:
+        from fakeredis import FakeStrictRedis  # pylint: disable=import-outside-toplevel
+    except ImportError as error:
+        raise Exception('Install fakeredis[lua] to run benchmarks against an in-process Redis stand-in') from error
+
+    class FakeRedis(FakeStrictRedis):  # pylint: disable=too-many-ancestors
+        """Class to create the in-process Redis stand-in, whatever the url."""
+
+        @classmethod
+        def from_url(cls, *_, **kwargs):
+            """Create the in-process Redis stand-in.
+
+            :param kwargs: Client options (pool and connection ones are ignored).
+            :return: Client.
+            :rtype: FakeRedis
+            """
+            return cls(decode_responses=kwargs.get('decode_responses', False))
+
+    return FakeRedis
+
+
+def _percentiles(latencies: list[float]) -> dict[str, float]:
+    """Get latency percentiles.
+
+    :param latencies: Latencies, in seconds.
+    :type latencies: list[float]
+    :return: Mean, p50, p90, p99 and max latencies, in milliseconds.
+    :rtype: dict[str, float]
+    """
+    if not latencies:
+        return {}
+    latencies = sorted(latencies)
+    result = {'mean_ms': mean(latencies)}
+    for name, percentile in (('p50_ms', 0.5), ('p90_ms', 0.9), ('p99_ms', 0.99), ('max_ms', 1.0)):
+        result[name] = latencies[min(int(len(latencies) * percentile), len(latencies) - 1)]
+    return {name: round(value * 1000, 3) for name, value in result.items()}
+
+
+def _throughput(operations: int, seconds: float) -> dict[str, float]:
+    """Get throughput.
+
+    :param operations: Number of operations.
+    :type operations: int
+    :param seconds: Elapsed time, in seconds.
+    :type seconds: float
+    :return: Operations per second.
+    :rtype: dict[str, float]
+    """
+    return {'per_second': round(operations / seconds, 1) if seconds > 0 else 0.0}
+
+
+# region CLI functions
+@command('bench', help='Seed links and run benchmarks (on a dedicated Redis database or --fake).')
+@option('-l', '--links', type=INT, default=10000, show_default=True, help='Specify the number of links to seed.')
+@option('-n', '--requests', type=INT, default=1000, show_default=True, help='Specify requests per benchmark.')
+@option('-b', '--benchmark', 'benchmarks', type=Choice(list(BENCHMARKS)), multiple=True,
+        help='Specify a benchmark to run (repeatable, default: all).')
+@option('--fake', is_flag=True, help='Run against an in-process Redis stand-in (requires fakeredis[lua]).')
+@option('-r', '--redis-url', type=STRING, default=None,
+        help='Specify the Redis database to run against (a dedicated one: benchmarks write urls and their changes).')
+@option('-o', '--output', type=Choice(['text', 'json']), default='text', show_default=True,
+        help='Specify the output format.')
+@option('-f', '--file', type=STRING, default=None, help='Specify a file to write JSON results to.')
+@with_appcontext
+def bench(links: int, requests: int, benchmarks: tuple[str], fake: bool, redis_url: str | None, output: str,
+          file: str | None):  # pylint: disable=too-many-arguments
+    """Seed links and run benchmarks.
+
+    :param links: Number of links to seed.
+    :type links: int
+    :param requests: Number of requests per benchmark.
+    :type requests: int
+    :param benchmarks: Benchmarks to run.
+    :type benchmarks: tuple[str]
+    :param fake: Run against an in-process Redis stand-in.
+    :type fake: bool
+    :param redis_url: Redis database to run against.
+    :type redis_url: str | None
+    :param output: Output format ('text' or 'json').
+    :type output: str
+    :param file: File to write JSON results to.
+    :type file: str | None
+    """
+    if not fake and redis_url is None:
+        raise UsageError('Pass --fake or --redis-url: benchmarks never run against the configured Redis database.')
+    options = {**current_app.config, 'REDIS_URL': 'fake://' if fake else redis_url,
+               'REDIS_PROVIDER_CLASS': get_fake_provider() if fake else None}
+    results = run_benchmarks(create_app(options), links, requests, list(benchmarks or BENCHMARKS))
+    results['backend'] = 'fake' if fake else 'redis'
+    if file is not None:
+        with open(file, 'w', encoding='utf8') as json_file:
+            json_file.write(dumps(results, indent=2))
+    if output == 'json':
+        print(dumps(results))
+        return
+    for name, result in results.items():
+        if isinstance(result, dict):
+            print(f'{name}: ' + ', '.join(f'{metric}={value}' for metric, value in result.items()))
+        else:
+            print(f'{name}: {result}')
+# endregion
@@ -0,0 +1,117 @@
+# coding=utf-8
+
+"""shortipy.services.breaker file."""
+
+from typing import Final, Any, Callable
+from threading import Lock
+from time import monotonic
+
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+BREAKER_CLOSED: Final = 'closed'
+BREAKER_OPEN: Final = 'open'
+BREAKER_HALF_OPEN: Final = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Exception raised when a call is rejected by an open circuit breaker."""
+
+    def __init__(self, retry_after: float):
+        """CircuitOpenError constructor.
+
+        :param retry_after: Seconds until the next probe is allowed.
+        :type retry_after: float
+        """
+        super().__init__('Circuit breaker is open')
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Class to stop calling a failing backend: after a number of consecutive failures the circuit opens and calls
+    fail fast; after the reset timeout a single probe call is allowed (half-open) and its outcome closes or reopens
+    the circuit.
+    """
+
+    def __init__(self, errors: tuple[type[Exception], ...] = (RedisConnectionError, RedisTimeoutError)):
+        """CircuitBreaker constructor.
+
+        :param errors: Exceptions counted as backend failures (default: Redis connection errors and timeouts).
+        :type errors: tuple[type[Exception], ...]
+        """
+        self.errors = errors
+        self.enabled = True
+        self.failure_threshold = 5
+        self.reset_timeout = 5.0
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._lock = Lock()
+        self._opened_at = 0.0
+        self._probing = False
+
+    def reset(self):
+        """Close the circuit and reset statistics."""
+        with self._lock:
+            self.state = BREAKER_CLOSED
+            self.failures = 0
+            self.opened = 0
+            self.rejected = 0
+            self._probing = False
+
+    def call(self, function: Callable[..., Any], *args) -> Any:
+        """Call function through the circuit breaker.
+
+        :param function: Function to call.
+        :type function: Callable[..., Any]
+        :param args: Function arguments.
+        :return: Function result.
+        :rtype: Any
+        :raises CircuitOpenError: If the circuit is open (or half-open with a probe already in flight).
+        """
+        if not self.enabled:
+            return function(*args)
+
+        with self._lock:
+            probe = False
+            if self.state != BREAKER_CLOSED:
+                retry_after = self._opened_at + self.reset_timeout - monotonic()
+                if retry_after > 0 or self._probing:
+                    self.rejected += 1
+                    raise CircuitOpenError(max(retry_after, 0.0))
+                self.state = BREAKER_HALF_OPEN
+                self._probing = probe = True
+
+        try:
+            result = function(*args)
+        except self.errors:
+            with self._lock:
+                self.failures += 1
+                if probe or (self.state == BREAKER_CLOSED and self.failures >= self.failure_threshold):
+                    self._open()
+            raise
+        finally:
+            if probe:
+                with self._lock:
+                    self._probing = False
+
+        with self._lock:
+            self.failures = 0
+            if probe:
+                self.state = BREAKER_CLOSED
+        return result
+
+    def get_stats(self) -> dict[str, Any]:
+        """Get circuit breaker statistics.
+
+        :return: State, consecutive failures, times opened and calls rejected.
+        :rtype: dict[str, Any]
+        """
+        with self._lock:
+            return {'state': self.state, 'failures': self.failures, 'opened': self.opened, 'rejected': self.rejected}
+
+    def _open(self):
+        """Open the circuit (lock must be held)."""
+        self.state = BREAKER_OPEN
+        self.opened += 1
+        self._opened_at = monotonic()
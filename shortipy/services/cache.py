@@ -0,0 +1,99 @@
+# coding=utf-8
+
+"""shortipy.services.cache file."""
+
+from typing import Any, Callable
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+
+class LocalCache:
+    """Class to manage a small in-process LRU cache whose entries expire after a time to live."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0):
+        """LocalCache constructor.
+
+        :param max_size: Maximum number of entries (default: 1024).
+        :type max_size: int
+        :param ttl: Entries time to live, in seconds (default: 60.0).
+        :type ttl: float
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = Lock()
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        """Get number of entries.
+
+        :return: Number of entries (expired ones included).
+        :rtype: int
+        """
+        return len(self._entries)
+
+    def get(self, key: str, default: Any = None, max_age: float | None = None) -> Any:
+        """Get a not expired entry.
+
+        :param key: Entry key.
+        :type key: str
+        :param default: Value returned if entry is missing or expired (default: None).
+        :type default: Any
+        :param max_age: Maximum entry age, in seconds, if stricter than the time to live;
+            older entries are not returned, but kept (default: None).
+        :type max_age: float | None
+        :return: Entry value.
+        :rtype: Any
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            age = monotonic() - entry[1]
+            if age > self.ttl:
+                del self._entries[key]
+                return default
+            if max_age is not None and age > max_age:
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: Any):
+        """Set entry, evicting the least recently used one if full.
+
+        :param key: Entry key.
+        :type key: str
+        :param value: Entry value.
+        :type value: Any
+        """
+        if self.max_size < 1:
+            return
+        with self._lock:
+            self._entries[key] = (value, monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        """Delete entry (if present).
+
+        :param key: Entry key.
+        :type key: str
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[str, Any], bool]):
+        """Delete all entries matching predicate.
+
+        :param predicate: Function receiving entry key and value, returning True to delete it.
+        :type predicate: Callable[[str, Any], bool]
+        """
+        with self._lock:
+            for key in [key for key, (value, _) in self._entries.items() if predicate(key, value)]:
+                del self._entries[key]
+
+    def clear(self):
+        """Delete all entries."""
+        with self._lock:
+            self._entries.clear()
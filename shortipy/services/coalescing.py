@@ -0,0 +1,83 @@
+# coding=utf-8
+
+"""shortipy.services.coalescing file."""
+
+from typing import Any, Callable
+from threading import Event, Lock
+
+
+class _Call:  # pylint: disable=too-few-public-methods
+    """Class to hold an in-flight call."""
+
+    def __init__(self):
+        """_Call constructor."""
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Class to collapse concurrent calls for the same key into a single backend call."""
+
+    def __init__(self):
+        """SingleFlight constructor."""
+        self.enabled = True
+        self.calls = 0
+        self.collapsed = 0
+        self._lock = Lock()
+        self._in_flight: dict[str, _Call] = {}
+
+    def run(self, key: str, function: Callable[..., Any], *args) -> Any:
+        """Call function once for all the concurrent callers asking for the same key.
+
+        :param key: Key identifying the call.
+        :type key: str
+        :param function: Function to call.
+        :type function: Callable[..., Any]
+        :param args: Function arguments.
+        :return: Function result (shared between concurrent callers).
+        :rtype: Any
+        """
+        if not self.enabled:
+            return function(*args)
+
+        with self._lock:
+            call = self._in_flight.get(key)
+            follower = call is not None
+            if follower:
+                self.collapsed += 1
+            else:
+                call = self._in_flight[key] = _Call()
+                self.calls += 1
+
+        if follower:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function(*args)
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+        return call.result
+
+    def get_stats(self) -> dict[str, int]:
+        """Get coalescing statistics.
+
+        :return: Number of backend calls executed and number of calls collapsed into them.
+        :rtype: dict[str, int]
+        """
+        with self._lock:
+            return {'calls': self.calls, 'collapsed': self.collapsed, 'in_flight': len(self._in_flight)}
+
+    def reset_stats(self):
+        """Reset coalescing statistics."""
+        with self._lock:
+            self.calls = 0
+            self.collapsed = 0
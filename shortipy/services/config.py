@@ -19,12 +19,112 @@ class Config:  # pylint: disable=too-few-public-methods
 
         # Flask JWT Extended
         self.JWT_SECRET_KEY = None
+        self.JWT_REVOCATION_SYNC_INTERVAL = 5.0
+
+        # Flask Bcrypt
+        self.BCRYPT_LOG_ROUNDS = 12
+
+        # Hash pool
+        self.HASH_POOL_WORKERS = 2
+        self.HASH_POOL_QUEUE_SIZE = 16
+
+        # Cooperative mode for gevent workers (requires gevent monkey patching, e.g. "gunicorn -k gevent"):
+        # password checks run in the hub thread pool and the Redis pool is bounded (REDIS_MAX_CONNECTIONS default: 64)
+        self.COOPERATIVE_MODE = False
+
+        # API keys
+        self.API_KEY_CACHE_SIZE = 1024
+        self.API_KEY_CACHE_TTL = 60.0
 
         # Flask Redis
         self.REDIS_URL = 'redis://127.0.0.1:6379/0'
+        self.REDIS_SOCKET_TIMEOUT = 2.0  # Seconds (None to wait forever)
+        self.REDIS_SOCKET_CONNECT_TIMEOUT = 1.0
+        self.REDIS_SOCKET_KEEPALIVE = True
+        self.REDIS_HEALTH_CHECK_INTERVAL = 30  # Seconds idle before a connection is checked (0 to disable)
+        self.REDIS_RETRIES = 1  # Retries on connection errors and timeouts, with exponential backoff (seconds)
+        self.REDIS_RETRY_BACKOFF_BASE = 0.01
+        self.REDIS_RETRY_BACKOFF_CAP = 0.5
+        self.REDIS_MAX_CONNECTIONS = None  # Bounded (blocking) pool if set
+        self.REDIS_POOL_TIMEOUT = 5.0  # Seconds to wait for a free connection of a bounded pool
+        self.REDIS_POOL_PREWARM = 2  # Connections opened at startup (and in forked workers)
+        self.REDIS_PROVIDER_CLASS = None  # Client class replacing the instrumented one (e.g. in-process stand-in)
+
+        # Circuit breaker on url resolution: opens after consecutive Redis failures, probes after reset timeout;
+        # while open, last-known-good resolutions (up to stale max age seconds old) are served
+        self.BREAKER_ENABLED = True
+        self.BREAKER_FAILURE_THRESHOLD = 5
+        self.BREAKER_RESET_TIMEOUT = 5.0
+        self.BREAKER_STALE_MAX_AGE = 300.0
+
+        # Local url cache (last-known-good resolutions): served without calling Redis if fresher than TTL seconds
+        # (0 to only serve it while Redis is down); warm-up preloads the most resolved urls at startup.
+        # Writes only drop the writing process's entry, so TTL also bounds how long other processes may serve a
+        # changed or deleted url
+        self.URL_CACHE_SIZE = 10000
+        self.URL_CACHE_TTL = 0
+        self.URL_HITS_ENABLED = None  # Count resolutions in the hot keys sorted set (None: if URL_WARMUP_SIZE is set)
+        self.URL_HITS_FLUSH_INTERVAL = 10.0
+        self.URL_HITS_MAX_KEYS = 10000
+        self.URL_HITS_DECAY_INTERVAL = 3600.0  # Seconds between hit count decays (0 to disable)
+        self.URL_HITS_DECAY_FACTOR = 0.5
+        self.URL_WARMUP_SIZE = 0  # Most resolved urls preloaded at startup (0 to disable)
+        self.URL_WARMUP_BATCH_SIZE = 500
+        self.URL_WARMUP_TIMEOUT = 10.0  # Seconds before ready is reported anyway
+
+        # Health checks ("/healthz" and "/readyz"): readiness reads a background Redis probe (seconds)
+        self.HEALTH_ENABLED = True
+        self.HEALTH_PROBE_INTERVAL = 1.0
+        self.HEALTH_PROBE_MAX_AGE = 5.0
+
+        # Rate limiting: limits are capacity and refill rate (tokens per second), by endpoint or blueprint
+        self.RATELIMIT_ENABLED = False
+        self.RATELIMIT_LIMITS = {
+            'resolution.resolve': (100, 50.0),
+            'api': (30, 5.0)
+        }
+        # Local pre-check: each process admits its share of the tokens above the threshold (of the capacity), split
+        # by the processes count, for max age seconds; with more processes the limit is overshot (see RateLimiter)
+        self.RATELIMIT_LOCAL_THRESHOLD = 0.5
+        self.RATELIMIT_LOCAL_MAX_AGE = 1.0
+        self.RATELIMIT_LOCAL_PROCESSES = 1
+        self.RATELIMIT_LOCAL_SIZE = 10000  # Local bucket views kept (least recently used evicted)
+        self.RATELIMIT_LOCAL_TTL = 60.0
+
+        # Metrics (multi-process directory is needed to aggregate gunicorn workers)
+        self.METRICS_ENABLED = False
+        self.METRICS_MULTIPROCESS_DIR = None
+        self.METRICS_FLUSH_INTERVAL = 1.0
+
+        # Requests profiling: Redis commands accounting, slow requests log and "Server-Timing" header
+        self.PROFILING_ENABLED = False
+        self.SLOW_REQUEST_THRESHOLD_MS = 500
+        self.SERVER_TIMING_ENABLED = False
+
+        # Urls
+        self.URL_COALESCING = True
+        self.URL_PURGE_HOOK = None  # Callable (or import string) called with the key of updated/deleted urls
+        self.URL_STREAM_MAXLEN = 100000  # Url changes kept (approximately) in the change stream (0 to disable it)
+        self.URL_TOMBSTONES_MAXLEN = 100000  # Deleted keys kept for incremental map compiles (older: full compile)
+        self.URL_CREATED_INDEX = False  # Index inserted urls by creation time ("flask urls index-created" to backfill)
+        self.URL_KEY_ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
+        self.URL_KEY_LENGTH = 6  # Initial (and minimum) key length
+        self.URL_KEY_MAX_LENGTH = 12
+        self.URL_KEY_GROW_THRESHOLD = 0.0  # Occupancy (taken keys ratio) growing the key length by one (0 to disable)
+        self.URL_KEYSPACE_SYNC_INTERVAL = 10.0  # Seconds between key length and key counts reads
+        self.URL_SEARCH_INDEX = False  # Index url values by domain and trigrams ("flask urls index-search" to backfill)
+
+        # Shared-memory url table, read by all workers of a host and populated by "flask urls shm-refresh"
+        self.URL_SHM_ENABLED = False
+        self.URL_SHM_PATH = '/dev/shm/shortipy_urls'
+        self.URL_SHM_SLOTS = 65536
+        self.URL_SHM_SLOT_SIZE = 512  # Bytes: longer urls are not shared
+        self.URL_SHM_RESYNC_INTERVAL = 300.0
+        self.URL_SHM_MAX_AGE = 10.0  # Seconds: readers fall back to Redis if the refresher heartbeat is older
 
         # Flask Marshmallow
         self.JSON_SORT_KEYS = False
+        self.JSON_PROVIDER = 'default'  # Or 'orjson' (requires orjson)
 
     def get_dict(self) -> dict:
         """Get Config dict.
@@ -0,0 +1,51 @@
+# coding=utf-8
+
+"""shortipy.services.cooperative file."""
+
+from typing import Final, Any, Callable
+
+from flask import Flask
+
+try:
+    from gevent import get_hub
+    from gevent.monkey import is_module_patched
+except ImportError:  # pragma: no cover
+    get_hub = is_module_patched = None
+
+# Modules whose blocking calls must yield to the gevent hub: Redis sockets, pool locks and queues, sleeps.
+PATCHED_MODULES: Final = ('socket', 'select', 'threading', 'queue', 'time')
+COOPERATIVE_REDIS_MAX_CONNECTIONS: Final = 64
+
+
+def init_app(app: Flask) -> Flask:
+    """Initializes the cooperative (gevent) mode, before Redis: gevent monkey patching is checked, so that Redis
+    calls yield to the hub, and the Redis pool is bounded (REDIS_MAX_CONNECTIONS, default: 64), so that greenlets
+    wait for a free connection instead of opening one each.
+
+    :param app: The Flask application instance.
+    :type app: Flask
+    :return: The Flask application instance.
+    :rtype: Flask
+    """
+    if is_module_patched is None:
+        raise Exception('Install gevent to use COOPERATIVE_MODE')
+    unpatched = [module for module in PATCHED_MODULES if not is_module_patched(module)]
+    if unpatched:
+        raise Exception(f'COOPERATIVE_MODE requires gevent monkey patching before shortipy is imported '
+                        f'(e.g. "gunicorn -k gevent"), modules not patched: {", ".join(unpatched)}')
+    if app.config.get('REDIS_MAX_CONNECTIONS') is None:
+        app.config['REDIS_MAX_CONNECTIONS'] = COOPERATIVE_REDIS_MAX_CONNECTIONS
+    return app
+
+
+def run_off_hub(function: Callable[..., Any], *args) -> Any:
+    """Run CPU-bound function in a native thread of the gevent hub thread pool, so that the hub keeps switching
+    greenlets meanwhile (the function should release the GIL, as bcrypt does).
+
+    :param function: Function to call.
+    :type function: Callable[..., Any]
+    :param args: Function arguments.
+    :return: Function result.
+    :rtype: Any
+    """
+    return get_hub().threadpool.apply(function, args)
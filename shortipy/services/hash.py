@@ -2,14 +2,125 @@
 
 """shortipy.services.hash file."""
 
+from typing import Any, Callable
 from hashlib import sha256
+from os import getpid
+from secrets import token_hex
+from threading import BoundedSemaphore, Lock
+from concurrent.futures import ProcessPoolExecutor
 
 from flask import Flask
 from flask_bcrypt import Bcrypt
+from werkzeug.exceptions import ServiceUnavailable
+
+from shortipy.services.cooperative import run_off_hub
+from shortipy.services.redis import fork_without_prewarm
 
 bcrypt = Bcrypt()
 
 
+class HashPool:
+    """Class to run bcrypt password checks in a bounded process pool, off the request threads
+    (or in the gevent hub thread pool, off the hub, in cooperative mode).
+    """
+
+    def __init__(self):
+        """HashPool constructor."""
+        self.workers = 0
+        self.queue_size = 0
+        self.rounds = 12
+        self.offload: Callable[..., Any] | None = None
+        self._slots = BoundedSemaphore(1)
+        self._lock = Lock()
+        self._executor: ProcessPoolExecutor | None = None
+        self._pid: int | None = None
+        self._dummy_hash: bytes | None = None
+        self._dummy_hashes: dict[int, bytes] = {}
+
+    def init_app(self, app: Flask):
+        """Initializes the hash pool, generating the dummy hash up front (once per cost factor), so that the first
+        unknown user login does not take longer than the others.
+
+        :param app: The Flask application instance.
+        :type app: Flask
+        """
+        self.shutdown()
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.workers = app.config.get('HASH_POOL_WORKERS', 2)
+        self.queue_size = app.config.get('HASH_POOL_QUEUE_SIZE', 16)
+        self.offload = run_off_hub if app.config.get('COOPERATIVE_MODE') else None
+        self._slots = BoundedSemaphore(max(self.workers, 1) + self.queue_size)
+        dummy_hash = self._dummy_hashes.get(self.rounds)
+        if dummy_hash is None:
+            dummy_hash = bcrypt.generate_password_hash(token_hex(16), self.rounds)
+            self._dummy_hashes[self.rounds] = dummy_hash
+        self._dummy_hash = dummy_hash
+
+    def check_password_hash(self, pw_hash: str | bytes | None, password: str | bytes) -> bool:
+        """Check password against its bcrypt hash.
+        A missing hash is checked against the dummy one, so unknown users take the same time as known ones.
+
+        :param pw_hash: Password hash (None if the user is unknown).
+        :type pw_hash: str | bytes | None
+        :param password: Password to check.
+        :type password: str | bytes
+        :return: True if password matches the hash, otherwise False.
+        :rtype: bool
+        """
+        slots = self._slots
+        # Non-blocking acquire, released in finally: saturated pools fail fast instead of queuing more logins.
+        if not slots.acquire(blocking=False):  # pylint: disable=consider-using-with
+            raise ServiceUnavailable('Too many login attempts in progress, retry later')
+        try:
+            if pw_hash is None:
+                self._check(self._dummy_hash, password)
+                return False
+            return self._check(pw_hash, password)
+        finally:
+            slots.release()
+
+    def shutdown(self):
+        """Shutdown the process pool (if started)."""
+        with self._lock:
+            if self._executor is not None and self._pid == getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._pid = None
+
+    def _check(self, pw_hash: str | bytes, password: str | bytes) -> bool:
+        """Check password against its hash, off the gevent hub in cooperative mode, or in the process pool if enabled.
+
+        :param pw_hash: Password hash.
+        :type pw_hash: str | bytes
+        :param password: Password to check.
+        :type password: str | bytes
+        :return: True if password matches the hash, otherwise False.
+        :rtype: bool
+        """
+        if self.offload is not None:
+            return self.offload(bcrypt.check_password_hash, pw_hash, password)
+        if self.workers < 1:
+            return bcrypt.check_password_hash(pw_hash, password)
+        executor = self._get_executor()
+        # Pool processes are forked on demand by submit: they never use Redis, so they skip its pool pre-warming.
+        return fork_without_prewarm(executor.submit, bcrypt.check_password_hash, pw_hash, password).result()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Get the process pool, (re)creating it lazily in the current process (e.g. after a worker fork).
+
+        :return: Process pool.
+        :rtype: ProcessPoolExecutor
+        """
+        with self._lock:
+            if self._executor is None or self._pid != getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = getpid()
+            return self._executor
+
+
+hash_pool = HashPool()
+
+
 def init_app(app: Flask) -> Flask:
     """Initializes the application hash.
 
@@ -19,6 +130,7 @@ def init_app(app: Flask) -> Flask:
     :rtype: Flask
     """
     bcrypt.init_app(app)
+    hash_pool.init_app(app)
     return app
 
 
@@ -0,0 +1,120 @@
+# coding=utf-8
+
+"""shortipy.services.health file."""
+
+from typing import Any
+from os import getpid
+from threading import Event, Lock, Thread
+from time import monotonic, perf_counter
+
+from flask import Flask
+from redis.exceptions import RedisError
+
+from shortipy.services.redis import redis_client, get_pool_stats
+from shortipy.services.breaker import BREAKER_OPEN
+from shortipy.services.url import url_breaker
+from shortipy.services.warmup import warm_up
+
+
+class HealthProbe:
+    """Class to ping Redis in background, so that health checks read the last result and never call Redis.
+    The probe belongs to the application initialized last: initializing one stops the probe of the previous one.
+    """
+
+    def __init__(self):
+        """HealthProbe constructor."""
+        self.interval = 1.0
+        self.max_age = 5.0
+        self._lock = Lock()
+        self._pid: int | None = None
+        self._stopped = Event()
+        self._result: dict[str, Any] | None = None
+
+    def start(self):
+        """Probe once and start the background probe thread, if not already running in this process
+        (threads do not survive a fork)."""
+        with self._lock:
+            if self._pid == getpid():
+                return
+            self._pid = getpid()
+            self._stopped = Event()
+        self.probe()
+        Thread(target=self._run, args=(self._stopped,), daemon=True).start()
+
+    def stop(self):
+        """Stop the background probe thread (if running) and forget the last result."""
+        with self._lock:
+            self._stopped.set()
+            self._pid = None
+            self._result = None
+
+    def probe(self):
+        """Ping Redis and store the result."""
+        start = perf_counter()
+        try:
+            redis_client.ping()
+            error = None
+        except RedisError as exception:
+            error = str(exception)
+        self._result = {'ok': error is None, 'latency': perf_counter() - start, 'error': error,
+                        'checked_at': monotonic()}
+
+    def get_status(self) -> dict[str, Any]:
+        """Get the last probe result.
+
+        :return: Whether Redis is reachable (and the probe recent), ping latency and age (in milliseconds)
+            and error (if any).
+        :rtype: dict[str, Any]
+        """
+        result = self._result
+        if result is None:
+            return {'ok': False, 'latency_ms': None, 'age_ms': None, 'error': 'Not probed yet'}
+        age = monotonic() - result['checked_at']
+        return {'ok': result['ok'] and age <= self.max_age, 'latency_ms': round(result['latency'] * 1000, 3),
+                'age_ms': round(age * 1000, 3), 'error': result['error']}
+
+    def _run(self, stopped: Event):
+        """Probe periodically, until stopped (probe thread).
+
+        :param stopped: Stop event.
+        :type stopped: Event
+        """
+        while not stopped.wait(self.interval):
+            self.probe()
+
+
+health_probe = HealthProbe()
+
+
+def init_app(app: Flask) -> Flask:
+    """Initializes the application health checks.
+
+    :param app: The Flask application instance.
+    :type app: Flask
+    :return: The Flask application instance.
+    :rtype: Flask
+    """
+    health_probe.stop()
+    health_probe.interval = app.config.get('HEALTH_PROBE_INTERVAL', 1.0)
+    health_probe.max_age = app.config.get('HEALTH_PROBE_MAX_AGE', 5.0)
+
+    from shortipy.controllers.health import health_blueprint  # pylint: disable=import-outside-toplevel
+    app.register_blueprint(health_blueprint)
+    return app
+
+
+def get_readiness() -> tuple[bool, dict[str, Any]]:
+    """Get readiness from the last Redis probe, the circuit breaker and the cache warm-up, with no Redis call.
+
+    :return: True if ready, otherwise False, and checks.
+    :rtype: tuple[bool, dict[str, Any]]
+    """
+    health_probe.start()
+    checks = {
+        'redis': health_probe.get_status(),
+        'breaker': url_breaker.get_stats(),
+        'warmup': warm_up.get_stats(),
+        'pool': get_pool_stats()
+    }
+    ready = checks['redis']['ok'] and checks['breaker']['state'] != BREAKER_OPEN and checks['warmup']['ready']
+    return ready, checks
@@ -0,0 +1,120 @@
+# coding=utf-8
+
+"""shortipy.services.hits file."""
+
+from collections import Counter
+from os import getpid
+from threading import Event, Lock, Thread
+from time import monotonic
+
+from redis.exceptions import RedisError
+
+from shortipy.services.redis import redis_client
+
+
+class HitCounter:
+    """Class to count hits by key in a Redis sorted set, through a local counter flushed periodically by a background
+    thread (started by the first hit of each process), so that counting costs no Redis call in requests.
+    The sorted set is trimmed to the most hit keys, and its scores are multiplied by the decay factor every decay
+    interval (by one process: a Redis key marks the last decay), so that keys no longer hit lose their rank.
+    """
+
+    def __init__(self, key: str):
+        """HitCounter constructor.
+
+        :param key: Sorted set key.
+        :type key: str
+        """
+        self.key = key
+        self.enabled = True
+        self.flush_interval = 10.0
+        self.max_keys = 10000
+        self.decay_interval = 3600.0
+        self.decay_factor = 0.5
+        self._lock = Lock()
+        self._hits: Counter[str] = Counter()
+        self._decayed_at = monotonic()
+        self._stopped = Event()
+        self._pid: int | None = None
+
+    def hit(self, member: str):
+        """Count a hit, starting the flushing thread if not running in this process (e.g. after a worker fork).
+
+        :param member: Hit key.
+        :type member: str
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._hits[member] += 1
+            if self._pid != getpid():
+                self._pid = getpid()
+                self._stopped = Event()
+                Thread(target=self._run, args=(self._stopped,), daemon=True).start()
+
+    def stop(self):
+        """Stop the flushing thread (the next hit starts a new one), dropping hits not flushed."""
+        with self._lock:
+            self._stopped.set()
+            self._pid = None
+            self._hits = Counter()
+
+    def flush(self) -> int:
+        """Add the local counter to the sorted set, with a single Redis call.
+        Hits are dropped if Redis is unavailable.
+
+        :return: Number of keys flushed.
+        :rtype: int
+        """
+        with self._lock:
+            hits, self._hits = self._hits, Counter()
+        if self.decay_interval > 0 and monotonic() - self._decayed_at >= self.decay_interval:
+            self.decay()
+        if not hits:
+            return 0
+        try:
+            with redis_client.pipeline(transaction=False) as pipeline:
+                for member, count in hits.items():
+                    pipeline.zincrby(self.key, count, member)
+                pipeline.zremrangebyrank(self.key, 0, -self.max_keys - 1)
+                pipeline.execute()
+        except RedisError:
+            return 0
+        return len(hits)
+
+    def decay(self) -> bool:
+        """Multiply scores by the decay factor, unless another process did it within the decay interval.
+        Decay is skipped if Redis is unavailable.
+
+        :return: True if scores were decayed, otherwise False.
+        :rtype: bool
+        """
+        self._decayed_at = monotonic()
+        try:
+            if not redis_client.set(f'{self.key}:decayed', 1, nx=True, px=max(int(self.decay_interval * 1000), 1)):
+                return False
+            redis_client.zunionstore(self.key, {self.key: self.decay_factor})
+        except RedisError:
+            return False
+        return True
+
+    def _run(self, stopped: Event):
+        """Flush the local counter every flush interval, until stopped (flushing thread).
+
+        :param stopped: Stop event.
+        :type stopped: Event
+        """
+        while not stopped.wait(self.flush_interval):
+            self.flush()
+
+    def top(self, count: int) -> list[str]:
+        """Get the most hit keys.
+
+        :param count: Number of keys.
+        :type count: int
+        :return: Keys, most hit first.
+        :rtype: list[str]
+        """
+        if count < 1:
+            return []
+        return redis_client.zrevrange(self.key, 0, count - 1)
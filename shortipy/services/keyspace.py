@@ -0,0 +1,156 @@
+# coding=utf-8
+
+"""shortipy.services.keyspace file."""
+
+from typing import Final, Iterable
+from collections import Counter
+from random import SystemRandom
+from string import ascii_lowercase
+from threading import Lock
+from time import monotonic
+
+from redis.exceptions import RedisError
+
+from shortipy.services.redis import redis_client
+
+KEYSPACE_MAX_ATTEMPTS: Final = 10  # Inserts taking more attempts are counted with this many.
+
+
+class KeySpace:
+    """Class to generate random keys and track how full their space is.
+    Key counts by key length are kept in a Redis hash by the write scripts, insert attempts are counted locally and
+    flushed periodically. The key length is shared through Redis: it grows once the occupancy of the current one
+    (the probability that a random key is taken) crosses the grow threshold.
+    Keys written before counting (e.g. before an upgrade) are counted only by a recount (a Redis key marks the counts
+    recounted, see the stats CLI command); until then negative counts are read as 0.
+    """
+
+    def __init__(self, length_key: str, counts_key: str, attempts_key: str):
+        """KeySpace constructor.
+
+        :param length_key: Key length key.
+        :type length_key: str
+        :param counts_key: Key counts (by key length) hash key.
+        :type counts_key: str
+        :param attempts_key: Insert attempts (by number of attempts) hash key.
+        :type attempts_key: str
+        """
+        self.length_key = length_key
+        self.counts_key = counts_key
+        self.attempts_key = attempts_key
+        self.counted_key = f'{counts_key}:counted'
+        self.alphabet = ascii_lowercase
+        self.min_length = 6
+        self.max_length = 12
+        self.grow_threshold = 0.0
+        self.sync_interval = 10.0
+        self.length = self.min_length
+        self.counts: dict[int, int] | None = None
+        self.recounted: bool | None = None
+        self.attempts: Counter[int] = Counter()
+        self._lock = Lock()
+        self._pending: Counter[int] = Counter()
+        self._synced_at: float | None = None
+
+    def reset(self):
+        """Reset local state (next key generation syncs with Redis)."""
+        with self._lock:
+            self.length = self.min_length
+            self.counts = None
+            self.attempts = Counter()
+            self._pending = Counter()
+            self._synced_at = None
+
+    def refresh(self):
+        """Sync with Redis if sync interval elapsed (before generating keys to insert)."""
+        if self._synced_at is None or monotonic() - self._synced_at >= self.sync_interval:
+            self.sync()
+
+    def generate(self) -> str:
+        """Generate a random key of the current key length (from the last sync, no Redis call).
+
+        :return: Key.
+        :rtype: str
+        """
+        randomizer = SystemRandom()
+        return ''.join(randomizer.choice(self.alphabet) for _ in range(self.length))
+
+    def record(self, attempts: int):
+        """Count an insert and the attempts it took.
+
+        :param attempts: Number of attempts (keys generated).
+        :type attempts: int
+        """
+        attempts = min(attempts, KEYSPACE_MAX_ATTEMPTS)
+        with self._lock:
+            self.attempts[attempts] += 1
+            self._pending[attempts] += 1
+
+    def sync(self):
+        """Flush insert attempts and read key length and key counts, with a single Redis call;
+        then grow the key length if the occupancy of the current one crossed the grow threshold.
+        The current key length is kept if Redis is unavailable.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._synced_at = monotonic()
+        try:
+            with redis_client.pipeline(transaction=False) as pipeline:
+                for attempts, count in pending.items():
+                    pipeline.hincrby(self.attempts_key, str(attempts), count)
+                pipeline.get(self.length_key)
+                pipeline.hgetall(self.counts_key)
+                pipeline.exists(self.counted_key)
+                *_, length, counts, counted = pipeline.execute()
+            self.counts = {int(key_length): max(int(count), 0) for key_length, count in counts.items()}
+            self.recounted = bool(counted)
+            self.length = min(max(int(length or 0), self.min_length), self.max_length)
+            if 0 < self.grow_threshold <= self.get_occupancy() and self.length < self.max_length:
+                self.length += 1
+                redis_client.set(self.length_key, self.length)
+        except RedisError:
+            return
+
+    def get_occupancy(self, length: int | None = None) -> float:
+        """Get the occupancy of the passed key length, from the last sync.
+
+        :param length: Key length (default: None, current key length).
+        :type length: int | None
+        :return: Ratio of taken keys (the probability that a random key is taken).
+        :rtype: float
+        """
+        length = self.length if length is None else length
+        return (self.counts or {}).get(length, 0) / len(self.alphabet) ** length
+
+    def recount(self, keys: Iterable[str]) -> dict[int, int]:
+        """Replace key counts with the counts of the passed keys (e.g. to include keys written before counting),
+        marking them as recounted. Counts are written to a temporary hash renamed over the counts, so that no count
+        written by the write scripts meanwhile lands in a half-replaced hash (writes during the scan itself are counted
+        as the scan finds them).
+
+        :param keys: All keys (may be a generator: keys are streamed).
+        :type keys: Iterable[str]
+        :return: Key counts by key length.
+        :rtype: dict[int, int]
+        """
+        counts = Counter(len(key) for key in keys)
+        with redis_client.pipeline() as pipeline:
+            if counts:
+                pipeline.hset(f'{self.counts_key}:recount', mapping=dict(counts))
+                pipeline.rename(f'{self.counts_key}:recount', self.counts_key)
+            else:
+                pipeline.delete(self.counts_key)
+            pipeline.set(self.counted_key, 1)
+            pipeline.execute()
+        self.counts = dict(counts)
+        self.recounted = True
+        return self.counts
+
+    def get_attempts(self) -> dict[int, int]:
+        """Get insert attempts histogram of all processes (flushed ones).
+
+        :return: Number of inserts by number of attempts.
+        :rtype: dict[int, int]
+        """
+        return dict(sorted((int(attempts), int(count))
+                           for attempts, count in redis_client.hgetall(self.attempts_key).items()))
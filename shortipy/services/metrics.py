@@ -0,0 +1,487 @@
+# coding=utf-8
+
+"""shortipy.services.metrics file."""
+
+from typing import Final, Callable
+from atexit import register as register_exit
+from bisect import bisect_left
+from fcntl import LOCK_EX, flock
+from glob import glob
+from json import dump, load
+from os import getpid, kill, makedirs, path, remove, replace
+from threading import Lock
+from time import monotonic, perf_counter
+
+from flask import Flask, Response, g, request
+
+from shortipy.services.redis import add_listener, get_pool_stats
+from shortipy.services.breaker import BREAKER_CLOSED, BREAKER_OPEN, BREAKER_HALF_OPEN
+from shortipy.services.url import url_flight, url_breaker, url_stale_stats, url_shm, url_keyspace
+
+METRICS_FILE_PREFIX: Final = 'metrics_'
+METRICS_ARCHIVE_FILE: Final = 'archive.json'  # Counters and histograms of exited processes.
+METRICS_ARCHIVE_LOCK_FILE: Final = 'archive.lock'
+DEFAULT_BUCKETS: Final = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Name: type and help.
+METRICS: Final = {
+    'shortipy_requests_total': ('counter', 'Requests handled, by endpoint, method and status.'),
+    'shortipy_request_duration_seconds': ('histogram', 'Request latency, by endpoint.'),
+    'shortipy_redis_command_duration_seconds': ('histogram', 'Redis command latency, by command.'),
+    'shortipy_redis_pool_connections': ('gauge', 'Redis connection pool connections, by state.'),
+    'shortipy_redis_pool_waits_total': ('counter', 'Waits for a free Redis connection (bounded pool).'),
+    'shortipy_redis_pool_wait_seconds_total': ('counter', 'Time spent waiting for a free Redis connection.'),
+    'shortipy_url_lookups_total': ('counter', 'Url lookups sent to Redis.'),
+    'shortipy_url_lookups_collapsed_total': ('counter', 'Url lookups collapsed into an in-flight one.'),
+    'shortipy_url_breaker_state': ('gauge', 'Url resolution circuit breaker state (1 for the current one).'),
+    'shortipy_url_breaker_opened_total': ('counter', 'Times the url resolution circuit breaker opened.'),
+    'shortipy_url_breaker_rejected_total': ('counter', 'Url lookups rejected by the open circuit breaker.'),
+    'shortipy_url_stale_total': ('counter', 'Last-known-good resolutions served while Redis was unavailable.'),
+    'shortipy_url_unavailable_total': ('counter', 'Url lookups failed while Redis was unavailable.'),
+    'shortipy_url_shm_lookups_total': ('counter', 'Url lookups in the shared-memory table, by result.'),
+    'shortipy_url_keys': ('gauge', 'Urls, by key length (as of the last key space sync).'),
+    'shortipy_url_key_length': ('gauge', 'Length of generated keys.'),
+    'shortipy_url_key_occupancy_ratio': ('gauge', 'Ratio of taken keys of the current key length.'),
+    'shortipy_url_insert_attempts_total': ('counter', 'Url inserts, by number of attempts (keys generated).')
+}
+# Gauges of state shared through Redis: every process reports (about) the same value, so they are not summed.
+SHARED_GAUGES: Final = frozenset(('shortipy_url_keys', 'shortipy_url_key_length', 'shortipy_url_key_occupancy_ratio'))
+
+Labels = tuple[tuple[str, str], ...]
+Samples = dict[str, dict[Labels, float]]
+Histograms = dict[str, dict[Labels, list]]
+
+
+class Metrics:
+    """Class to collect counters, gauges and histograms, and render them in the Prometheus text format.
+    With a multi-process directory, every process periodically dumps its snapshot there and the scrape
+    aggregates the snapshots of all processes (e.g. gunicorn workers). Snapshots of exited processes are moved
+    into an archive (by the scrape, or by the process itself at exit), where their counters and histograms keep
+    counting, so that totals never go backwards, even if a pid is reused.
+    """
+
+    def __init__(self):
+        """Metrics constructor."""
+        self.buckets = DEFAULT_BUCKETS
+        self.multiprocess_dir: str | None = None
+        self.flush_interval = 1.0
+        self.collectors: list[Callable[[], list[tuple[str, Labels, float]]]] = []
+        self._lock = Lock()
+        self._counters: dict[tuple[str, Labels], float] = {}
+        self._histograms: dict[tuple[str, Labels], list] = {}
+        self._flushed_at = 0.0
+        self._pid: int | None = None
+
+    def reset(self):
+        """Reset all metrics."""
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1.0):
+        """Increment counter.
+
+        :param name: Metric name.
+        :type name: str
+        :param labels: Metric labels (default: ()).
+        :type labels: Labels
+        :param value: Increment (default: 1.0).
+        :type value: float
+        """
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0.0) + value
+
+    def observe(self, name: str, labels: Labels, value: float):
+        """Observe value in histogram.
+
+        :param name: Metric name.
+        :type name: str
+        :param labels: Metric labels.
+        :type labels: Labels
+        :param value: Observed value.
+        :type value: float
+        """
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][bisect_left(self.buckets, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def snapshot(self) -> dict:
+        """Get a JSON serializable snapshot of this process metrics, gauges from collectors included.
+
+        :return: Snapshot.
+        :rtype: dict
+        """
+        gauges = [[name, list(labels), value] for collector in self.collectors for name, labels, value in collector()]
+        with self._lock:
+            return {
+                'pid': getpid(),
+                'buckets': list(self.buckets),
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), list(buckets), total, count]
+                               for (name, labels), (buckets, total, count) in self._histograms.items()],
+                'gauges': gauges
+            }
+
+    def flush(self, force: bool = False):
+        """Dump this process snapshot in the multi-process directory (at most once per flush interval).
+
+        :param force: Ignore flush interval (default: False).
+        :type force: bool
+        """
+        if self.multiprocess_dir is None or (not force and monotonic() - self._flushed_at < self.flush_interval):
+            return
+        self._flushed_at = monotonic()
+        filename = self._get_filename(getpid())
+        if self._pid != getpid():
+            # First flush of this process: a snapshot with its pid was left by an exited process (reused pid).
+            self._pid = getpid()
+            self.archive([filename])
+        with open(f'{filename}.tmp', 'w', encoding='utf8') as file:
+            dump(self.snapshot(), file)
+        replace(f'{filename}.tmp', filename)
+
+    def close(self):
+        """Flush this process snapshot and move it into the archive (at exit), if flushed before."""
+        if self.multiprocess_dir is None or self._pid != getpid():
+            return
+        self.flush(True)
+        self._pid = None
+        self.archive([self._get_filename(getpid())])
+
+    def archive(self, filenames: list[str]) -> int:
+        """Move snapshots of exited processes into the archive: their counters (collected ones included) and
+        histograms are added to the archive ones, their gauges are dropped. The archive is locked, so that
+        concurrent scrapes archive every snapshot once.
+
+        :param filenames: Snapshot filenames.
+        :type filenames: list[str]
+        :return: Number of snapshots archived.
+        :rtype: int
+        """
+        archive_filename = path.join(self.multiprocess_dir, METRICS_ARCHIVE_FILE)
+        with open(path.join(self.multiprocess_dir, METRICS_ARCHIVE_LOCK_FILE), 'w', encoding='utf8') as lock:
+            flock(lock, LOCK_EX)
+            snapshots = [snapshot for snapshot in map(_load_snapshot, filenames) if snapshot is not None]
+            if not snapshots:
+                return 0
+            archive = _load_snapshot(archive_filename)
+            if archive is not None:
+                snapshots.append(archive)
+            for snapshot in snapshots:
+                snapshot['counters'] = [*snapshot['counters'], *(
+                    sample for sample in snapshot['gauges'] if METRICS.get(sample[0], ('',))[0] == 'counter'
+                )]
+                snapshot['gauges'] = []
+            samples, histograms = _aggregate(snapshots)
+            with open(f'{archive_filename}.tmp', 'w', encoding='utf8') as file:
+                dump({
+                    'pid': None,
+                    'buckets': list(self.buckets),
+                    'counters': [[name, list(labels), value]
+                                 for name, metric in samples.items() for labels, value in metric.items()],
+                    'histograms': [[name, list(labels), buckets, total, count]
+                                   for name, metric in histograms.items()
+                                   for labels, (buckets, total, count) in metric.items()],
+                    'gauges': []
+                }, file)
+            replace(f'{archive_filename}.tmp', archive_filename)
+            for filename in filenames:
+                try:
+                    remove(filename)
+                except FileNotFoundError:
+                    pass
+        return len(snapshots) - (archive is not None)
+
+    def render(self) -> str:
+        """Render metrics in the Prometheus text format, aggregating all processes if multi-process.
+
+        :return: Metrics in the Prometheus text format.
+        :rtype: str
+        """
+        snapshots = [self.snapshot()]
+        if self.multiprocess_dir is not None:
+            snapshots.extend(self._load_other_snapshots())
+        return self._format(*_aggregate(snapshots))
+
+    def _get_filename(self, pid: int) -> str:
+        """Get the snapshot filename of a process.
+
+        :param pid: Process id.
+        :type pid: int
+        :return: Snapshot filename.
+        :rtype: str
+        """
+        return path.join(self.multiprocess_dir, f'{METRICS_FILE_PREFIX}{pid}.json')
+
+    def _load_other_snapshots(self) -> list[dict]:
+        """Load the snapshots of the other live processes and the archive, archiving the exited processes ones.
+
+        :return: Snapshots.
+        :rtype: list[dict]
+        """
+        snapshots = []
+        exited = []
+        for filename in glob(path.join(self.multiprocess_dir, f'{METRICS_FILE_PREFIX}*.json')):
+            snapshot = _load_snapshot(filename)
+            if snapshot is None or snapshot['pid'] == getpid():
+                continue
+            if _is_alive(snapshot['pid']):
+                snapshots.append(snapshot)
+            else:
+                exited.append(filename)
+        if exited:
+            self.archive(exited)
+        archive = _load_snapshot(path.join(self.multiprocess_dir, METRICS_ARCHIVE_FILE))
+        if archive is not None:
+            snapshots.append(archive)
+        return snapshots
+
+    def _format(self, samples: Samples, histograms: Histograms) -> str:
+        """Format aggregated samples and histograms in the Prometheus text format.
+
+        :param samples: Counters and gauges values, by name and labels.
+        :type samples: Samples
+        :param histograms: Histograms buckets, sum and count, by name and labels.
+        :type histograms: Histograms
+        :return: Metrics in the Prometheus text format.
+        :rtype: str
+        """
+        lines = []
+        for name in sorted(set(samples) | set(histograms)):
+            kind, description = METRICS.get(name, ('untyped', name))
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(samples.get(name, {}).items()):
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+            for labels, (buckets, total, count) in sorted(histograms.get(name, {}).items()):
+                cumulative = 0
+                for bound, bucket in zip((*self.buckets, '+Inf'), buckets):
+                    cumulative += bucket
+                    lines.append(f'{name}_bucket{_format_labels((*labels, ("le", str(bound))))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def init_app(app: Flask) -> Flask:
+    """Initializes the application metrics.
+
+    :param app: The Flask application instance.
+    :type app: Flask
+    :return: The Flask application instance.
+    :rtype: Flask
+    """
+    metrics.multiprocess_dir = app.config.get('METRICS_MULTIPROCESS_DIR')
+    metrics.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 1.0)
+    if metrics.multiprocess_dir is not None:
+        makedirs(metrics.multiprocess_dir, exist_ok=True)
+        register_exit(metrics.close)
+    if collect_redis_pool not in metrics.collectors:
+        metrics.collectors.extend([collect_redis_pool, collect_url_lookups, collect_url_breaker, collect_url_shm,
+                                   collect_url_keyspace])
+    add_listener(observe_redis_command)
+
+    app.before_request(start_request_timer)
+    app.after_request(observe_request)
+
+    from shortipy.controllers.metrics import metrics_blueprint  # pylint: disable=import-outside-toplevel
+    app.register_blueprint(metrics_blueprint)
+    return app
+
+
+def start_request_timer():
+    """Start the current request timer."""
+    g.metrics_start = perf_counter()
+
+
+def observe_request(response: Response) -> Response:
+    """Observe the current request count and latency.
+
+    :param response: Flask response.
+    :type response: Response
+    :return: Flask response.
+    :rtype: Response
+    """
+    start = g.get('metrics_start')
+    if start is not None:
+        endpoint = request.endpoint or 'none'
+        metrics.inc('shortipy_requests_total', (
+            ('endpoint', endpoint), ('method', request.method), ('status', str(response.status_code))
+        ))
+        metrics.observe('shortipy_request_duration_seconds', (('endpoint', endpoint),), perf_counter() - start)
+        metrics.flush()
+    return response
+
+
+def observe_redis_command(command: str, duration: float):
+    """Observe Redis command latency (Redis listener).
+
+    :param command: Command name.
+    :type command: str
+    :param duration: Command duration, in seconds.
+    :type duration: float
+    """
+    metrics.observe('shortipy_redis_command_duration_seconds', (('command', command),), duration)
+
+
+def collect_redis_pool() -> list[tuple[str, Labels, float]]:
+    """Collect Redis connection pool gauges.
+
+    :return: Samples (name, labels and value).
+    :rtype: list[tuple[str, Labels, float]]
+    """
+    stats = get_pool_stats()
+    return [*(('shortipy_redis_pool_connections', (('state', state),), stats[state]) for state in ('in_use', 'idle')),
+            ('shortipy_redis_pool_waits_total', (), stats['waits']),
+            ('shortipy_redis_pool_wait_seconds_total', (), stats['wait_seconds'])]
+
+
+def collect_url_lookups() -> list[tuple[str, Labels, float]]:
+    """Collect url lookups coalescing counters.
+
+    :return: Samples (name, labels and value).
+    :rtype: list[tuple[str, Labels, float]]
+    """
+    stats = url_flight.get_stats()
+    return [('shortipy_url_lookups_total', (), stats['calls']),
+            ('shortipy_url_lookups_collapsed_total', (), stats['collapsed'])]
+
+
+def collect_url_breaker() -> list[tuple[str, Labels, float]]:
+    """Collect url resolution circuit breaker state and counters.
+
+    :return: Samples (name, labels and value).
+    :rtype: list[tuple[str, Labels, float]]
+    """
+    stats = url_breaker.get_stats()
+    return [
+        *(('shortipy_url_breaker_state', (('state', state),), int(stats['state'] == state))
+          for state in (BREAKER_CLOSED, BREAKER_HALF_OPEN, BREAKER_OPEN)),
+        ('shortipy_url_breaker_opened_total', (), stats['opened']),
+        ('shortipy_url_breaker_rejected_total', (), stats['rejected']),
+        ('shortipy_url_stale_total', (), url_stale_stats['served']),
+        ('shortipy_url_unavailable_total', (), url_stale_stats['unavailable'])
+    ]
+
+
+def collect_url_shm() -> list[tuple[str, Labels, float]]:
+    """Collect shared-memory url table lookups (only if enabled).
+
+    :return: Samples (name, labels and value).
+    :rtype: list[tuple[str, Labels, float]]
+    """
+    if not url_shm.enabled:
+        return []
+    return [('shortipy_url_shm_lookups_total', (('result', 'hit'),), url_shm.hits),
+            ('shortipy_url_shm_lookups_total', (('result', 'miss'),), url_shm.misses),
+            ('shortipy_url_shm_lookups_total', (('result', 'stale'),), url_shm.stale)]
+
+
+def collect_url_keyspace() -> list[tuple[str, Labels, float]]:
+    """Collect key space gauges (once synced with Redis) and insert attempts.
+
+    :return: Samples (name, labels and value).
+    :rtype: list[tuple[str, Labels, float]]
+    """
+    samples = [('shortipy_url_insert_attempts_total', (('attempts', str(attempts)),), count)
+               for attempts, count in sorted(url_keyspace.attempts.items())]
+    if url_keyspace.counts is not None:
+        samples.extend([
+            *(('shortipy_url_keys', (('length', str(length)),), count)
+              for length, count in sorted(url_keyspace.counts.items())),
+            ('shortipy_url_key_length', (), url_keyspace.length),
+            ('shortipy_url_key_occupancy_ratio', (), url_keyspace.get_occupancy())
+        ])
+    return samples
+
+
+def _aggregate(snapshots: list[dict]) -> tuple[Samples, Histograms]:
+    """Aggregate snapshots: values and histograms are summed, shared gauges take the maximum.
+
+    :param snapshots: Snapshots.
+    :type snapshots: list[dict]
+    :return: Samples and histograms, by name and labels.
+    :rtype: tuple[Samples, Histograms]
+    """
+    samples: Samples = {}
+    histograms: Histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in (*snapshot['counters'], *snapshot['gauges']):
+            metric = samples.setdefault(name, {})
+            labels = tuple(tuple(label) for label in labels)
+            if name in SHARED_GAUGES:
+                metric[labels] = max(metric.get(labels, value), value)
+            else:
+                metric[labels] = metric.get(labels, 0.0) + value
+        for name, labels, buckets, total, count in snapshot['histograms']:
+            metric = histograms.setdefault(name, {})
+            labels = tuple(tuple(label) for label in labels)
+            aggregated = metric.setdefault(labels, [[0] * len(buckets), 0.0, 0])
+            aggregated[0] = [left + right for left, right in zip(aggregated[0], buckets)]
+            aggregated[1] += total
+            aggregated[2] += count
+    return samples, histograms
+
+
+def _load_snapshot(filename: str) -> dict | None:
+    """Load a snapshot.
+
+    :param filename: Snapshot filename.
+    :type filename: str
+    :return: Snapshot or None if missing (or unreadable).
+    :rtype: dict | None
+    """
+    try:
+        with open(filename, encoding='utf8') as file:
+            return load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _format_labels(labels: Labels) -> str:
+    """Format labels in the Prometheus text format.
+
+    :param labels: Labels.
+    :type labels: Labels
+    :return: Formatted labels.
+    :rtype: str
+    """
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    """Format value in the Prometheus text format.
+
+    :param value: Value.
+    :type value: float
+    :return: Formatted value.
+    :rtype: str
+    """
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _is_alive(pid: int) -> bool:
+    """Check if process is alive.
+
+    :param pid: Process id.
+    :type pid: int
+    :return: True if alive, otherwise False.
+    :rtype: bool
+    """
+    try:
+        kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,102 @@
+# coding=utf-8
+
+"""shortipy.services.profiling file."""
+
+from json import dumps
+from time import perf_counter
+
+from flask import Flask, Response, current_app, g, has_request_context, request
+
+from shortipy.services.redis import add_listener
+
+
+class RequestProfile:  # pylint: disable=too-few-public-methods
+    """Class to account the Redis commands issued by a request."""
+
+    def __init__(self):
+        """RequestProfile constructor."""
+        self.start = perf_counter()
+        self.commands = 0
+        self.redis_time = 0.0
+        self.slowest_command: str | None = None
+        self.slowest_time = 0.0
+
+    def add(self, command: str, duration: float):
+        """Account Redis command.
+
+        :param command: Command name.
+        :type command: str
+        :param duration: Command duration, in seconds.
+        :type duration: float
+        """
+        self.commands += 1
+        self.redis_time += duration
+        if duration >= self.slowest_time:
+            self.slowest_command = command
+            self.slowest_time = duration
+
+
+def init_app(app: Flask) -> Flask:
+    """Initializes the application requests profiling.
+
+    :param app: The Flask application instance.
+    :type app: Flask
+    :return: The Flask application instance.
+    :rtype: Flask
+    """
+    add_listener(account_redis_command)
+    app.before_request(start_request_profile)
+    app.after_request(end_request_profile)
+    return app
+
+
+def start_request_profile():
+    """Start the current request profile."""
+    g.request_profile = RequestProfile()
+
+
+def account_redis_command(command: str, duration: float):
+    """Account Redis command in the current request profile (Redis listener).
+
+    :param command: Command name.
+    :type command: str
+    :param duration: Command duration, in seconds.
+    :type duration: float
+    """
+    if has_request_context():
+        profile = g.get('request_profile')
+        if profile is not None:
+            profile.add(command, duration)
+
+
+def end_request_profile(response: Response) -> Response:
+    """End the current request profile: log it if slow and add the "Server-Timing" header if enabled.
+
+    :param response: Flask response.
+    :type response: Response
+    :return: Flask response.
+    :rtype: Response
+    """
+    profile: RequestProfile | None = g.pop('request_profile', None)
+    if profile is None:
+        return response
+    duration = perf_counter() - profile.start
+
+    if duration * 1000 >= current_app.config.get('SLOW_REQUEST_THRESHOLD_MS', 500):
+        current_app.logger.warning('Slow request: %s', dumps({
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+            'redis_commands': profile.commands,
+            'redis_ms': round(profile.redis_time * 1000, 3),
+            'redis_slowest_command': profile.slowest_command,
+            'redis_slowest_ms': round(profile.slowest_time * 1000, 3)
+        }))
+
+    if current_app.config.get('SERVER_TIMING_ENABLED', False):
+        response.headers.add('Server-Timing', f'redis;desc="{profile.commands} commands";'
+                                              f'dur={profile.redis_time * 1000:.3f}')
+        response.headers.add('Server-Timing', f'app;dur={duration * 1000:.3f}')
+    return response
@@ -0,0 +1,213 @@
+# coding=utf-8
+
+"""shortipy.services.ratelimit file."""
+
+from typing import Final
+from math import ceil
+from threading import Lock
+from time import monotonic
+
+from flask import Flask, Response, current_app, g, request
+from redis.exceptions import RedisError
+from werkzeug.exceptions import TooManyRequests
+
+from shortipy.services.cache import LocalCache
+from shortipy.services.redis import redis_client
+
+RATELIMIT_KEYS_DOMAIN: Final = 'ratelimit'
+
+# Token bucket, refilled at ARGV[2] tokens per second up to ARGV[1] tokens, using the Redis server clock.
+# ARGV[3] tokens are taken unconditionally (requests already admitted by the local pre-check),
+# then ARGV[4] tokens are taken only if available. Returns {allowed, tokens left}.
+TOKEN_BUCKET_SCRIPT: Final = '''
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local debt = tonumber(ARGV[3])
+local requested = tonumber(ARGV[4])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'timestamp')
+local tokens = tonumber(bucket[1]) or capacity
+local timestamp = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - timestamp) * rate)
+tokens = math.max(0, tokens - debt)
+local allowed = 0
+if tokens >= requested then
+    tokens = tokens - requested
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'timestamp', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+'''
+
+
+class _Bucket:  # pylint: disable=too-few-public-methods
+    """Class to hold the local view of a bucket."""
+
+    def __init__(self):
+        """_Bucket constructor."""
+        self.tokens = 0.0
+        self.synced_at = 0.0
+        self.debt = 0
+
+
+class RateLimiter:  # pylint: disable=too-many-instance-attributes
+    """Class to rate limit clients with a token bucket shared through Redis.
+    Requests are admitted (without rate limit headers) if Redis is unavailable.
+    Each process admits locally its share of the tokens above the local threshold (split by the local processes
+    count), for at most the local max age since its last Redis call: with more processes than that count, the limit
+    can be overshot by up to (processes / local processes - 1) * (1 - local threshold) * capacity tokens.
+    """
+
+    def __init__(self):
+        """RateLimiter constructor."""
+        self.enabled = False
+        self.limits: dict[str, tuple[int, float]] = {}
+        self.local_threshold = 0.5
+        self.local_max_age = 1.0
+        self.local_processes = 1
+        self._script = None
+        self._lock = Lock()
+        self._buckets = LocalCache()
+
+    def init_app(self, app: Flask):
+        """Initializes the rate limiter.
+
+        :param app: The Flask application instance.
+        :type app: Flask
+        """
+        self.enabled = app.config.get('RATELIMIT_ENABLED', False)
+        self.limits = app.config.get('RATELIMIT_LIMITS', {})
+        self.local_threshold = app.config.get('RATELIMIT_LOCAL_THRESHOLD', 0.5)
+        self.local_max_age = app.config.get('RATELIMIT_LOCAL_MAX_AGE', 1.0)
+        self.local_processes = max(app.config.get('RATELIMIT_LOCAL_PROCESSES', 1), 1)
+        self._buckets = LocalCache(app.config.get('RATELIMIT_LOCAL_SIZE', 10000),
+                                   app.config.get('RATELIMIT_LOCAL_TTL', 60.0))
+        if self.enabled:
+            self._script = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+            app.before_request(self.before_request)
+            app.after_request(self.after_request)
+
+    def get_limit(self) -> tuple[str, tuple[int, float]] | None:
+        """Get the limit of the current request: by endpoint or, otherwise, by blueprint.
+
+        :return: Limit name and limit (capacity and refill rate in tokens per second) or None if unlimited.
+        :rtype: tuple[str, tuple[int, float]] | None
+        """
+        for name in (request.endpoint, request.blueprint):
+            if name is not None and name in self.limits:
+                return name, self.limits[name]
+        return None
+
+    def hit(self, key: str, capacity: int, rate: float) -> tuple[bool, float]:
+        """Take a token from the bucket.
+        Clearly under-limit clients are admitted locally; their tokens are taken with the next Redis call.
+
+        :param key: Bucket key.
+        :type key: str
+        :param capacity: Bucket capacity.
+        :type capacity: int
+        :param rate: Bucket refill rate, in tokens per second.
+        :type rate: float
+        :return: True if allowed, otherwise False, and the tokens left.
+        :rtype: tuple[bool, float]
+        :raises RedisError: If Redis is unavailable (tokens taken locally are kept for the next call).
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = _Bucket()
+                self._buckets.set(key, bucket)
+            elif (monotonic() - bucket.synced_at < self.local_max_age and
+                  bucket.debt + 1 <= (bucket.tokens - capacity * self.local_threshold) / self.local_processes):
+                bucket.debt += 1
+                return True, bucket.tokens - bucket.debt
+            debt = bucket.debt
+            bucket.debt = 0
+
+        try:
+            allowed, tokens = self._script(keys=[key], args=[capacity, rate, debt, 1])
+        except RedisError:
+            with self._lock:
+                bucket.debt += debt
+            raise
+        tokens = float(tokens)
+        with self._lock:
+            bucket.tokens = tokens
+            bucket.synced_at = monotonic()
+        return bool(allowed), tokens
+
+    def before_request(self):
+        """Check the rate limit of the current request (fail open if Redis is unavailable)."""
+        limit = self.get_limit()
+        if limit is None:
+            return
+        name, (capacity, rate) = limit
+        try:
+            allowed, tokens = self.hit(f'{RATELIMIT_KEYS_DOMAIN}:{name}:{get_client_id()}', capacity, rate)
+        except RedisError:
+            return
+        g.ratelimit = (capacity, rate, tokens)
+        if not allowed:
+            raise TooManyRequests(retry_after=ceil((1 - tokens) / rate))
+
+    @staticmethod
+    def after_request(response: Response) -> Response:
+        """Add the rate limit headers to the response.
+
+        :param response: Flask response.
+        :type response: Response
+        :return: Flask response.
+        :rtype: Response
+        """
+        ratelimit = g.get('ratelimit')
+        if ratelimit is not None:
+            capacity, rate, tokens = ratelimit
+            response.headers['X-RateLimit-Limit'] = str(capacity)
+            response.headers['X-RateLimit-Remaining'] = str(max(int(tokens), 0))
+            response.headers['X-RateLimit-Reset'] = str(ceil((capacity - tokens) / rate))
+        return response
+
+
+rate_limiter = RateLimiter()
+
+
+def init_app(app: Flask) -> Flask:
+    """Initializes the application rate limiting.
+
+    :param app: The Flask application instance.
+    :type app: Flask
+    :return: The Flask application instance.
+    :rtype: Flask
+    """
+    rate_limiter.init_app(app)
+    return app
+
+
+def get_client_id() -> str:
+    """Get the client identifier of the current request: API key identity, JWT identity or IP address.
+    Invalid API keys are limited by IP address, so that rotating them does not bypass the limit.
+    Without authentication (e.g. the resolver application) clients are limited by IP address: authentication is
+    imported only if initialized, so that its dependencies are not loaded otherwise.
+
+    :return: Client identifier.
+    :rtype: str
+    """
+    if 'flask-jwt-extended' not in current_app.extensions:
+        return f'ip:{request.remote_addr}'
+    from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request  # pylint: disable=import-outside-toplevel
+    from shortipy.services.auth import API_KEY_HEADER, verify_api_key  # pylint: disable=import-outside-toplevel
+
+    api_key = request.headers.get(API_KEY_HEADER)
+    if api_key is not None:
+        identity = verify_api_key(api_key)
+        if identity is not None:
+            return f'user:{identity}'
+    elif 'Authorization' in request.headers:
+        try:
+            if verify_jwt_in_request(optional=True) is not None:
+                return f'user:{get_jwt_identity()}'
+        except Exception:  # pylint: disable=broad-except
+            pass
+    return f'ip:{request.remote_addr}'
@@ -2,19 +2,321 @@
 
 """shortipy.services.redis file."""
 
+from typing import Any, Callable
+from os import register_at_fork
+from queue import Empty, LifoQueue
+from threading import Lock, Thread, local
+from time import perf_counter
+
 from flask import Flask
 from flask_redis import FlaskRedis
+from redis import BlockingConnectionPool, ConnectionPool, StrictRedis
+from redis.backoff import ExponentialBackoff
+from redis.client import Pipeline
+from redis.exceptions import RedisError
+from redis.retry import Retry
+
+redis_listeners: list[Callable[[str, float], None]] = []
+pool_prewarm: dict[str, Any] = {'connections': 0, 'logger': None}
+prewarm_state = local()  # Set by threads forking helper processes, which never use Redis.
+
+
+class InstrumentedPipeline(Pipeline):  # pylint: disable=abstract-method
+    """Class to notify listeners about pipeline executions ("PIPELINE" or "MULTI" command)."""
+
+    def execute(self, raise_on_error: bool = True) -> list[Any]:
+        """Execute all the commands in the current pipeline.
+
+        :param raise_on_error: Raise the first error found (default: True).
+        :type raise_on_error: bool
+        :return: Commands results.
+        :rtype: list[Any]
+        """
+        start = perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            notify_listeners('MULTI' if self.transaction else 'PIPELINE', perf_counter() - start)
+
+
+class InstrumentedQueue(LifoQueue):
+    """Class to count the waits of a bounded pool queue: gets that find it empty and block."""
+
+    def __init__(self, maxsize: int = 0):
+        """InstrumentedQueue constructor.
+
+        :param maxsize: Maximum number of items (default: 0, unbounded).
+        :type maxsize: int
+        """
+        super().__init__(maxsize)
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self._waits_lock = Lock()
+
+    def get(self, block: bool = True, timeout: float | None = None) -> Any:
+        """Remove and return an item, blocking until one is available (counting the wait, if any).
+
+        :param block: Block until an item is available (default: True).
+        :type block: bool
+        :param timeout: Seconds to block at most (default: None, forever).
+        :type timeout: float | None
+        :return: Item.
+        :rtype: Any
+        :raises Empty: If no item is available (in time).
+        """
+        try:
+            return super().get(block=False)
+        except Empty:
+            if not block:
+                raise
+        start = perf_counter()
+        try:
+            return super().get(timeout=timeout)
+        finally:
+            with self._waits_lock:
+                self.waits += 1
+                self.wait_seconds += perf_counter() - start
+
+
+class InstrumentedBlockingConnectionPool(BlockingConnectionPool):
+    """Class to count the waits for a free connection of a bounded pool (by its queue)."""
+
+    def __init__(self, *args, **kwargs):
+        """InstrumentedBlockingConnectionPool constructor.
+
+        :param args: Pool arguments.
+        :param kwargs: Pool and connection options.
+        """
+        super().__init__(*args, queue_class=InstrumentedQueue, **kwargs)
 
-redis_client = FlaskRedis()
+    @property
+    def waits(self) -> int:
+        """Get the waits for a free connection (of this process).
+
+        :return: Waits.
+        :rtype: int
+        """
+        return self.pool.waits
+
+    @property
+    def wait_seconds(self) -> float:
+        """Get the total wait time for a free connection (of this process), in seconds.
+
+        :return: Wait time.
+        :rtype: float
+        """
+        return self.pool.wait_seconds
+
+
+class InstrumentedRedis(StrictRedis):
+    """Class to notify listeners about every command executed."""
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> 'InstrumentedRedis':
+        """Create client from url, with a pool of "connection_pool_class" class (default: ConnectionPool).
+
+        :param url: Redis url.
+        :type url: str
+        :param kwargs: Pool and connection options.
+        :return: Client.
+        :rtype: InstrumentedRedis
+        """
+        pool_class = kwargs.pop('connection_pool_class', ConnectionPool)
+        return cls(connection_pool=pool_class.from_url(url, **kwargs))
+
+    def execute_command(self, *args, **options) -> Any:
+        """Execute a command and return a parsed response.
+
+        :param args: Command name and arguments.
+        :param options: Command options.
+        :return: Parsed response.
+        :rtype: Any
+        """
+        start = perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            notify_listeners(str(args[0]).upper(), perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Any = None) -> InstrumentedPipeline:
+        """Get a new (instrumented) pipeline.
+
+        :param transaction: Execute all the commands atomically (default: True).
+        :type transaction: bool
+        :param shard_hint: Shard hint (default: None).
+        :type shard_hint: Any
+        :return: Pipeline.
+        :rtype: InstrumentedPipeline
+        """
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+redis_client = FlaskRedis.from_custom_provider(InstrumentedRedis)
 
 
 def init_app(app: Flask) -> Flask:
     """Initializes the application Redis client.
+    A REDIS_PROVIDER_CLASS (e.g. the benchmarks in-process stand-in) replaces the instrumented client: it gets
+    no pool options, nor pre-warming.
 
     :param app: The Flask application instance.
     :type app: Flask
     :return: The Flask application instance.
     :rtype: Flask
     """
-    redis_client.init_app(app, decode_responses=True)
+    redis_client.provider_kwargs = {}  # FlaskRedis merges options of previous initializations.
+    if app.config.get('REDIS_PROVIDER_CLASS') is not None:
+        redis_client.provider_class = app.config['REDIS_PROVIDER_CLASS']
+        redis_client.init_app(app, decode_responses=True)
+        return app
+
+    redis_client.provider_class = InstrumentedRedis
+    redis_client.init_app(app, **get_pool_options(app))
+    pool_prewarm['connections'] = app.config.get('REDIS_POOL_PREWARM', 0)
+    pool_prewarm['logger'] = app.logger
+    if pool_prewarm['connections'] > 0:
+        prewarm_pool(pool_prewarm['connections'], app.logger)
     return app
+
+
+def get_pool_options(app: Flask) -> dict[str, Any]:
+    """Get Redis client, pool and connection options from the configuration.
+    With "REDIS_MAX_CONNECTIONS" the pool is bounded and blocks up to "REDIS_POOL_TIMEOUT" for a free connection.
+
+    :param app: The Flask application instance.
+    :type app: Flask
+    :return: Options.
+    :rtype: dict[str, Any]
+    """
+    options = {
+        'decode_responses': True,
+        'socket_keepalive': app.config.get('REDIS_SOCKET_KEEPALIVE', True),
+        'health_check_interval': app.config.get('REDIS_HEALTH_CHECK_INTERVAL', 0),
+        'retry_on_timeout': app.config.get('REDIS_RETRIES', 0) > 0,
+        'retry': Retry(ExponentialBackoff(app.config.get('REDIS_RETRY_BACKOFF_CAP', 0.5),
+                                          app.config.get('REDIS_RETRY_BACKOFF_BASE', 0.01)),
+                       app.config.get('REDIS_RETRIES', 0))
+    }
+    for option, name in (('socket_timeout', 'REDIS_SOCKET_TIMEOUT'),
+                         ('socket_connect_timeout', 'REDIS_SOCKET_CONNECT_TIMEOUT')):
+        if app.config.get(name) is not None:
+            options[option] = app.config[name]
+    if app.config.get('REDIS_MAX_CONNECTIONS') is not None:
+        options['connection_pool_class'] = InstrumentedBlockingConnectionPool
+        options['max_connections'] = app.config['REDIS_MAX_CONNECTIONS']
+        options['timeout'] = app.config.get('REDIS_POOL_TIMEOUT', 5.0)
+    return options
+
+
+def prewarm_pool(connections: int, logger: Any = None) -> int:
+    """Open connections in the pool in advance, so that first requests do not pay the connection setup.
+    Failures (e.g. Redis not yet reachable) are logged and never raised.
+
+    :param connections: Number of connections to open (capped to the pool max connections).
+    :type connections: int
+    :param logger: Logger for failures (default: None).
+    :type logger: Any
+    :return: Number of connections opened.
+    :rtype: int
+    """
+    pool = redis_client.connection_pool
+    opened = []
+    connected = 0
+    try:
+        for _ in range(min(connections, pool.max_connections)):
+            try:
+                connection = pool.get_connection()
+            except TypeError:  # redis-py < 5.3 requires the command name.
+                connection = pool.get_connection('PING')
+            opened.append(connection)
+            connection.connect()
+            connected += 1
+    except RedisError as error:
+        if logger is not None:
+            logger.warning('Redis pool pre-warming failed: %s', error)
+    finally:
+        for connection in opened:
+            pool.release(connection)
+    return connected
+
+
+def fork_without_prewarm(function: Callable[..., Any], *args) -> Any:
+    """Call function forking helper processes that never use Redis (e.g. the hash pool ones):
+    the processes it forks do not pre-warm their pool.
+
+    :param function: Function to call.
+    :type function: Callable[..., Any]
+    :param args: Function arguments.
+    :return: Function result.
+    :rtype: Any
+    """
+    prewarm_state.skip = True
+    try:
+        return function(*args)
+    finally:
+        prewarm_state.skip = False
+
+
+def _prewarm_forked_pool():
+    """Pre-warm the pool of a forked worker (e.g. gunicorn with preload), which starts empty, in the background.
+    Helper processes (forked through fork_without_prewarm) are skipped.
+    """
+    if getattr(prewarm_state, 'skip', False):
+        return
+    if pool_prewarm['connections'] > 0 and redis_client.provider_class is InstrumentedRedis:
+        Thread(target=prewarm_pool, args=(pool_prewarm['connections'], pool_prewarm['logger']), daemon=True).start()
+
+
+register_at_fork(after_in_child=_prewarm_forked_pool)
+
+
+def add_listener(listener: Callable[[str, float], None]):
+    """Add a listener called with command name and duration (in seconds) after every Redis command.
+
+    :param listener: Listener.
+    :type listener: Callable[[str, float], None]
+    """
+    if listener not in redis_listeners:
+        redis_listeners.append(listener)
+
+
+def notify_listeners(command: str, duration: float):
+    """Notify listeners about an executed Redis command.
+
+    :param command: Command name.
+    :type command: str
+    :param duration: Command duration, in seconds.
+    :type duration: float
+    """
+    for listener in redis_listeners:
+        listener(command, duration)
+
+
+def get_pool_stats() -> dict[str, int | float | None]:
+    """Get Redis connection pool statistics.
+
+    :return: Connections in use, idle and created, max connections (None if unbounded),
+        waits for a free connection and total wait time (in seconds).
+    :rtype: dict[str, int | float | None]
+    """
+    pool = redis_client.connection_pool
+    # pylint: disable=protected-access
+    if isinstance(pool, BlockingConnectionPool):
+        idle = sum(1 for connection in list(pool.pool.queue) if connection is not None)
+        created = len(pool._connections)
+        return {
+            'in_use': created - idle,
+            'idle': idle,
+            'created': created,
+            'max': pool.max_connections,
+            'waits': getattr(pool, 'waits', 0),
+            'wait_seconds': getattr(pool, 'wait_seconds', 0.0)
+        }
+    return {
+        'in_use': len(pool._in_use_connections),
+        'idle': len(pool._available_connections),
+        'created': pool._created_connections,
+        'max': pool.max_connections if pool.max_connections < 2 ** 31 else None,
+        'waits': 0,
+        'wait_seconds': 0.0
+    }
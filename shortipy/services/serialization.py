@@ -2,12 +2,98 @@
 
 """shortipy.services.serialization file."""
 
+from typing import Any
+
 from flask import Flask
+from flask.json.provider import DefaultJSONProvider
 from flask_marshmallow import Marshmallow
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 marshmallow = Marshmallow()
 
 
+class OrJSONProvider(DefaultJSONProvider):
+    """Class to serialize JSON with orjson, with the same output of the default provider.
+    Only compact output (the one used for responses) is produced by orjson; objects it would serialize
+    differently (non-ASCII text when ensure_ascii is set, non string keys, big integers, floats in what the default
+    provider returns for dataclasses and the like) fall back to the default provider.
+    Floats in the data itself are not looked for (that would cost more than orjson saves) and are written by orjson,
+    differently only out of the plain notation range and for non finite values (e.g. 1e16 and 1e-7 instead of
+    1e+16 and 1e-07, NaN and Infinity as null instead of invalid JSON): responses do not send such floats.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Serialize data as JSON to a string.
+
+        :param obj: The data to serialize.
+        :type obj: Any
+        :param kwargs: Passed to the default provider in case of fall back.
+        :return: Serialized data.
+        :rtype: str
+        """
+        if kwargs == {'separators': (',', ':')}:
+            option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | \
+                orjson.OPT_PASSTHROUGH_SUBCLASS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            try:
+                result = orjson.dumps(obj, default=self._default, option=option)
+            except TypeError:
+                pass
+            else:
+                if not self.ensure_ascii or result.isascii():
+                    return result.decode()
+        return super().dumps(obj, **kwargs)
+
+    def _default(self, value: Any) -> Any:
+        """Serialize objects orjson does not handle with the default provider, refusing floats in the result.
+
+        :param value: Object to serialize.
+        :type value: Any
+        :return: Serializable object.
+        :rtype: Any
+        :raises TypeError: If the result contains floats (or the object is not serializable).
+        """
+        result = self.default(value)
+        if _has_float(result):
+            raise TypeError('Floats are formatted differently (e.g. 1e16, NaN as null)')
+        return result
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        """Deserialize data as JSON from a string or bytes.
+
+        :param s: Text or UTF-8 bytes.
+        :type s: str | bytes
+        :param kwargs: Passed to the default provider, if any.
+        :return: Deserialized data.
+        :rtype: Any
+        """
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)  # pylint: disable=no-member
+
+
+def _has_float(obj: Any) -> bool:
+    """Check if data contains floats (in dicts, lists and tuples).
+
+    :param obj: Data.
+    :type obj: Any
+    :return: True if data contains floats, otherwise False.
+    :rtype: bool
+    """
+    if isinstance(obj, float):
+        return True
+    if isinstance(obj, dict):
+        return any(_has_float(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_has_float(value) for value in obj)
+    return False
+
+
 def init_app(app: Flask) -> Flask:
     """Initializes the application serialization.
 
@@ -16,5 +102,9 @@ def init_app(app: Flask) -> Flask:
     :return: The Flask application instance.
     :rtype: Flask
     """
+    if app.config.get('JSON_PROVIDER', 'default') == 'orjson':
+        if orjson is None:
+            raise Exception('Install orjson to use JSON_PROVIDER "orjson"')
+        app.json = OrJSONProvider(app)
     marshmallow.init_app(app)
     return app
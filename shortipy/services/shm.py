@@ -0,0 +1,270 @@
+# coding=utf-8
+
+"""shortipy.services.shm file."""
+
+from typing import Final
+from mmap import mmap, ACCESS_READ
+from os import path, replace, stat
+from struct import Struct
+from time import monotonic, time
+from zlib import crc32
+
+SHM_MAGIC: Final = b'SHPY'
+SHM_VERSION: Final = 2
+SHM_KEY_SIZE: Final = 32
+SHM_MAX_PROBES: Final = 32
+SHM_MAX_LOAD: Final = 0.75
+SHM_REOPEN_INTERVAL: Final = 1.0
+
+SLOT_EMPTY: Final = 0
+SLOT_USED: Final = 1
+SLOT_DELETED: Final = 2
+
+# Header: magic, version, slots and slot size, then the writer heartbeat (padded to 64 bytes).
+HEADER: Final = Struct('<4sIII')
+HEADER_SIZE: Final = 64
+# Heartbeat: timestamp of the last time the writer was in sync with Redis (0 if never).
+HEARTBEAT: Final = Struct('<d')
+HEARTBEAT_OFFSET: Final = HEADER.size
+# Slot: sequence (odd while being written), state, key length, value length, redirect code (0 if default)
+# and max age (-1 if none), followed by key and value (padded to 16 bytes).
+SLOT: Final = Struct('<IBBHHi')
+SLOT_HEADER_SIZE: Final = 16
+SEQUENCE: Final = Struct('<I')
+
+
+class SharedUrlTable:
+    """Class to share url resolutions between the processes of a host through a memory-mapped hash table
+    (open addressing with linear probing).
+    A single writer (the refresher) updates slots under a per-slot sequence lock, so that readers never lock:
+    they retry while a slot is being written, or give up and fall back to Redis.
+    The writer beats a heartbeat in the header while in sync with Redis: readers fall back to Redis
+    if it is older than their max age (the refresher died or lost Redis).
+    """
+
+    def __init__(self):
+        """SharedUrlTable constructor."""
+        self.enabled = False
+        self.path = '/dev/shm/shortipy_urls'
+        self.slots = 65536
+        self.slot_size = 512
+        self.max_age = 10.0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._map: mmap | None = None
+        self._inode = None
+        self._opened_at = 0.0
+        self._used = 0
+        self._index: dict[bytes, int] = {}
+
+    # region Reader functions
+    def get(self, key: str) -> tuple[str, tuple[int, int | None] | None] | None:
+        """Get url value and redirect policy by passed key (readers).
+
+        :param key: Key to find.
+        :type key: str
+        :return: Url value and redirect policy (redirect code and max age) or None if default,
+            or None if not in table (or table unavailable or stale).
+        :rtype: tuple[str, tuple[int, int | None] | None] | None
+        """
+        table = self._open_reader()
+        if table is None:
+            return None
+        if self.max_age > 0 and time() - HEARTBEAT.unpack_from(table, HEARTBEAT_OFFSET)[0] > self.max_age:
+            self.stale += 1
+            return None
+        encoded = key.encode()
+        if len(encoded) > SHM_KEY_SIZE:
+            return None
+        slots, slot_size = self.slots, self.slot_size
+        index = crc32(encoded) % slots
+        for _ in range(SHM_MAX_PROBES):
+            slot = self._read_slot(table, HEADER_SIZE + index * slot_size)
+            if slot is None or slot[0] == SLOT_EMPTY:
+                break
+            state, slot_key, value, code, max_age = slot
+            if state == SLOT_USED and slot_key == encoded:
+                self.hits += 1
+                return value.decode(), None if code == 0 else (code, None if max_age < 0 else max_age)
+            index = (index + 1) % slots
+        self.misses += 1
+        return None
+
+    def _open_reader(self) -> mmap | None:
+        """Map the table file read-only, re-mapping it if replaced (checked at most once per second).
+
+        :return: Memory map or None if table file is missing or not valid.
+        :rtype: mmap | None
+        """
+        if self._map is not None and monotonic() - self._opened_at < SHM_REOPEN_INTERVAL:
+            return self._map
+        self._opened_at = monotonic()
+        try:
+            inode = stat(self.path).st_ino
+            if self._map is not None and inode == self._inode:
+                return self._map
+            with open(self.path, 'rb') as file:
+                table = mmap(file.fileno(), 0, access=ACCESS_READ)
+        except (OSError, ValueError):
+            self._map = None
+            return None
+        magic, version, slots, slot_size = HEADER.unpack_from(table, 0)
+        if magic != SHM_MAGIC or version != SHM_VERSION or len(table) < HEADER_SIZE + slots * slot_size:
+            table.close()
+            self._map = None
+            return None
+        self._map, self._inode, self.slots, self.slot_size = table, inode, slots, slot_size
+        return table
+
+    @staticmethod
+    def _read_slot(table: mmap, offset: int) -> tuple[int, bytes, bytes, int, int] | None:
+        """Read a consistent slot snapshot (sequence lock).
+
+        :param table: Memory map.
+        :type table: mmap
+        :param offset: Slot offset.
+        :type offset: int
+        :return: State, key, value, redirect code and max age, or None if the slot kept changing.
+        :rtype: tuple[int, bytes, bytes, int, int] | None
+        """
+        for _ in range(3):
+            sequence, state, key_length, value_length, code, max_age = SLOT.unpack_from(table, offset)
+            if sequence & 1:
+                continue
+            start = offset + SLOT_HEADER_SIZE
+            key = table[start:start + key_length]
+            value = table[start + SHM_KEY_SIZE:start + SHM_KEY_SIZE + value_length]
+            if SEQUENCE.unpack_from(table, offset)[0] == sequence:
+                return state, key, value, code, max_age
+        return None
+    # endregion
+
+    # region Writer functions
+    def create(self):
+        """Create (or replace) the table file, empty (writer).
+        The file is replaced, never resized in place, so that readers mapping the old one are never broken.
+        """
+        size = HEADER_SIZE + self.slots * self.slot_size
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(HEADER.pack(SHM_MAGIC, SHM_VERSION, self.slots, self.slot_size).ljust(HEADER_SIZE, b'\0'))
+            file.truncate(size)
+        with open(temporary, 'r+b') as file:
+            table = mmap(file.fileno(), size)
+        replace(temporary, self.path)
+        if self._map is not None:
+            self._map.close()
+        self._map, self._inode = table, stat(self.path).st_ino
+        self._used = 0
+        self._index = {}
+
+    def beat(self, timestamp: float | None = None):
+        """Beat the heartbeat, once in sync with Redis (writer).
+
+        :param timestamp: Heartbeat timestamp (default: None, now).
+        :type timestamp: float | None
+        """
+        HEARTBEAT.pack_into(self._map, HEARTBEAT_OFFSET, time() if timestamp is None else timestamp)
+
+    def set(self, key: str, value: str, redirect: tuple[int, int | None] | None = None) -> bool:
+        """Set url value and redirect policy by passed key (writer).
+
+        :param key: Url key.
+        :type key: str
+        :param value: Url value.
+        :type value: str
+        :param redirect: Redirect policy (redirect code and max age) or None if default (default: None).
+        :type redirect: tuple[int, int | None] | None
+        :return: True if set, otherwise False (key or value too long, table full or probe sequence too long).
+        :rtype: bool
+        """
+        encoded_key, encoded_value = key.encode(), value.encode()
+        if len(encoded_key) > SHM_KEY_SIZE or len(encoded_value) > self.slot_size - SLOT_HEADER_SIZE - SHM_KEY_SIZE:
+            self.delete(key)
+            return False
+        index = self._index.get(encoded_key)
+        if index is None:
+            if self._used >= self.slots * SHM_MAX_LOAD:
+                return False
+            index = self._find_free_slot(encoded_key)
+            if index is None:
+                return False
+            self._used += 1
+            self._index[encoded_key] = index
+        code, max_age = (0, -1) if redirect is None else (redirect[0], -1 if redirect[1] is None else redirect[1])
+        self._write_slot(index, SLOT_USED, (encoded_key, encoded_value, code, max_age))
+        return True
+
+    def delete(self, key: str):
+        """Delete url by passed key, if present (writer).
+
+        :param key: Url key.
+        :type key: str
+        """
+        index = self._index.pop(key.encode(), None)
+        if index is not None:
+            self._used -= 1
+            self._write_slot(index, SLOT_DELETED, (b'', b'', 0, -1))
+
+    def keys(self) -> list[str]:
+        """Get keys in table (writer).
+
+        :return: Keys.
+        :rtype: list[str]
+        """
+        return [key.decode() for key in self._index]
+
+    def _find_free_slot(self, key: bytes) -> int | None:
+        """Find the first empty or deleted slot in the key probe sequence (writer).
+
+        :param key: Encoded key.
+        :type key: bytes
+        :return: Slot index or None if the probe sequence is too long.
+        :rtype: int | None
+        """
+        index = crc32(key) % self.slots
+        for _ in range(SHM_MAX_PROBES):
+            state = self._map[HEADER_SIZE + index * self.slot_size + SEQUENCE.size]
+            if state != SLOT_USED:
+                return index
+            index = (index + 1) % self.slots
+        return None
+
+    def _write_slot(self, index: int, state: int, slot: tuple[bytes, bytes, int, int]):
+        """Write slot under its sequence lock (writer).
+
+        :param index: Slot index.
+        :type index: int
+        :param state: Slot state.
+        :type state: int
+        :param slot: Encoded key, encoded value, redirect code (0 if default) and max age (-1 if none).
+        :type slot: tuple[bytes, bytes, int, int]
+        """
+        key, value, code, max_age = slot
+        table = self._map
+        offset = HEADER_SIZE + index * self.slot_size
+        sequence = SEQUENCE.unpack_from(table, offset)[0]
+        SEQUENCE.pack_into(table, offset, (sequence + 1) & 0xFFFFFFFF)
+        start = offset + SLOT_HEADER_SIZE
+        table[start:start + len(key)] = key
+        table[start + SHM_KEY_SIZE:start + SHM_KEY_SIZE + len(value)] = value
+        SLOT.pack_into(table, offset, (sequence + 1) & 0xFFFFFFFF, state, len(key), len(value), code, max_age)
+        SEQUENCE.pack_into(table, offset, (sequence + 2) & 0xFFFFFFFF)
+    # endregion
+
+    def close(self):
+        """Unmap the table file."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def get_stats(self) -> dict[str, int | bool]:
+        """Get table statistics.
+
+        :return: Whether the table file is mapped, hits, misses and lookups skipped because the table was stale
+            (readers).
+        :rtype: dict[str, int | bool]
+        """
+        return {'mapped': self._map is not None and path.exists(self.path), 'hits': self.hits, 'misses': self.misses,
+                'stale': self.stale}
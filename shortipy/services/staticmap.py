@@ -0,0 +1,224 @@
+# coding=utf-8
+
+"""shortipy.services.staticmap file."""
+
+from typing import Final, BinaryIO, Iterable, Iterator, TextIO
+from mmap import mmap, ACCESS_READ
+from os import path, remove, replace
+from shutil import copyfileobj
+from struct import Struct
+
+STATIC_MAP_MAGIC: Final = b'SHPM'
+STATIC_MAP_VERSION: Final = 2
+NGINX_MAP_VARIABLE: Final = '$shortipy_redirect'
+NGINX_MAP_CODE_VARIABLE: Final = '$shortipy_redirect_code'
+NGINX_UNSAFE: Final = '"$\\{};#\'` \t\r\n'
+
+# Header: magic, version, entries count and urls version.
+HEADER: Final = Struct('<4sIIQ')
+# Index: one entry offset per entry, sorted by key (records may be in any order), 64-bit for tables above 4 GiB.
+OFFSET: Final = Struct('<Q')
+# Entry: key length, redirect code (0 if default), max age (-1 if none) and value length, then key and value.
+ENTRY: Final = Struct('<BHiI')
+
+# Key, value, redirect code (0 if default) and max age (-1 if none).
+Entry = tuple[str, str, int, int]
+
+
+def write_nginx_map(file: TextIO, entries: Iterable[Entry], version: int) -> int:
+    """Write entries as nginx maps from request uri to redirect url and (non default) redirect code, e.g.:
+    ``if ($shortipy_redirect) { return 302 $shortipy_redirect; }``.
+    Characters nginx would interpret in values are percent-encoded.
+
+    :param file: Text file.
+    :type file: TextIO
+    :param entries: Entries (may be a generator: entries are streamed).
+    :type entries: Iterable[Entry]
+    :param version: Urls version compiled.
+    :type version: int
+    :return: Number of entries written.
+    :rtype: int
+    """
+    codes = []
+    count = 0
+    file.write(f'# Generated by shortipy (urls version {version}).\n')
+    file.write(f'map $uri {NGINX_MAP_VARIABLE} {{\n    default "";\n')
+    for key, value, code, _ in entries:
+        uri = _nginx_escape(f'/{key}')
+        file.write(f'    "{uri}" "{_nginx_escape(value)}";\n')
+        if code:
+            codes.append(f'    "{uri}" {code};\n')
+        count += 1
+    file.write(f'}}\nmap $uri {NGINX_MAP_CODE_VARIABLE} {{\n    default 302;\n')
+    file.writelines(codes)
+    file.write('}\n')
+    return count
+
+
+def write_binary_map(filename: str, entries: Iterable[Entry], version: int) -> int:
+    """Write entries as a sorted binary table with an offsets index (binary search lookups), atomically.
+
+    :param filename: File name.
+    :type filename: str
+    :param entries: Entries (may be a generator: entries are streamed).
+    :type entries: Iterable[Entry]
+    :param version: Urls version compiled.
+    :type version: int
+    :return: Number of entries written.
+    :rtype: int
+    """
+    with BinaryMapWriter(filename) as writer:
+        for entry in entries:
+            writer.add(entry)
+        return writer.commit(version)
+
+
+class BinaryMapWriter:
+    """Class to write a binary table from entries in any order, without keeping them in memory:
+    records are spooled to a temporary file as they are added, only keys and record offsets are kept to be sorted
+    in the index, and the table replaces the file atomically on commit (or is discarded, if not committed).
+    """
+
+    def __init__(self, filename: str):
+        """BinaryMapWriter constructor.
+
+        :param filename: File name.
+        :type filename: str
+        """
+        self.filename = filename
+        self._records: BinaryIO = open(f'{filename}.records.tmp', 'w+b')  # pylint: disable=consider-using-with
+        self._index: list[tuple[str, int]] = []
+        self._size = 0
+
+    def __enter__(self) -> 'BinaryMapWriter':
+        """Enter context.
+
+        :return: Itself.
+        :rtype: BinaryMapWriter
+        """
+        return self
+
+    def __exit__(self, *_):
+        """Exit context, discarding the records (the table is left as is, if not committed)."""
+        self._records.close()
+        if path.exists(self._records.name):
+            remove(self._records.name)
+
+    def add(self, entry: Entry):
+        """Add entry (keys must be unique).
+
+        :param entry: Entry.
+        :type entry: Entry
+        """
+        key, value, code, max_age = entry
+        encoded_key, encoded_value = key.encode(), value.encode()
+        record = ENTRY.pack(len(encoded_key), code, max_age, len(encoded_value)) + encoded_key + encoded_value
+        self._records.write(record)
+        self._index.append((key, self._size))
+        self._size += len(record)
+
+    def commit(self, version: int) -> int:
+        """Write the table (header, index sorted by key and records) and replace the file, atomically.
+
+        :param version: Urls version compiled.
+        :type version: int
+        :return: Number of entries written.
+        :rtype: int
+        """
+        self._index.sort()
+        offset = HEADER.size + OFFSET.size * len(self._index)
+        with open(f'{self.filename}.tmp', 'wb') as file:
+            file.write(HEADER.pack(STATIC_MAP_MAGIC, STATIC_MAP_VERSION, len(self._index), version))
+            file.writelines(OFFSET.pack(offset + record_offset) for _, record_offset in self._index)
+            self._records.seek(0)
+            copyfileobj(self._records, file)
+        replace(f'{self.filename}.tmp', self.filename)
+        return len(self._index)
+
+
+class StaticUrlMap:
+    """Class to read a binary table written by write_binary_map (e.g. by edge tooling)."""
+
+    def __init__(self, filename: str):
+        """StaticUrlMap constructor.
+
+        :param filename: File name.
+        :type filename: str
+        :raises ValueError: If the file is not a valid binary table.
+        """
+        with open(filename, 'rb') as file:
+            self._map = mmap(file.fileno(), 0, access=ACCESS_READ)
+        magic, version, self.count, self.version = HEADER.unpack_from(self._map, 0)
+        if magic != STATIC_MAP_MAGIC or version != STATIC_MAP_VERSION:
+            self._map.close()
+            raise ValueError(f'Invalid binary url map: {filename}')
+
+    def __enter__(self) -> 'StaticUrlMap':
+        """Enter context.
+
+        :return: Itself.
+        :rtype: StaticUrlMap
+        """
+        return self
+
+    def __exit__(self, *_):
+        """Exit context, closing the map."""
+        self.close()
+
+    def __iter__(self) -> Iterator[Entry]:
+        """Iterate entries, sorted by key.
+
+        :return: Entries.
+        :rtype: Iterator[Entry]
+        """
+        for index in range(self.count):
+            yield self._read(index)
+
+    def get(self, key: str) -> Entry | None:
+        """Find entry by key (binary search).
+
+        :param key: Key to find.
+        :type key: str
+        :return: Entry or None if not found.
+        :rtype: Entry | None
+        """
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            entry = self._read(middle)
+            if entry[0] == key:
+                return entry
+            if entry[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def close(self):
+        """Close the map."""
+        self._map.close()
+
+    def _read(self, index: int) -> Entry:
+        """Read entry by index.
+
+        :param index: Entry index.
+        :type index: int
+        :return: Entry.
+        :rtype: Entry
+        """
+        offset = OFFSET.unpack_from(self._map, HEADER.size + OFFSET.size * index)[0]
+        key_length, code, max_age, value_length = ENTRY.unpack_from(self._map, offset)
+        start = offset + ENTRY.size
+        key_end = start + key_length
+        return self._map[start:key_end].decode(), self._map[key_end:key_end + value_length].decode(), code, max_age
+
+
+def _nginx_escape(value: str) -> str:
+    """Percent-encode characters nginx would interpret in a quoted map value.
+
+    :param value: Value.
+    :type value: str
+    :return: Escaped value.
+    :rtype: str
+    """
+    return ''.join(f'%{ord(character):02X}' if character in NGINX_UNSAFE else character for character in value)
@@ -2,20 +2,217 @@
 
 """shortipy.services.url file."""
 
-from typing import Final
+from typing import Final, Any, Callable, Iterator
 from string import ascii_lowercase
+from math import ceil
+from time import monotonic, sleep, time_ns
 from os import linesep
-from random import SystemRandom
 
-from click import STRING, option
-from flask import Flask
+from click import INT, STRING, option
+from flask import Flask, current_app
 from flask.cli import AppGroup
-from werkzeug.exceptions import NotFound
+from redis.exceptions import RedisError
+from werkzeug.exceptions import NotFound, ServiceUnavailable
+from werkzeug.utils import import_string
 
 from shortipy.services.redis import redis_client
+from shortipy.services.coalescing import SingleFlight
+from shortipy.services.breaker import CircuitBreaker, CircuitOpenError
+from shortipy.services.cache import LocalCache
+from shortipy.services.shm import SharedUrlTable
+from shortipy.services.hits import HitCounter
+from shortipy.services.keyspace import KeySpace
 
 URL_KEYS_DOMAIN: Final = 'url'
-
+URL_REDIRECTS_DOMAIN: Final = 'url_redirect'
+URL_VERSIONS_KEY: Final = 'url_version'
+URLS_VERSION_KEY: Final = 'urls_version'
+URL_CHANGES_CHANNEL: Final = 'url_changes'
+URL_HITS_KEY: Final = 'url_hits'
+URL_CHANGELOG_KEY: Final = 'url_changelog'
+URL_TOMBSTONES_KEY: Final = 'url_tombstones'
+URL_TOMBSTONES_FLOOR_KEY: Final = 'url_tombstones_floor'
+URL_STREAM_KEY: Final = 'url_stream'
+URL_STREAM_TRIMMED_KEY: Final = 'url_stream_trimmed'
+URL_OWNERS_KEY: Final = 'url_owner'
+USER_URLS_DOMAIN: Final = 'user_urls'
+URL_CREATED_KEY: Final = 'url_created'
+URL_DOMAINS_DOMAIN: Final = 'url_domain'
+URL_TRIGRAMS_DOMAIN: Final = 'url_trigram'
+URL_SEARCH_MAX_LENGTH: Final = 256  # Only the first characters of url values are indexed by trigrams.
+URL_SEARCH_RESULTS_DOMAIN: Final = 'url_search'
+URL_SEARCH_RESULTS_TTL: Final = 60  # Seconds substring search results are kept for the next pages (by urls version).
+URL_KEY_LENGTH_KEY: Final = 'url_key_length'
+URL_KEY_COUNTS_KEY: Final = 'url_key_counts'
+URL_KEY_ATTEMPTS_KEY: Final = 'url_key_attempts'
+URL_LIST_MAX_COUNT: Final = 1000
+URL_SCAN_BATCH_SIZE: Final = 1000
+URL_SHM_RECONNECT_INTERVAL: Final = 1.0  # Seconds between reconnection attempts of the shared-memory refresher.
+URL_RESOLVE_MAX_KEYS: Final = 1000
+REDIRECT_CODES: Final = (301, 302, 307, 308)
+REDIRECT_DEFAULT_CODE: Final = 302
+# Routes next to the resolution one ("/<key>") and to the url API one ("/api/urls/<key>").
+RESERVED_KEYS: Final = frozenset(('healthz', 'readyz', 'metrics', 'created', 'search', 'resolve', 'changes'))
+
+# Write scripts: KEYS are url key, url redirect policy key, url versions hash, urls (collection) version,
+# changelog sorted set, change stream, owners hash, creation index, key counts (by key length) hash, tombstones sorted
+# set, tombstones floor and id of the last change trimmed from the stream; ARGV are url key, value, redirect policy
+# ('-' to keep it, '' to remove it), operation, change stream max length ('0' to disable it), owner ('' if none),
+# creation time in microseconds ('' to not index it), search index flag ('' to not index values) and tombstones max
+# length.
+# The collection version is bumped atomically with the write, only if the write happens, and becomes the url version
+# (unique across urls, so that a deleted and inserted again url never repeats one); the changed key is scored with it
+# in the changelog, the change is appended to the (capped) change stream and the changed key is published on the url
+# changes channel. The stream is trimmed in batches of a hundredth of its max length, keeping the id of the last
+# trimmed change (so that readers know if they missed any). Deleted keys lose their url version and move from the
+# changelog to the tombstones, capped to the most recent ones: the floor is the version of the last trimmed one
+# (changes since older versions are incomplete).
+# Inserted and deleted keys are counted by key length, to track the occupancy of the key space.
+# Inserted keys are also scored with the new collection version (creation order) in their owner's index, whose key
+# depends on the owner and is therefore built by the script (single Redis instance only), and with their creation
+# time in the creation index.
+# Url values are indexed for search by host (and parent domains, in sorted sets scored 0, to page keys by ZRANGEBYLEX)
+# and by trigrams of their lowercase value (in sets, to intersect them).
+WRITE_URL_REDIRECT_SCRIPT: Final = f'''
+local function index_value(value, add)
+    local lowered = string.lower(value)
+    local host = string.match(lowered, '^%a[%w+.-]*://([^/?#]*)')
+    if host then
+        host = string.gsub(string.gsub(host, '^.*@', ''), ':%d*$', '')
+        while string.find(host, '.', 1, true) do
+            if add then
+                redis.call('ZADD', '{URL_DOMAINS_DOMAIN}:' .. host, 0, ARGV[1])
+            else
+                redis.call('ZREM', '{URL_DOMAINS_DOMAIN}:' .. host, ARGV[1])
+            end
+            host = string.gsub(host, '^[^.]*%.', '', 1)
+        end
+    end
+    local grams = {{}}
+    for index = 1, math.min(#lowered, {URL_SEARCH_MAX_LENGTH}) - 2 do
+        grams[string.sub(lowered, index, index + 2)] = true
+    end
+    for gram in pairs(grams) do
+        redis.call(add and 'SADD' or 'SREM', '{URL_TRIGRAMS_DOMAIN}:' .. gram, ARGV[1])
+    end
+end
+
+local function write_redirect()
+    if ARGV[3] == '' then
+        redis.call('DEL', KEYS[2])
+    elseif ARGV[3] ~= '-' then
+        redis.call('SET', KEYS[2], ARGV[3])
+    end
+    local version = redis.call('INCR', KEYS[4])
+    if ARGV[4] == 'delete' then
+        redis.call('HDEL', KEYS[3], ARGV[1])
+        redis.call('ZREM', KEYS[5], ARGV[1])
+        redis.call('ZADD', KEYS[10], version, ARGV[1])
+        local excess = redis.call('ZCARD', KEYS[10]) - tonumber(ARGV[9])
+        if excess > 0 then
+            local trimmed = redis.call('ZRANGE', KEYS[10], excess - 1, excess - 1, 'WITHSCORES')
+            redis.call('SET', KEYS[11], trimmed[2])
+            redis.call('ZREMRANGEBYRANK', KEYS[10], 0, excess - 1)
+        end
+    else
+        redis.call('HSET', KEYS[3], ARGV[1], version)
+        redis.call('ZADD', KEYS[5], version, ARGV[1])
+        redis.call('ZREM', KEYS[10], ARGV[1])
+    end
+    if ARGV[5] ~= '0' then
+        redis.call('XADD', KEYS[6], '*', 'op', ARGV[4], 'key', ARGV[1], 'value', ARGV[2],
+                   'redirect', redis.call('GET', KEYS[2]) or '', 'version', version)
+        local excess = redis.call('XLEN', KEYS[6]) - tonumber(ARGV[5])
+        if excess >= math.max(math.floor(tonumber(ARGV[5]) / 100), 1) then
+            local trimmed = redis.call('XRANGE', KEYS[6], '-', '+', 'COUNT', excess)
+            redis.call('SET', KEYS[12], trimmed[#trimmed][1])
+            redis.call('XTRIM', KEYS[6], 'MAXLEN', ARGV[5])
+        end
+    end
+    redis.call('PUBLISH', '{URL_CHANGES_CHANNEL}', ARGV[1])
+    return version
+end
+'''
+INSERT_URL_SCRIPT: Final = WRITE_URL_REDIRECT_SCRIPT + f'''
+if not redis.call('SET', KEYS[1], ARGV[2], 'NX') then
+    return 0
+end
+local version = write_redirect()
+redis.call('HINCRBY', KEYS[9], string.len(ARGV[1]), 1)
+if ARGV[6] ~= '' then
+    redis.call('HSET', KEYS[7], ARGV[1], ARGV[6])
+    redis.call('ZADD', '{USER_URLS_DOMAIN}:' .. ARGV[6], version, ARGV[1])
+end
+if ARGV[7] ~= '' then
+    redis.call('ZADD', KEYS[8], ARGV[7], ARGV[1])
+end
+if ARGV[8] ~= '' then
+    index_value(ARGV[2], true)
+end
+return 1
+'''
+UPDATE_URL_SCRIPT: Final = WRITE_URL_REDIRECT_SCRIPT + '''
+local previous = redis.call('GET', KEYS[1])
+if not redis.call('SET', KEYS[1], ARGV[2], 'XX') then
+    return 0
+end
+if ARGV[8] ~= '' and previous ~= ARGV[2] then
+    index_value(previous, false)
+    index_value(ARGV[2], true)
+end
+write_redirect()
+return 1
+'''
+DELETE_URL_SCRIPT: Final = WRITE_URL_REDIRECT_SCRIPT + f'''
+local previous = redis.call('GET', KEYS[1])
+if redis.call('DEL', KEYS[1]) == 0 then
+    return 0
+end
+if ARGV[8] ~= '' then
+    index_value(previous, false)
+end
+local owner = redis.call('HGET', KEYS[7], ARGV[1])
+if owner then
+    redis.call('HDEL', KEYS[7], ARGV[1])
+    redis.call('ZREM', '{USER_URLS_DOMAIN}:' .. owner, ARGV[1])
+end
+redis.call('ZREM', KEYS[8], ARGV[1])
+redis.call('HINCRBY', KEYS[9], string.len(ARGV[1]), -1)
+write_redirect()
+return 1
+'''
+INDEX_URL_SCRIPT: Final = WRITE_URL_REDIRECT_SCRIPT + '''
+local value = redis.call('GET', KEYS[1])
+if value then
+    index_value(value, true)
+end
+return value and 1 or 0
+'''
+# Assigns an url without owner (e.g. inserted before owners were recorded) to ARGV[2]; urls without version
+# (written before versions were recorded) get one, so that the owner's list can page them by version.
+OWN_URL_SCRIPT: Final = f'''
+if redis.call('EXISTS', KEYS[1]) == 0 or redis.call('HSETNX', KEYS[2], ARGV[1], ARGV[2]) == 0 then
+    return 0
+end
+local version = redis.call('HGET', KEYS[3], ARGV[1])
+if not version then
+    version = redis.call('INCR', KEYS[4])
+    redis.call('HSET', KEYS[3], ARGV[1], version)
+    redis.call('ZADD', KEYS[5], version, ARGV[1])
+end
+redis.call('ZADD', '{USER_URLS_DOMAIN}:' .. ARGV[2], version, ARGV[1])
+return 1
+'''
+
+url_flight = SingleFlight()
+url_breaker = CircuitBreaker()
+# Last-known-good resolutions: served if fresher than URL_CACHE_TTL, or if Redis is down.
+url_cache = LocalCache(max_size=10000, ttl=300.0)
+url_stale_stats = {'served': 0, 'unavailable': 0}
+url_shm = SharedUrlTable()
+url_hits = HitCounter(URL_HITS_KEY)
+url_keyspace = KeySpace(URL_KEY_LENGTH_KEY, URL_KEY_COUNTS_KEY, URL_KEY_ATTEMPTS_KEY)
+url_scripts = {}
 cli = AppGroup('urls', help='Manage urls.')
 
 
@@ -27,6 +224,39 @@ def init_app(app: Flask) -> Flask:
     :return: The Flask application instance.
     :rtype: Flask
     """
+    url_flight.enabled = app.config.get('URL_COALESCING', True)
+    url_breaker.enabled = app.config.get('BREAKER_ENABLED', True)
+    url_breaker.failure_threshold = app.config.get('BREAKER_FAILURE_THRESHOLD', 5)
+    url_breaker.reset_timeout = app.config.get('BREAKER_RESET_TIMEOUT', 5.0)
+    url_breaker.reset()
+    url_cache.max_size = app.config.get('URL_CACHE_SIZE', 10000)
+    url_cache.ttl = app.config.get('BREAKER_STALE_MAX_AGE', 300.0)
+    url_cache.clear()
+    url_hits.stop()
+    url_hits.enabled = app.config.get('URL_HITS_ENABLED')
+    if url_hits.enabled is None:
+        url_hits.enabled = app.config.get('URL_WARMUP_SIZE', 0) > 0
+    url_hits.flush_interval = app.config.get('URL_HITS_FLUSH_INTERVAL', 10.0)
+    url_hits.max_keys = app.config.get('URL_HITS_MAX_KEYS', 10000)
+    url_hits.decay_interval = app.config.get('URL_HITS_DECAY_INTERVAL', 3600.0)
+    url_hits.decay_factor = app.config.get('URL_HITS_DECAY_FACTOR', 0.5)
+    url_keyspace.alphabet = app.config.get('URL_KEY_ALPHABET', ascii_lowercase)
+    url_keyspace.min_length = app.config.get('URL_KEY_LENGTH', 6)
+    url_keyspace.max_length = app.config.get('URL_KEY_MAX_LENGTH', 12)
+    url_keyspace.grow_threshold = app.config.get('URL_KEY_GROW_THRESHOLD', 0.0)
+    url_keyspace.sync_interval = app.config.get('URL_KEYSPACE_SYNC_INTERVAL', 10.0)
+    url_keyspace.reset()
+    url_shm.close()
+    url_shm.enabled = app.config.get('URL_SHM_ENABLED', False)
+    url_shm.path = app.config.get('URL_SHM_PATH', url_shm.path)
+    url_shm.slots = app.config.get('URL_SHM_SLOTS', url_shm.slots)
+    url_shm.slot_size = app.config.get('URL_SHM_SLOT_SIZE', url_shm.slot_size)
+    url_shm.max_age = app.config.get('URL_SHM_MAX_AGE', 10.0)
+    url_scripts['insert'] = redis_client.register_script(INSERT_URL_SCRIPT)
+    url_scripts['update'] = redis_client.register_script(UPDATE_URL_SCRIPT)
+    url_scripts['delete'] = redis_client.register_script(DELETE_URL_SCRIPT)
+    url_scripts['index'] = redis_client.register_script(INDEX_URL_SCRIPT)
+    url_scripts['own'] = redis_client.register_script(OWN_URL_SCRIPT)
     app.cli.add_command(cli)
     return app
 
@@ -42,48 +272,251 @@ def get_urls() -> dict[str, str]:
             for key in redis_client.keys(f'{URL_KEYS_DOMAIN}:*')}
 
 
+def scan_urls(cursor: int = 0, count: int = 100) -> tuple[dict[str, str], int | None]:
+    """Get a page of all urls, scanning keys from the passed cursor (without blocking Redis): pages hold about
+    count urls (as many as returned by the scan calls); urls written during the scan may be missed.
+
+    :param cursor: Cursor returned with the previous page (default: 0, first page).
+    :type cursor: int
+    :param count: Minimum number of urls, unless this is the last page (default: 100).
+    :type count: int
+    :return: Dictionary of urls (keys and values) and cursor of the next page (None if this is the last one).
+    :rtype: tuple[dict[str, str], int | None]
+    """
+    keys = []
+    while True:
+        cursor, batch = redis_client.scan(cursor, match=f'{URL_KEYS_DOMAIN}:*', count=count)
+        keys.extend(batch)
+        if cursor == 0 or len(keys) >= count:
+            break
+    urls = {key.removeprefix(f'{URL_KEYS_DOMAIN}:'): value
+            for key, value in zip(keys, redis_client.mget(keys) if keys else []) if value is not None}
+    return urls, cursor or None
+
+
 def get_url_value(key: str) -> str | None:
     """Get url value by passed key.
 
+    Concurrent lookups for the same key share a single Redis call.
+
     :param key: Key to find.
     :type key: str
     :return: Url value found or None.
     :rtype: str | None
     """
-    return redis_client.get(f'{URL_KEYS_DOMAIN}:{key}')
+    return resolve_url(key)[0]
+
+
+def resolve_url(key: str) -> tuple[str | None, tuple[int, int | None] | None]:
+    """Get url value and redirect policy by passed key, with a single Redis call.
+    Urls found in the shared-memory table (if enabled) or in the local cache, if fresher than "URL_CACHE_TTL",
+    are served without any Redis call; found urls are counted in the hot keys sorted set.
+    Concurrent lookups for the same key share a single Redis call, guarded by the circuit breaker:
+    if Redis is unreachable (or the circuit is open) the last-known-good resolution is served,
+    unless older than "BREAKER_STALE_MAX_AGE".
+
+    :param key: Key to find.
+    :type key: str
+    :return: Url value found or None, and redirect policy (redirect code and max age) or None if default.
+    :rtype: tuple[str | None, tuple[int, int | None] | None]
+    :raises ServiceUnavailable: If Redis is unreachable and no last-known-good resolution is available.
+    """
+    result = url_shm.get(key) if url_shm.enabled else None
+    if result is None:
+        result = _resolve_url_cached(key)
+    if result[0] is not None:
+        url_hits.hit(key)
+    return result
 
 
-def insert_url(value: str) -> str:
+def _resolve_url_cached(key: str) -> tuple[str | None, tuple[int, int | None] | None]:
+    """Get url value and redirect policy by passed key from the local cache or Redis (see resolve_url).
+
+    :param key: Key to find.
+    :type key: str
+    :return: Url value found or None, and redirect policy or None if default.
+    :rtype: tuple[str | None, tuple[int, int | None] | None]
+    """
+    cache_ttl = current_app.config.get('URL_CACHE_TTL', 0)
+    if cache_ttl > 0:
+        result = url_cache.get(key, max_age=cache_ttl)
+        if result is not None:
+            return result
+    try:
+        result = url_flight.run(key, url_breaker.call, _resolve_url, key)
+    except (CircuitOpenError, *url_breaker.errors) as error:
+        result = url_cache.get(key)
+        if result is None:
+            url_stale_stats['unavailable'] += 1
+            retry_after = ceil(error.retry_after) if isinstance(error, CircuitOpenError) else None
+            raise ServiceUnavailable('Url backend unavailable, retry later', retry_after=retry_after) from error
+        url_stale_stats['served'] += 1
+        return result
+    if result[0] is None:
+        url_cache.delete(key)
+    else:
+        url_cache.set(key, result)
+    return result
+
+
+def _resolve_url(key: str) -> tuple[str | None, tuple[int, int | None] | None]:
+    """Get url value and redirect policy by passed key from Redis.
+
+    :param key: Key to find.
+    :type key: str
+    :return: Url value found or None, and redirect policy or None if default.
+    :rtype: tuple[str | None, tuple[int, int | None] | None]
+    """
+    value, redirect = redis_client.mget(f'{URL_KEYS_DOMAIN}:{key}', f'{URL_REDIRECTS_DOMAIN}:{key}')
+    return value, parse_redirect(redirect)
+
+
+def get_url(key: str) -> tuple[str | None, tuple[int, int | None] | None, int]:
+    """Get url value, redirect policy and version by passed key, with a single Redis call.
+
+    :param key: Key to find.
+    :type key: str
+    :return: Url value found or None, redirect policy (redirect code and max age) or None if default,
+        and url version.
+    :rtype: tuple[str | None, tuple[int, int | None] | None, int]
+    """
+    with redis_client.pipeline() as pipeline:
+        pipeline.mget(f'{URL_KEYS_DOMAIN}:{key}', f'{URL_REDIRECTS_DOMAIN}:{key}')
+        pipeline.hget(URL_VERSIONS_KEY, key)
+        (value, redirect), version = pipeline.execute()
+    return value, parse_redirect(redirect), int(version or 0)
+
+
+def get_url_version(key: str) -> int:
+    """Get url version: the urls version of its last write (unique across urls, deleted ones included).
+
+    :param key: Key to find.
+    :type key: str
+    :return: Url version (0 if missing or never written through this service).
+    :rtype: int
+    """
+    return int(redis_client.hget(URL_VERSIONS_KEY, key) or 0)
+
+
+def get_urls_version() -> int:
+    """Get urls (collection) version: it changes every time any url is written.
+
+    :return: Urls version.
+    :rtype: int
+    """
+    return int(redis_client.get(URLS_VERSION_KEY) or 0)
+
+
+def get_url_values(keys: list[str]) -> dict[str, str | None]:
+    """Get url values by passed keys with a single Redis call.
+
+    :param keys: Keys to find.
+    :type keys: list[str]
+    :return: Dictionary of urls (keys and values, None if not found), in the order of passed keys.
+    :rtype: dict[str, str | None]
+    """
+    keys = list(dict.fromkeys(keys))
+    if len(keys) < 1:
+        return {}
+    return dict(zip(keys, redis_client.mget([f'{URL_KEYS_DOMAIN}:{key}' for key in keys])))
+
+
+def get_url_redirect(key: str) -> tuple[int, int | None] | None:
+    """Get url redirect policy by passed key.
+
+    :param key: Key to find.
+    :type key: str
+    :return: Redirect policy (redirect code and max age) or None if default.
+    :rtype: tuple[int, int | None] | None
+    """
+    return parse_redirect(redis_client.get(f'{URL_REDIRECTS_DOMAIN}:{key}'))
+
+
+def insert_url(value: str, redirect: tuple[int, int | None] | None = None, owner: str | None = None) -> str:
     """Insert passed url value and generate a key to retrieve it.
 
     :param value: Url value to insert.
     :type value: str
+    :param redirect: Redirect policy (redirect code and max age) or None for default (default: None).
+    :type redirect: tuple[int, int | None] | None
+    :param owner: Username of the creator, to index the url among its urls (default: None, no owner).
+    :type owner: str | None
     :return: Key to retrieve the url.
     :rtype: str
     """
+    attempts = 1
     while True:
+        url_keyspace.refresh()
         key = generate_key()
-        result = redis_client.set(f'{URL_KEYS_DOMAIN}:{key}', value, nx=True)
-        if result is not None:
+        if _write_url('insert', key, value, format_redirect(redirect), owner=owner):
             break
+        attempts += 1
+    url_keyspace.record(attempts)
     return key
 
 
-def update_url(key: str, value: str | None) -> str:
+def insert_urls(values: list[str], owner: str | None = None) -> list[str]:
+    """Insert passed url values in bulk (pipelined) and generate the keys to retrieve them.
+
+    :param values: Url values to insert.
+    :type values: list[str]
+    :param owner: Username of the creator, to index the urls among its urls (default: None, no owner).
+    :type owner: str | None
+    :return: Keys to retrieve the urls, in the order of passed values.
+    :rtype: list[str]
+    """
+    keys: list[str | None] = [None] * len(values)
+    pending = list(range(len(values)))
+    attempts = 1
+    while pending:
+        url_keyspace.refresh()
+        with redis_client.pipeline(transaction=False) as pipeline:
+            for index in pending:
+                keys[index] = generate_key()
+                url_scripts['insert'](client=pipeline,
+                                      **_get_write_script_args('insert', keys[index], values[index], '', owner))
+            results = pipeline.execute()
+        for result in results:
+            if result:
+                url_keyspace.record(attempts)
+        pending = [index for index, result in zip(pending, results) if not result]
+        attempts += 1
+    return keys
+
+
+def delete_urls(keys: list[str]) -> int:
+    """Delete urls by passed keys in bulk (pipelined), ignoring missing ones.
+
+    :param keys: Url keys to delete.
+    :type keys: list[str]
+    :return: Number of deleted urls.
+    :rtype: int
+    """
+    with redis_client.pipeline(transaction=False) as pipeline:
+        for key in keys:
+            url_cache.delete(key)
+            url_scripts['delete'](client=pipeline, **_get_write_script_args('delete', key, '', ''))
+        return sum(pipeline.execute())
+
+
+def update_url(key: str, value: str | None, redirect: tuple[int, int | None] | None = None,
+               keep_redirect: bool = True) -> str:
     """Update url by passed key and value.
 
     :param key: Key to find.
     :type key: str
     :param value: Url value to update.
     :type value: str
+    :param redirect: Redirect policy (redirect code and max age) or None for default (default: None).
+    :type redirect: tuple[int, int | None] | None
+    :param keep_redirect: Keep the current redirect policy, ignoring redirect parameter (default: True).
+    :type keep_redirect: bool
     :return: New url value or None if no key found.
     :rtype: str | None
     """
-    url_value = get_url_value(key)
-    if url_value is None:
+    if not _write_url('update', key, value, '-' if keep_redirect else format_redirect(redirect)):
         raise NotFound('Url not found')
-
-    redis_client.set(f'{URL_KEYS_DOMAIN}:{key}', value)
+    purge_url(key)
     return value
 
 
@@ -93,35 +526,305 @@ def delete_url(key: str):
     :param key: Url key to delete.
     :type key: str
     """
-    if get_url_value(key) is None:
+    if not _write_url('delete', key, '', ''):
         raise NotFound('Url not found')
+    purge_url(key)
+    return 1
+
+
+def _write_url(operation: str, key: str, value: str, redirect: str, owner: str | None = None) -> bool:
+    """Write url with the passed operation script, bumping its versions and appending the change to the stream.
+    Only this process's local cache entry is dropped: other processes keep serving the previous resolution from
+    their local cache for up to "URL_CACHE_TTL" seconds (or from their shared-memory table until refreshed).
 
-    return redis_client.delete(f'{URL_KEYS_DOMAIN}:{key}')
+    :param operation: Operation ('insert', 'update' or 'delete').
+    :type operation: str
+    :param key: Url key.
+    :type key: str
+    :param value: Url value.
+    :type value: str
+    :param redirect: Formatted redirect policy ('-' to keep it, '' to remove it).
+    :type redirect: str
+    :param owner: Username of the creator, for inserts (default: None, no owner).
+    :type owner: str | None
+    :return: True if written, otherwise False.
+    :rtype: bool
+    """
+    url_cache.delete(key)
+    return bool(url_scripts[operation](**_get_write_script_args(operation, key, value, redirect, owner)))
+
+
+def _get_write_script_args(operation: str, key: str, value: str, redirect: str,
+                           owner: str | None = None) -> dict[str, list]:
+    """Get keys and arguments of the passed operation script, to call it directly or queue it in a pipeline.
+
+    :param operation: Operation ('insert', 'update' or 'delete').
+    :type operation: str
+    :param key: Url key.
+    :type key: str
+    :param value: Url value.
+    :type value: str
+    :param redirect: Formatted redirect policy ('-' to keep it, '' to remove it).
+    :type redirect: str
+    :param owner: Username of the creator, for inserts (default: None, no owner).
+    :type owner: str | None
+    :return: Script keys and arguments ("keys" and "args").
+    :rtype: dict[str, list]
+    """
+    created = time_ns() // 1000 if operation == 'insert' and current_app.config.get('URL_CREATED_INDEX') else ''
+    return {
+        'keys': [f'{URL_KEYS_DOMAIN}:{key}', f'{URL_REDIRECTS_DOMAIN}:{key}', URL_VERSIONS_KEY, URLS_VERSION_KEY,
+                 URL_CHANGELOG_KEY, URL_STREAM_KEY, URL_OWNERS_KEY, URL_CREATED_KEY, URL_KEY_COUNTS_KEY,
+                 URL_TOMBSTONES_KEY, URL_TOMBSTONES_FLOOR_KEY, URL_STREAM_TRIMMED_KEY],
+        'args': [key, value, redirect, operation, current_app.config.get('URL_STREAM_MAXLEN', 100000), owner or '',
+                 created, '1' if current_app.config.get('URL_SEARCH_INDEX') else '',
+                 current_app.config.get('URL_TOMBSTONES_MAXLEN', 100000)]
+    }
 # endregion
 
 
 # region Other functions
+def parse_redirect(redirect: str | None) -> tuple[int, int | None] | None:
+    """Parse stored redirect policy ("<redirect code>:<max age>").
+
+    :param redirect: Stored redirect policy or None.
+    :type redirect: str | None
+    :return: Redirect policy (redirect code and max age) or None if default.
+    :rtype: tuple[int, int | None] | None
+    """
+    if not redirect:
+        return None
+    code, _, max_age = redirect.partition(':')
+    return int(code), int(max_age) if max_age else None
+
+
+def format_redirect(redirect: tuple[int, int | None] | None) -> str:
+    """Format redirect policy to store it.
+
+    :param redirect: Redirect policy (redirect code and max age) or None for default.
+    :type redirect: tuple[int, int | None] | None
+    :return: Formatted redirect policy ('' if default).
+    :rtype: str
+    """
+    if redirect is None:
+        return ''
+    code, max_age = redirect
+    if code not in REDIRECT_CODES:
+        raise ValueError(f'Invalid redirect code: {code}')
+    if code == REDIRECT_DEFAULT_CODE and max_age is None:
+        return ''
+    return f'{code}:{"" if max_age is None else max_age}'
+
+
+def purge_url(key: str):
+    """Call the configured purge hook ("URL_PURGE_HOOK"), e.g. to invalidate a CDN, after url is changed.
+    Hook errors are logged and never fail the write.
+
+    :param key: Changed url key.
+    :type key: str
+    """
+    hook: Callable[[str], None] | str | None = current_app.config.get('URL_PURGE_HOOK')
+    if hook is None:
+        return
+    try:
+        (import_string(hook) if isinstance(hook, str) else hook)(key)
+    except Exception:  # pylint: disable=broad-except
+        current_app.logger.exception('Url purge hook failed for key: %s', key)
+
+
+def get_urls_resolutions(keys: list[str]) -> dict[str, tuple[str, tuple[int, int | None] | None]]:
+    """Get url values and redirect policies by passed keys with a single Redis call.
+
+    :param keys: Keys to find.
+    :type keys: list[str]
+    :return: Dictionary of found urls (keys, and values and redirect policies).
+    :rtype: dict[str, tuple[str, tuple[int, int | None] | None]]
+    """
+    if len(keys) < 1:
+        return {}
+    results = redis_client.mget([f'{domain}:{key}' for key in keys
+                                 for domain in (URL_KEYS_DOMAIN, URL_REDIRECTS_DOMAIN)])
+    return {key: (results[index * 2], parse_redirect(results[index * 2 + 1]))
+            for index, key in enumerate(keys) if results[index * 2] is not None}
+
+
+def sync_shared_urls(table: SharedUrlTable) -> int:
+    """Load all urls in the shared-memory table, removing those no longer in Redis.
+
+    :param table: Shared-memory table (writer).
+    :type table: SharedUrlTable
+    :return: Number of urls in table.
+    :rtype: int
+    """
+    stale = set(table.keys())
+    for keys in scan_url_keys():
+        refresh_shared_urls(table, keys)
+        stale.difference_update(keys)
+    for key in stale:
+        table.delete(key)
+    return len(table.keys())
+
+
+def refresh_shared_urls(table: SharedUrlTable, keys: list[str]):
+    """Refresh urls by passed keys in the shared-memory table from Redis (deleting missing ones).
+
+    :param table: Shared-memory table (writer).
+    :type table: SharedUrlTable
+    :param keys: Url keys.
+    :type keys: list[str]
+    """
+    resolutions = get_urls_resolutions(keys)
+    for key in keys:
+        if key in resolutions:
+            table.set(key, *resolutions[key])
+        else:
+            table.delete(key)
+
+
+def follow_shared_urls(table: SharedUrlTable, resync_interval: float):
+    """Keep the shared-memory table updated with the url changes published by writes, until Redis is lost:
+    changes are subscribed before a full resync (repeated every resync interval), so that none is missed,
+    and the table heartbeat is beaten every second while in sync.
+
+    :param table: Shared-memory table (writer).
+    :type table: SharedUrlTable
+    :param resync_interval: Seconds between full resyncs.
+    :type resync_interval: float
+    :raises RedisError: If Redis is lost.
+    """
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    try:
+        pubsub.subscribe(URL_CHANGES_CHANNEL)
+        synced_at = None
+        while True:
+            if synced_at is None or monotonic() - synced_at > resync_interval:
+                sync_shared_urls(table)
+                synced_at = monotonic()
+            table.beat()
+            message = pubsub.get_message(timeout=1.0)
+            if message is not None:
+                refresh_shared_urls(table, [message['data']])
+    finally:
+        pubsub.close()
+
+
+def scan_url_keys() -> Iterator[list[str]]:
+    """Scan url keys in batches, without blocking Redis (keys written during the scan may be missed).
+
+    :return: Batches of url keys.
+    :rtype: Iterator[list[str]]
+    """
+    cursor = None
+    while cursor != 0:
+        cursor, keys = redis_client.scan(cursor or 0, match=f'{URL_KEYS_DOMAIN}:*', count=URL_SCAN_BATCH_SIZE)
+        if keys:
+            yield [key.removeprefix(f'{URL_KEYS_DOMAIN}:') for key in keys]
+
+
+def iter_url_keys() -> Iterator[str]:
+    """Iterate all url keys, scanned in batches.
+
+    :return: Url keys.
+    :rtype: Iterator[str]
+    """
+    for keys in scan_url_keys():
+        yield from keys
+
+
 def generate_key() -> str:
-    """Generate new key.
+    """Generate new key of the current key length, as of the last key space sync (never one of the reserved keys,
+    used by routes).
 
     :return: New key.
     :rtype: str
     """
-    return ''.join(SystemRandom().choice(ascii_lowercase) for _ in range(6))
+    while True:
+        key = url_keyspace.generate()
+        if key not in RESERVED_KEYS:
+            return key
+
+
+def get_keyspace_stats(sample_size: int = 100) -> dict[str, Any]:
+    """Get key space statistics, syncing with Redis first.
+    The memory usage per url includes its share of the indexes: the ones with an entry per url (versions, owners,
+    creation time and changelog) are shared among all urls, the owners' url indexes are sampled through the owners of
+    the sampled urls.
+
+    :param sample_size: Number of urls whose memory usage is sampled (default: 100).
+    :type sample_size: int
+    :return: Url count (and counts by key length), key length, alphabet size, occupancy of the key length,
+        insert attempts histogram (all processes), memory usage per url (average of sampled urls with their
+        redirect policies, plus their share of the indexes) and the share of the indexes (both None if no url),
+        with the number of urls sampled, and whether counts were ever recounted.
+    :rtype: dict[str, Any]
+    """
+    url_keyspace.sync()
+    sample = []
+    for keys in scan_url_keys():
+        sample.extend(keys[:sample_size - len(sample)])
+        if len(sample) >= sample_size:
+            break
+    with redis_client.pipeline(transaction=False) as pipeline:
+        for key in sample:
+            pipeline.memory_usage(f'{URL_KEYS_DOMAIN}:{key}')
+            pipeline.memory_usage(f'{URL_REDIRECTS_DOMAIN}:{key}')
+            pipeline.hget(URL_OWNERS_KEY, key)
+        for index_key in (URL_VERSIONS_KEY, URL_OWNERS_KEY, URL_CREATED_KEY, URL_CHANGELOG_KEY):
+            pipeline.memory_usage(index_key)
+        results = pipeline.execute()
+    memory = [usage + (redirect or 0) for usage, redirect in zip(results[:-4:3], results[1:-4:3]) if usage is not None]
+    owned = [owner for owner in results[2:-4:3] if owner is not None]
+    counts = url_keyspace.counts or {}
+    count = sum(counts.values())
+    indexes = sum(usage or 0 for usage in results[-4:]) / count if count else 0.0
+    if owned:
+        indexes += _get_user_urls_memory(owned) * len(owned) / len(sample)
+    return {
+        'count': count,
+        'counts': dict(sorted(counts.items())),
+        'length': url_keyspace.length,
+        'alphabet': len(url_keyspace.alphabet),
+        'occupancy': url_keyspace.get_occupancy(),
+        'attempts': url_keyspace.get_attempts(),
+        'memory': sum(memory) / len(memory) + indexes if memory else None,
+        'indexes': indexes if memory else None,
+        'sampled': len(memory),
+        'recounted': url_keyspace.recounted
+    }
+
+
+def _get_user_urls_memory(owners: list[str]) -> float:
+    """Get memory usage per entry of the passed owners' url indexes.
+
+    :param owners: Owners (usernames).
+    :type owners: list[str]
+    :return: Average memory usage per entry (0 if no entry).
+    :rtype: float
+    """
+    with redis_client.pipeline(transaction=False) as pipeline:
+        for owner in set(owners):
+            pipeline.memory_usage(f'{USER_URLS_DOMAIN}:{owner}')
+            pipeline.zcard(f'{USER_URLS_DOMAIN}:{owner}')
+        results = pipeline.execute()
+    entries = sum(results[1::2])
+    return sum(usage or 0 for usage in results[::2]) / entries if entries else 0.0
 # endregion
 
 
 # region CLI functions
 @cli.command('new', help='Insert new url.')
 @option('-u', '--url', type=STRING, prompt='Enter the url', help='Specify the url.')
-def new_url(url: str):
+@option('-o', '--owner', type=STRING, default=None, help='Specify the username of the owner.')
+def new_url(url: str, owner: str | None):
     """Insert new url.
 
     :param url: Url value.
     :type url: str
+    :param owner: Username of the owner (None if none).
+    :type owner: str | None
     """
     print(f'Insert url: {url}...')
-    key = insert_url(url)
+    key = insert_url(url, owner=owner)
     print(f'Done.{linesep}Use the following key to retrieve it: {key}.')
 
 
@@ -136,4 +839,59 @@ def del_url(key: str):
     print(f'Deleting url: {key}...')
     delete_url(key)
     print('Done.')
+
+
+@cli.command('shm-refresh', help='Populate the shared-memory url table and keep it updated (one per host).')
+@option('--once', is_flag=True, help='Populate the table and exit.')
+def shm_refresh(once: bool):
+    """Populate the shared-memory url table and keep it updated with the url changes published by writes.
+    A full resync runs every "URL_SHM_RESYNC_INTERVAL" seconds, and after every reconnection if Redis is lost
+    (meanwhile the heartbeat gets old and readers fall back to Redis).
+
+    :param once: Populate the table and exit.
+    :type once: bool
+    """
+    table = SharedUrlTable()
+    table.path, table.slots, table.slot_size = url_shm.path, url_shm.slots, url_shm.slot_size
+    table.create()
+    try:
+        print(f'Loaded {sync_shared_urls(table)} urls in: {table.path}.')
+        table.beat()
+        while not once:
+            try:
+                follow_shared_urls(table, current_app.config.get('URL_SHM_RESYNC_INTERVAL', 300.0))
+            except RedisError as error:
+                current_app.logger.warning('Shared-memory url table out of sync, reconnecting: %s', error)
+                sleep(URL_SHM_RECONNECT_INTERVAL)
+    finally:
+        table.close()
+
+
+@cli.command('stats', help='Print key space statistics: urls, occupancy, insert attempts and memory per url.')
+@option('-s', '--sample', type=INT, default=100, show_default=True, help='Specify the number of urls to sample.')
+@option('--recount', is_flag=True, help='Recount urls by key length first (scanning all urls).')
+def keyspace_stats(sample: int, recount: bool):
+    """Print key space statistics.
+
+    :param sample: Number of urls whose memory usage is sampled.
+    :type sample: int
+    :param recount: Recount urls by key length first.
+    :type recount: bool
+    """
+    if recount:
+        url_keyspace.recount(iter_url_keys())
+    stats = get_keyspace_stats(sample)
+    counts = ', '.join(f'{length}: {count}' for length, count in stats['counts'].items())
+    attempts = ', '.join(f'{attempts}: {count}' for attempts, count in stats['attempts'].items())
+    print(f'Urls: {stats["count"]} (by key length: {counts or "none"}).')
+    print(f'Key length: {stats["length"]} (alphabet of {stats["alphabet"]} characters), '
+          f'occupancy: {stats["occupancy"]:.6%}.')
+    print(f'Inserts by attempts: {attempts or "none"}.')
+    if not stats['recounted']:
+        print('Urls were never recounted: urls written before counting are missing, run with --recount.')
+    if stats['memory'] is not None:
+        print(f'Memory per url: {stats["memory"]:.0f} bytes, {stats["indexes"]:.0f} of them in indexes '
+              f'(sampled {stats["sampled"]} urls).')
+
+
 # endregion
@@ -0,0 +1,267 @@
+# coding=utf-8
+
+"""shortipy.services.urlchanges file."""
+
+from typing import Final, Any, Callable, Iterator
+from os import makedirs, path, replace
+from json import dumps
+from sys import stderr
+
+from click import INT, STRING, Path, option
+from flask import Flask
+
+from shortipy.services.redis import redis_client
+from shortipy.services.staticmap import Entry, BinaryMapWriter, StaticUrlMap, write_nginx_map
+from shortipy.services.url import (
+    URL_STREAM_KEY, URL_STREAM_TRIMMED_KEY, URL_CHANGELOG_KEY, URL_TOMBSTONES_KEY, URL_TOMBSTONES_FLOOR_KEY,
+    URLS_VERSION_KEY, cli, parse_redirect, get_urls_version, get_urls_resolutions, scan_url_keys
+)
+
+URL_STREAM_MAX_COUNT: Final = 1000
+URL_MAP_NGINX_FILENAME: Final = 'urls.map'
+URL_MAP_DELTA_FILENAME: Final = 'urls.delta.map'
+URL_MAP_BINARY_FILENAME: Final = 'urls.bin'
+URL_MAP_VERSION_FILENAME: Final = 'urls.version'
+
+
+def init_app(app: Flask) -> Flask:
+    """Initializes the url change feeds (the change stream and the changelog, compiled in edge maps):
+    their commands are part of the urls CLI group.
+
+    :param app: The Flask application instance.
+    :type app: Flask
+    :return: The Flask application instance.
+    :rtype: Flask
+    """
+    app.cli.add_command(cli)
+    return app
+
+
+# region Change functions
+def get_url_changes(since: str = '0', count: int = 100,
+                    block: int | None = None) -> tuple[list[dict[str, Any]], bool]:
+    """Get url changes (inserts, updates and deletes) appended to the change stream after passed change id.
+
+    :param since: Change id (stream entry id) of the last change seen, '0' for all (default: '0').
+    :type since: str
+    :param count: Maximum number of changes (default: 100).
+    :type count: int
+    :param block: Milliseconds to wait for changes if none, None to not wait (default: None).
+    :type block: int | None
+    :return: Changes (id, operation, key, value or None if deleted, redirect policy and urls version)
+        and True if changes after passed id were trimmed from the capped stream (a full resync is needed):
+        passed id is older than the last trimmed change (or than the first change, if none was trimmed yet).
+    :rtype: tuple[list[dict[str, Any]], bool]
+    """
+    truncated = False
+    if since not in ('0', '0-0'):
+        with redis_client.pipeline(transaction=False) as pipeline:
+            pipeline.get(URL_STREAM_TRIMMED_KEY)
+            pipeline.xrange(URL_STREAM_KEY, count=1)
+            trimmed, first = pipeline.execute()
+        if trimmed is not None:
+            truncated = parse_change_id(since) < parse_change_id(trimmed)
+        else:
+            truncated = len(first) > 0 and parse_change_id(since) < parse_change_id(first[0][0])
+    result = redis_client.xread({URL_STREAM_KEY: since}, count=count, block=block)
+    changes = [{
+        'id': change_id,
+        'op': fields['op'],
+        'key': fields['key'],
+        'value': fields['value'] if fields['op'] != 'delete' else None,
+        'redirect': parse_redirect(fields['redirect']),
+        'version': int(fields['version'])
+    } for _, entries in result for change_id, fields in entries]
+    return changes, truncated
+
+
+def parse_change_id(change_id: str) -> tuple[int, int]:
+    """Parse change id (stream entry id, "<milliseconds>-<sequence>").
+
+    :param change_id: Change id.
+    :type change_id: str
+    :return: Milliseconds and sequence.
+    :rtype: tuple[int, int]
+    """
+    milliseconds, _, sequence = change_id.partition('-')
+    return int(milliseconds), int(sequence or 0)
+
+
+def get_changed_url_keys(since: int) -> tuple[list[str] | None, int]:
+    """Get keys of urls written (inserted, updated or deleted) after passed urls version.
+
+    :param since: Urls version.
+    :type since: int
+    :return: Changed keys (None if deleted keys since then were trimmed from the tombstones) and current urls version.
+    :rtype: tuple[list[str] | None, int]
+    """
+    with redis_client.pipeline() as pipeline:
+        pipeline.zrangebyscore(URL_CHANGELOG_KEY, f'({since}', '+inf')
+        pipeline.zrangebyscore(URL_TOMBSTONES_KEY, f'({since}', '+inf')
+        pipeline.get(URL_TOMBSTONES_FLOOR_KEY)
+        pipeline.get(URLS_VERSION_KEY)
+        keys, deleted, floor, version = pipeline.execute()
+    if since < int(floor or 0):
+        return None, int(version or 0)
+    return keys + deleted, int(version or 0)
+
+
+def compile_url_map(directory: str, incremental: bool = False) -> tuple[int, int, int]:
+    """Compile urls in an nginx map ("urls.map") and a sorted binary table ("urls.bin"), atomically.
+    Urls are streamed (scanned in batches, or read from the previous binary table) to both files.
+    Incremental compiles read only the urls changed since the last compile (from the changelog and the tombstones),
+    merge them in the previous binary table and also write them alone in "urls.delta.map"
+    (deleted urls mapped to an empty value); they fall back to full compiles if tombstones were trimmed meanwhile.
+
+    :param directory: Output directory.
+    :type directory: str
+    :param incremental: Compile only urls changed since the last compile, if any (default: False).
+    :type incremental: bool
+    :return: Urls compiled, urls changed (all if not incremental) and urls version compiled.
+    :rtype: tuple[int, int, int]
+    """
+    makedirs(directory, exist_ok=True)
+    version_filename = path.join(directory, URL_MAP_VERSION_FILENAME)
+    binary_filename = path.join(directory, URL_MAP_BINARY_FILENAME)
+    keys = None
+    if incremental and path.isfile(version_filename) and path.isfile(binary_filename):
+        with open(version_filename, encoding='utf8') as file:
+            since = int(file.read().strip() or 0)
+        keys, version = get_changed_url_keys(since)
+    with BinaryMapWriter(binary_filename) as writer:
+        if keys is not None:
+            resolutions = get_urls_resolutions(keys)
+            changed = [_get_map_entry(key, *resolutions[key]) if key in resolutions else (key, '', 0, -1)
+                       for key in keys]
+            _write_text(path.join(directory, URL_MAP_DELTA_FILENAME), write_nginx_map, changed, version)
+            with StaticUrlMap(binary_filename) as static_map:
+                _write_text(path.join(directory, URL_MAP_NGINX_FILENAME), write_nginx_map,
+                            _merge_map_entries(writer, static_map, resolutions, set(keys)), version)
+        else:
+            version = get_urls_version()
+            _write_text(path.join(directory, URL_MAP_NGINX_FILENAME), write_nginx_map, _scan_map_entries(writer),
+                        version)
+        compiled = writer.commit(version)
+    with open(version_filename, 'w', encoding='utf8') as file:
+        file.write(str(version))
+    return compiled, compiled if keys is None else len(keys), version
+
+
+def _scan_map_entries(writer: BinaryMapWriter) -> Iterator[Entry]:
+    """Scan all urls as map entries, adding them to the binary table writer.
+
+    :param writer: Binary table writer.
+    :type writer: BinaryMapWriter
+    :return: Entries.
+    :rtype: Iterator[Entry]
+    """
+    for keys in scan_url_keys():
+        for key, resolution in get_urls_resolutions(keys).items():
+            entry = _get_map_entry(key, *resolution)
+            writer.add(entry)
+            yield entry
+
+
+def _merge_map_entries(writer: BinaryMapWriter, static_map: StaticUrlMap,
+                       resolutions: dict[str, tuple[str, tuple[int, int | None] | None]],
+                       keys: set[str]) -> Iterator[Entry]:
+    """Merge changed urls in the entries of the previous binary table, adding them to the binary table writer.
+
+    :param writer: Binary table writer.
+    :type writer: BinaryMapWriter
+    :param static_map: Previous binary table.
+    :type static_map: StaticUrlMap
+    :param resolutions: Changed urls found (deleted ones are missing).
+    :type resolutions: dict[str, tuple[str, tuple[int, int | None] | None]]
+    :param keys: Changed keys.
+    :type keys: set[str]
+    :return: Entries.
+    :rtype: Iterator[Entry]
+    """
+    for entry in static_map:
+        if entry[0] not in keys:
+            writer.add(entry)
+            yield entry
+    for key, resolution in resolutions.items():
+        entry = _get_map_entry(key, *resolution)
+        writer.add(entry)
+        yield entry
+
+
+def _get_map_entry(key: str, value: str, redirect: tuple[int, int | None] | None) -> Entry:
+    """Get url map entry.
+
+    :param key: Url key.
+    :type key: str
+    :param value: Url value.
+    :type value: str
+    :param redirect: Redirect policy (redirect code and max age) or None if default.
+    :type redirect: tuple[int, int | None] | None
+    :return: Entry (key, value, redirect code or 0 if default, max age or -1 if none).
+    :rtype: Entry
+    """
+    if redirect is None:
+        return key, value, 0, -1
+    return key, value, redirect[0], -1 if redirect[1] is None else redirect[1]
+
+
+def _write_text(filename: str, writer: Callable[..., int], *args):
+    """Write text file atomically.
+
+    :param filename: File name.
+    :type filename: str
+    :param writer: Function writing to the file, receiving it and passed arguments.
+    :type writer: Callable[..., int]
+    """
+    with open(f'{filename}.tmp', 'w', encoding='utf8') as file:
+        writer(file, *args)
+    replace(f'{filename}.tmp', filename)
+# endregion
+
+
+# region CLI functions
+@cli.command('tail', help='Print url changes (JSON lines) after a change id.')
+@option('-s', '--since', type=STRING, default='0', show_default=True,
+        help='Specify the change id of the last change seen (0 for all the stream).')
+@option('-n', '--count', type=INT, default=URL_STREAM_MAX_COUNT, show_default=True,
+        help='Specify changes read per call.')
+@option('-f', '--follow', is_flag=True, help='Wait for new changes.')
+def tail_urls(since: str, count: int, follow: bool):
+    """Print url changes after a change id, as JSON lines.
+
+    :param since: Change id of the last change seen.
+    :type since: str
+    :param count: Changes read per call.
+    :type count: int
+    :param follow: Wait for new changes.
+    :type follow: bool
+    """
+    changes, truncated = get_url_changes(since, count)
+    if truncated:
+        print(f'Changes after {since} were trimmed from the stream: resync first.', file=stderr)
+    while changes or follow:
+        for change in changes:
+            print(dumps(change), flush=True)
+        since = changes[-1]['id'] if changes else since
+        changes, truncated = get_url_changes(since, count, 1000 if follow else None)
+        if truncated:
+            # Fell behind the stream trimming: changes were missed, so stop rather than follow with a gap.
+            print(f'Changes after {since} were trimmed from the stream while following: resync first.', file=stderr)
+            raise SystemExit(1)
+
+
+@cli.command('compile-map', help='Compile urls in an nginx map and a sorted binary table, for edge servers.')
+@option('-o', '--output', type=Path(file_okay=False, writable=True), default='.', show_default=True,
+        help='Specify the output directory.')
+@option('-i', '--incremental', is_flag=True, help='Compile only urls changed since the last compile.')
+def compile_map(output: str, incremental: bool):
+    """Compile urls in an nginx map and a sorted binary table.
+
+    :param output: Output directory.
+    :type output: str
+    :param incremental: Compile only urls changed since the last compile.
+    :type incremental: bool
+    """
+    compiled, changed, version = compile_url_map(output, incremental)
+    print(f'Compiled {compiled} urls ({changed} changed) at version {version} in: {output}.')
+# endregion
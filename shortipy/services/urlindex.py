@@ -0,0 +1,287 @@
+# coding=utf-8
+
+"""shortipy.services.urlindex file."""
+
+from typing import Iterator
+from hashlib import sha1
+from time import time
+from os import linesep
+from urllib.parse import urlsplit
+
+from click import option, STRING
+from flask import Flask
+
+from shortipy.services.redis import redis_client
+from shortipy.services.url import (
+    URL_KEYS_DOMAIN, URL_VERSIONS_KEY, URLS_VERSION_KEY, URL_CHANGELOG_KEY, URL_OWNERS_KEY, USER_URLS_DOMAIN,
+    URL_CREATED_KEY, URL_DOMAINS_DOMAIN, URL_TRIGRAMS_DOMAIN, URL_SEARCH_RESULTS_DOMAIN, URL_SEARCH_RESULTS_TTL,
+    URL_SCAN_BATCH_SIZE, url_scripts, cli, scan_url_keys, get_urls_version
+)
+from shortipy.services.urlchanges import get_url_changes, parse_change_id
+
+
+def init_app(app: Flask) -> Flask:
+    """Initializes the url indexes (by owner, by creation time and for search, maintained by the write scripts):
+    their commands are part of the urls CLI group.
+
+    :param app: The Flask application instance.
+    :type app: Flask
+    :return: The Flask application instance.
+    :rtype: Flask
+    """
+    app.cli.add_command(cli)
+    return app
+
+
+# region Query functions
+def get_user_urls(username: str, cursor: int = 0, count: int = 100) -> tuple[dict[str, str], int | None]:
+    """Get a page of the urls created by the passed user, oldest first, reading only the page from its index.
+
+    :param username: User's username.
+    :type username: str
+    :param cursor: Cursor returned with the previous page (default: 0, first page).
+    :type cursor: int
+    :param count: Maximum number of urls (default: 100).
+    :type count: int
+    :return: Dictionary of urls (keys and values) and cursor of the next page (None if this is the last one).
+    :rtype: tuple[dict[str, str], int | None]
+    """
+    entries = redis_client.zrangebyscore(f'{USER_URLS_DOMAIN}:{username}', f'({cursor}', '+inf',
+                                         start=0, num=count + 1, withscores=True)
+    next_cursor = int(entries[count - 1][1]) if len(entries) > count else None
+    keys = [key for key, _ in entries[:count]]
+    if not keys:
+        return {}, None
+    values = redis_client.mget([f'{URL_KEYS_DOMAIN}:{key}' for key in keys])
+    return {key: value for key, value in zip(keys, values) if value is not None}, next_cursor
+
+
+def get_created_urls(since: float | None = None, until: float | None = None, descending: bool = False,
+                     cursor: int | None = None, count: int = 100) -> tuple[list[tuple[str, str, float]], int | None]:
+    """Get a page of the urls created in the passed time range, from the creation index (reading only the page).
+    Urls created in the same microsecond are never split across pages.
+
+    :param since: Minimum creation timestamp, included (default: None, no minimum).
+    :type since: float | None
+    :param until: Maximum creation timestamp, included (default: None, no maximum).
+    :type until: float | None
+    :param descending: Newest first (default: False, oldest first).
+    :type descending: bool
+    :param cursor: Cursor returned with the previous page (default: None, first page).
+    :type cursor: int | None
+    :param count: Maximum number of urls (default: 100).
+    :type count: int
+    :return: Urls (keys, values and creation timestamps) and cursor of the next page (None if this is the last one).
+    :rtype: tuple[list[tuple[str, str, float]], int | None]
+    """
+    minimum = float('-inf') if since is None else round(since * 1000000)
+    maximum = float('inf') if until is None else round(until * 1000000)
+    if cursor is not None:
+        if descending:
+            maximum = min(maximum, cursor - 1)
+        else:
+            minimum = max(minimum, cursor + 1)
+    if descending:
+        entries = redis_client.zrevrangebyscore(URL_CREATED_KEY, maximum, minimum, start=0, num=count + 1,
+                                                withscores=True)
+    else:
+        entries = redis_client.zrangebyscore(URL_CREATED_KEY, minimum, maximum, start=0, num=count + 1,
+                                             withscores=True)
+    next_cursor = None
+    if len(entries) > count:
+        last = entries[count - 1][1]
+        if entries[count][1] == last:
+            page = {key for key, _ in entries[:count]}
+            entries[count:] = [(key, last) for key in redis_client.zrangebyscore(URL_CREATED_KEY, last, last)
+                               if key not in page]
+        else:
+            del entries[count:]
+        next_cursor = int(last)
+    if not entries:
+        return [], None
+    values = redis_client.mget([f'{URL_KEYS_DOMAIN}:{key}' for key, _ in entries])
+    return [(key, value, created / 1000000) for (key, created), value in zip(entries, values)
+            if value is not None], next_cursor
+
+
+def search_urls(domain: str | None = None, query: str | None = None, cursor: str | None = None,
+                count: int = 100) -> tuple[dict[str, str], str | None]:
+    """Search urls pointing at the passed domain (or its subdomains) and/or containing the passed substring
+    (case-insensitive, at least 3 characters), by key order, reading only candidates from the search index:
+    the keys of the domain or the intersection of the substring trigrams (stored by Redis for the next pages, until
+    any url is written). Candidates are checked against url values.
+
+    :param domain: Domain (default: None, any).
+    :type domain: str | None
+    :param query: Substring (default: None, any).
+    :type query: str | None
+    :param cursor: Cursor returned with the previous page (the last key of the page) (default: None, first page).
+    :type cursor: str | None
+    :param count: Maximum number of urls (default: 100).
+    :type count: int
+    :return: Dictionary of urls (keys and values) and cursor of the next page (None if this is the last one).
+    :rtype: tuple[dict[str, str], str | None]
+    """
+    domain = domain.lower() if domain is not None else None
+    encoded_query = query.encode().lower() if query is not None else None
+    urls = {}
+    for keys in _iter_search_candidates(domain, encoded_query, cursor, count + 1):
+        for key, value in zip(keys, redis_client.mget([f'{URL_KEYS_DOMAIN}:{key}' for key in keys])):
+            if value is None or (encoded_query is not None and encoded_query not in value.encode().lower()):
+                continue
+            if domain is not None and not _is_url_in_domain(value, domain):
+                continue
+            if len(urls) == count:
+                return urls, next(reversed(urls))
+            urls[key] = value
+    return urls, None
+
+
+def _iter_search_candidates(domain: str | None, query: bytes | None, cursor: str | None,
+                            batch_size: int) -> Iterator[list[str]]:
+    """Iterate search candidates after the cursor, by key order, in batches paged by Redis.
+    Substring candidates are the intersection of the trigram sets, stored as a sorted set (all scores equal, so it
+    is ordered by key) for the current urls version, so that later pages of the same search reuse it.
+
+    :param domain: Lowercase domain (None for any).
+    :type domain: str | None
+    :param query: Lowercase encoded substring (None for any).
+    :type query: bytes | None
+    :param cursor: Last key of the previous page (None for the first page).
+    :type cursor: str | None
+    :param batch_size: Batch size.
+    :type batch_size: int
+    :return: Batches of candidate keys.
+    :rtype: Iterator[list[str]]
+    """
+    if domain is not None:
+        candidates_key = f'{URL_DOMAINS_DOMAIN}:{domain}'
+    elif query is not None and len(query) >= 3:
+        trigrams = sorted({query[index:index + 3] for index in range(len(query) - 2)})
+        candidates_key = f'{URL_SEARCH_RESULTS_DOMAIN}:{get_urls_version()}:{sha1(b"".join(trigrams)).hexdigest()}'
+        if not redis_client.exists(candidates_key):
+            with redis_client.pipeline() as pipeline:
+                pipeline.zinterstore(candidates_key, [f'{URL_TRIGRAMS_DOMAIN}:'.encode() + trigram
+                                                      for trigram in trigrams])
+                pipeline.expire(candidates_key, URL_SEARCH_RESULTS_TTL)
+                pipeline.execute()
+    else:
+        return
+    start = '-' if cursor is None else f'({cursor}'
+    while True:
+        keys = redis_client.zrangebylex(candidates_key, start, '+', start=0, num=batch_size)
+        if keys:
+            yield keys
+        if len(keys) < batch_size:
+            return
+        start = f'({keys[-1]}'
+
+
+def _is_url_in_domain(value: str, domain: str) -> bool:
+    """Check if url points at passed domain or at its subdomains.
+
+    :param value: Url value.
+    :type value: str
+    :param domain: Lowercase domain.
+    :type domain: str
+    :return: True if url host is domain or one of its subdomains, otherwise False.
+    :rtype: bool
+    """
+    try:
+        host = urlsplit(value).hostname or ''
+    except ValueError:
+        return False
+    return host == domain or host.endswith(f'.{domain}')
+# endregion
+
+
+# region Backfill functions
+def backfill_created_index() -> int:
+    """Add urls missing from the creation index: their creation time is read from the change stream
+    if their insert is still there, otherwise the backfill time is used.
+
+    :return: Number of urls added.
+    :rtype: int
+    """
+    now = time()
+    created = {}
+    since = '0'
+    while True:
+        changes, _ = get_url_changes(since, URL_SCAN_BATCH_SIZE)
+        if not changes:
+            break
+        for change in changes:
+            if change['op'] == 'insert':
+                created[change['key']] = parse_change_id(change['id'])[0] * 1000
+        since = changes[-1]['id']
+    added = 0
+    for keys in scan_url_keys():
+        added += redis_client.zadd(URL_CREATED_KEY, {key: created.get(key, int(now * 1000000)) for key in keys},
+                                   nx=True)
+    return added
+
+
+def backfill_owners(username: str) -> int:
+    """Assign urls without owner (inserted before owners were recorded, which no user lists) to the passed user.
+
+    :param username: Owner's username.
+    :type username: str
+    :return: Number of urls assigned.
+    :rtype: int
+    """
+    assigned = 0
+    for keys in scan_url_keys():
+        with redis_client.pipeline(transaction=False) as pipeline:
+            for key in keys:
+                url_scripts['own'](keys=[f'{URL_KEYS_DOMAIN}:{key}', URL_OWNERS_KEY, URL_VERSIONS_KEY,
+                                         URLS_VERSION_KEY, URL_CHANGELOG_KEY],
+                                   args=[key, username], client=pipeline)
+            assigned += sum(pipeline.execute())
+    return assigned
+
+
+def backfill_search_index() -> int:
+    """Add existing urls to the search index (entries of urls deleted while the index was disabled are left,
+    searches check candidates against url values anyway).
+
+    :return: Number of urls indexed.
+    :rtype: int
+    """
+    indexed = 0
+    for keys in scan_url_keys():
+        with redis_client.pipeline(transaction=False) as pipeline:
+            for key in keys:
+                url_scripts['index'](keys=[f'{URL_KEYS_DOMAIN}:{key}'], args=[key], client=pipeline)
+            indexed += sum(pipeline.execute())
+    return indexed
+# endregion
+
+
+# region CLI functions
+@cli.command('index-created', help='Add existing urls to the creation index.')
+def index_created():
+    """Add existing urls to the creation index (urls whose insert is no longer in the change stream
+    are indexed with the current time).
+    """
+    print('Indexing urls by creation time...')
+    print(f'Done.{linesep}Indexed {backfill_created_index()} urls.')
+
+
+@cli.command('index-owners', help='Assign urls without owner (inserted before owners were recorded) to a user.')
+@option('-o', '--owner', type=STRING, prompt='Enter the owner\'s username', help='Specify the username of the owner.')
+def index_owners(owner: str):
+    """Assign urls without owner to the passed user (e.g. an administrator), so that they are listed again.
+
+    :param owner: Username of the owner.
+    :type owner: str
+    """
+    print(f'Assigning urls without owner to user: {owner}...')
+    print(f'Done.{linesep}Assigned {backfill_owners(owner)} urls.')
+
+
+@cli.command('index-search', help='Add existing urls to the search index.')
+def index_search():
+    """Add existing urls to the search index."""
+    print('Indexing urls for search...')
+    print(f'Done.{linesep}Indexed {backfill_search_index()} urls.')
+# endregion
@@ -0,0 +1,120 @@
+# coding=utf-8
+
+"""shortipy.services.warmup file."""
+
+from os import register_at_fork
+from threading import Event, Thread
+from time import monotonic
+
+from flask import Flask
+from redis.exceptions import RedisError
+
+from shortipy.services.redis import prewarm_state
+from shortipy.services.url import url_cache, url_hits, get_urls_resolutions
+
+
+class WarmUp:
+    """Class to preload the most resolved urls in the local url cache, in background, at startup.
+    The application is reported ready once warm-up completes or times out. Workers forked while it runs
+    (e.g. gunicorn with preload) restart it, since its threads are not forked.
+    """
+
+    def __init__(self):
+        """WarmUp constructor."""
+        self.size = 0
+        self.batch_size = 500
+        self.timeout = 10.0
+        self.loaded = 0
+        self.seconds: float | None = None
+        self.error: str | None = None
+        self._done = Event()
+        self._ready = Event()
+        self._ready.set()
+
+    def start(self):
+        """Start warm-up in background (if size is set) and the timeout after which ready is reported anyway."""
+        self.loaded, self.seconds, self.error = 0, None, None
+        if self.size < 1:
+            self._done.set()
+            self._ready.set()
+            return
+        self._done.clear()
+        self._ready.clear()
+        Thread(target=self.run, daemon=True).start()
+        Thread(target=self._ready_on_timeout, daemon=True).start()
+
+    def run(self):
+        """Preload the most resolved urls in the local url cache, in MGET batches (warm-up thread)."""
+        start = monotonic()
+        try:
+            keys = url_hits.top(min(self.size, url_cache.max_size))
+            for batch in range(0, len(keys), self.batch_size):
+                for key, resolution in get_urls_resolutions(keys[batch:batch + self.batch_size]).items():
+                    url_cache.set(key, resolution)
+                    self.loaded += 1
+        except RedisError as error:
+            self.error = str(error)
+        finally:
+            self.seconds = monotonic() - start
+            self._done.set()
+            self._ready.set()
+
+    def is_ready(self) -> bool:
+        """Check if warm-up completed or timed out.
+
+        :return: True if ready, otherwise False.
+        :rtype: bool
+        """
+        return self._ready.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait until ready.
+
+        :param timeout: Seconds to wait (default: None, forever).
+        :type timeout: float | None
+        :return: True if ready, otherwise False.
+        :rtype: bool
+        """
+        return self._ready.wait(timeout)
+
+    def get_stats(self) -> dict:
+        """Get warm-up statistics.
+
+        :return: Ready and done flags, urls loaded, duration in seconds (None if running) and error (if any).
+        :rtype: dict
+        """
+        return {'ready': self.is_ready(), 'done': self._done.is_set(), 'loaded': self.loaded,
+                'seconds': self.seconds, 'error': self.error}
+
+    def restart_in_child(self):
+        """Restart warm-up in a process forked while it was running (helper processes are skipped)."""
+        if not self._done.is_set() and not getattr(prewarm_state, 'skip', False):
+            self._done, self._ready = Event(), Event()
+            self.start()
+
+    def _ready_on_timeout(self):
+        """Report ready after timeout, even if warm-up is still running (timeout thread)."""
+        self._done.wait(self.timeout)
+        self._ready.set()
+
+
+warm_up = WarmUp()
+register_at_fork(after_in_child=warm_up.restart_in_child)
+
+
+def init_app(app: Flask) -> Flask:
+    """Initializes the application cache warm-up.
+
+    :param app: The Flask application instance.
+    :type app: Flask
+    :return: The Flask application instance.
+    :rtype: Flask
+    """
+    warm_up.size = app.config.get('URL_WARMUP_SIZE', 0)
+    warm_up.batch_size = app.config.get('URL_WARMUP_BATCH_SIZE', 500)
+    warm_up.timeout = app.config.get('URL_WARMUP_TIMEOUT', 10.0)
+    if warm_up.size > 0 and not app.config.get('URL_CACHE_TTL', 0):
+        app.logger.warning('URL_WARMUP_SIZE is set but URL_CACHE_TTL is 0: preloaded urls are served from the local '
+                           'cache only while Redis is down')
+    warm_up.start()
+    return app
@@ -10,6 +10,7 @@ from flask.testing import FlaskClient, FlaskCliRunner
 from pytest import fixture
 
 from shortipy import create_app
+from shortipy.services.health import health_probe
 from shortipy.services.redis import redis_client
 
 from tests import URL_KEY_TEST, URL_VALUE_TEST
@@ -32,6 +33,7 @@ def application() -> Generator[Flask, None, None]:
     try:
         yield __app
     finally:
+        health_probe.stop()
         with __app.app_context():
             redis_client.delete(URL_KEY_TEST)
 
@@ -2,13 +2,20 @@
 
 """tests.test_auth file."""
 
+from time import time
+
 from flask import Flask
 from flask.testing import FlaskCliRunner, FlaskClient
+from flask_jwt_extended import get_jti
 from pytest import raises
 
 from shortipy.services.exceptions import MethodVersionNotFound
-from shortipy.services.redis import redis_client
-from shortipy.services.auth import USER_KEYS_DOMAIN, insert_user, delete_user, normalize_input
+from shortipy.services.redis import add_listener, redis_client, redis_listeners
+from shortipy.services.auth import (
+    USER_KEYS_DOMAIN, API_KEY_FIELD_PREFIX, API_KEY_HEADER, REVOKED_TOKENS_KEY, insert_user, delete_user,
+    normalize_input, insert_api_key, get_api_keys, delete_api_key, verify_api_key, revocation_list, is_admin
+)
+from shortipy.services.hash import hash_pool
 
 from tests import USER_USERNAME, USER_PASSWORD, USER_PASSWORD_WRONG
 
@@ -126,6 +133,28 @@ def test_del_user(application: Flask, runner: FlaskCliRunner):
             redis_client.delete(f'{USER_KEYS_DOMAIN}:{USER_USERNAME}')
 
 
+def test_admin_user(application: Flask, runner: FlaskCliRunner):
+    """Test CLI new admin user and admin flag revoke.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param runner: Flask CLI Runner.
+    :type runner: FlaskCliRunner
+    """
+    runner.invoke(args=['users', 'new', '-u', USER_USERNAME, '-p', USER_PASSWORD, '--admin'])
+    try:
+        with application.app_context():
+            assert is_admin(USER_USERNAME)
+        result = runner.invoke(args=['users', 'admin', '-u', USER_USERNAME, '--revoke'])
+        assert 'Done.' in result.output
+        with application.app_context():
+            assert not is_admin(USER_USERNAME)
+            assert not is_admin(None)
+    finally:
+        with application.app_context():
+            delete_user(USER_USERNAME)
+
+
 def test_auth_list_api_post_wrong_method_version_not_found(application: Flask, client: FlaskClient):
     """Test AuthListAPI POST wrong: method version not found.
 
@@ -189,6 +218,45 @@ def test_auth_list_api_post_wrong_unauthorized(application: Flask, client: Flask
             redis_client.delete(f'{USER_KEYS_DOMAIN}:{USER_USERNAME}')
 
 
+def test_auth_list_api_post_wrong_unknown_user(application: Flask, client: FlaskClient):
+    """Test AuthListAPI POST wrong: unknown user (checked against the dummy hash, generated at initialization).
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    assert hash_pool._dummy_hash is not None  # pylint: disable=protected-access
+    with application.app_context():
+        redis_client.delete(f'{USER_KEYS_DOMAIN}:{USER_USERNAME}')
+    response = client.post('/api/auth/', json={'username': USER_USERNAME, 'password': USER_PASSWORD})
+    assert response.status_code == 401
+
+
+def test_auth_list_api_post_wrong_saturated(application: Flask, client: FlaskClient):
+    """Test AuthListAPI POST wrong: hash pool saturated (503).
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    with application.app_context():
+        insert_user(USER_USERNAME, USER_PASSWORD)
+    slots = hash_pool._slots  # pylint: disable=protected-access
+    acquired = 0
+    try:
+        while slots.acquire(blocking=False):  # pylint: disable=consider-using-with
+            acquired += 1
+        response = client.post('/api/auth/', json={'username': USER_USERNAME, 'password': USER_PASSWORD})
+        assert response.status_code == 503
+    finally:
+        for _ in range(acquired):
+            slots.release()
+        with application.app_context():
+            redis_client.delete(f'{USER_KEYS_DOMAIN}:{USER_USERNAME}')
+
+
 def test_auth_list_api_post(application: Flask, client: FlaskClient):
     """Test AuthListAPI POST.
 
@@ -207,3 +275,187 @@ def test_auth_list_api_post(application: Flask, client: FlaskClient):
     finally:
         with application.app_context():
             redis_client.delete(f'{USER_KEYS_DOMAIN}:{USER_USERNAME}')
+
+
+def test_api_key(application: Flask, client: FlaskClient):
+    """Test API key: issue, use and revoke.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    with application.app_context():
+        insert_user(USER_USERNAME, USER_PASSWORD)
+    try:
+        with application.app_context():
+            api_key = insert_api_key(USER_USERNAME)
+            key_id = api_key.split('.')[1]
+            assert get_api_keys(USER_USERNAME) == [key_id]
+            assert verify_api_key(api_key) == USER_USERNAME
+            assert verify_api_key(f'{api_key}x') is None
+            assert verify_api_key('invalid') is None
+        response = client.post('/api/urls/resolve', headers={API_KEY_HEADER: api_key}, json={'keys': ['x']})
+        assert response.status_code == 200
+        with application.app_context():
+            delete_api_key(USER_USERNAME, key_id)
+            assert verify_api_key(api_key) is None
+        response = client.post('/api/urls/resolve', headers={API_KEY_HEADER: api_key}, json={'keys': ['x']})
+        assert response.status_code == 401
+    finally:
+        with application.app_context():
+            redis_client.delete(f'{USER_KEYS_DOMAIN}:{USER_USERNAME}')
+
+
+def test_api_key_revoked_elsewhere(application: Flask):
+    """Test API key deleted by another process (key or user): cached key refused once the revocation list syncs.
+
+    :param application: Flask application.
+    :type application: Flask
+    """
+    revoked = [f'{API_KEY_FIELD_PREFIX}:{USER_USERNAME}']
+    with application.app_context():
+        redis_client.zrem(REVOKED_TOKENS_KEY, *revoked)
+        revocation_list.init_app(application)
+        insert_user(USER_USERNAME, USER_PASSWORD)
+        try:
+            api_key = insert_api_key(USER_USERNAME)
+            key_id = api_key.split('.')[1]
+            revoked.append(f'{API_KEY_FIELD_PREFIX}:{USER_USERNAME}.{key_id}')
+            assert verify_api_key(api_key) == USER_USERNAME
+            redis_client.hdel(f'{USER_KEYS_DOMAIN}:{USER_USERNAME}', f'{API_KEY_FIELD_PREFIX}:{key_id}')
+            assert verify_api_key(api_key) == USER_USERNAME
+            redis_client.zadd(REVOKED_TOKENS_KEY, {revoked[1]: time() + 60})
+            revocation_list.init_app(application)
+            assert verify_api_key(api_key) is None
+
+            api_key = insert_api_key(USER_USERNAME)
+            assert verify_api_key(api_key) == USER_USERNAME
+            redis_client.delete(f'{USER_KEYS_DOMAIN}:{USER_USERNAME}')
+            redis_client.zadd(REVOKED_TOKENS_KEY, {revoked[0]: time() + 60})
+            revocation_list.init_app(application)
+            assert verify_api_key(api_key) is None
+        finally:
+            redis_client.delete(f'{USER_KEYS_DOMAIN}:{USER_USERNAME}')
+            redis_client.zrem(REVOKED_TOKENS_KEY, *revoked)
+
+
+def test_revocation_list_sync(application: Flask):
+    """Test revocation list sync: read only, expired tokens left out (and dropped from Redis by revocations).
+
+    :param application: Flask application.
+    :type application: Flask
+    """
+    revoked = ['expired-jti', 'revoked-jti']
+    commands = []
+
+    def listener(command: str, _: float):
+        commands.append(command)
+
+    with application.app_context():
+        try:
+            redis_client.zadd(REVOKED_TOKENS_KEY, {revoked[0]: time() - 1})
+            revocation_list.init_app(application)
+            add_listener(listener)
+            try:
+                assert not revocation_list.is_revoked(revoked[0])
+            finally:
+                redis_listeners.remove(listener)
+            assert commands == ['ZRANGEBYSCORE']
+            assert redis_client.zscore(REVOKED_TOKENS_KEY, revoked[0]) is not None
+            revocation_list.revoke(revoked[1], time() + 60)
+            assert redis_client.zscore(REVOKED_TOKENS_KEY, revoked[0]) is None
+            assert revocation_list.is_revoked(revoked[1])
+        finally:
+            redis_client.zrem(REVOKED_TOKENS_KEY, *revoked)
+
+
+def test_api_key_wrong_user_not_found(application: Flask):
+    """Test API key wrong: user not found.
+
+    :param application: Flask application.
+    :type application: Flask
+    """
+    with application.app_context():
+        redis_client.delete(f'{USER_KEYS_DOMAIN}:{USER_USERNAME}')
+        with raises(Exception, match=f'User "{USER_USERNAME}" not found'):
+            insert_api_key(USER_USERNAME)
+
+
+def test_api_key_cli(application: Flask, runner: FlaskCliRunner):
+    """Test CLI API keys: new-key, keys and del-key.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param runner: Flask CLI Runner.
+    :type runner: FlaskCliRunner
+    """
+    with application.app_context():
+        insert_user(USER_USERNAME, USER_PASSWORD)
+    try:
+        result = runner.invoke(args=['users', 'new-key', '-u', USER_USERNAME])
+        api_key = result.output.split()[-1]
+        key_id = api_key.split('.')[1]
+        result = runner.invoke(args=['users', 'keys', '-u', USER_USERNAME])
+        assert result.output == f'{key_id}\n'
+        runner.invoke(args=['users', 'del-key', '-u', USER_USERNAME, '-i', key_id])
+        with application.app_context():
+            assert get_api_keys(USER_USERNAME) == []
+    finally:
+        with application.app_context():
+            redis_client.delete(f'{USER_KEYS_DOMAIN}:{USER_USERNAME}')
+
+
+def test_auth_refresh_api_post(application: Flask, client: FlaskClient):
+    """Test AuthRefreshAPI POST.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    with application.app_context():
+        insert_user(USER_USERNAME, USER_PASSWORD)
+    try:
+        response = client.post('/api/auth/', json={'username': USER_USERNAME, 'password': USER_PASSWORD})
+        access_token = response.json['auth']['access_token']
+        refresh_token = response.json['auth']['refresh_token']
+        response = client.post('/api/auth/refresh', headers={'Authorization': f'Bearer {access_token}'})
+        assert response.status_code == 422
+        response = client.post('/api/auth/refresh', headers={'Authorization': f'Bearer {refresh_token}'})
+        assert response.status_code == 200
+        assert response.json['auth']['username'] == USER_USERNAME
+        assert response.json['auth']['access_token'] != ''
+    finally:
+        with application.app_context():
+            redis_client.delete(f'{USER_KEYS_DOMAIN}:{USER_USERNAME}')
+
+
+def test_auth_list_api_delete(application: Flask, client: FlaskClient):
+    """Test AuthListAPI DELETE: revoked tokens are refused.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    with application.app_context():
+        insert_user(USER_USERNAME, USER_PASSWORD)
+    try:
+        response = client.post('/api/auth/', json={'username': USER_USERNAME, 'password': USER_PASSWORD})
+        access_token = response.json['auth']['access_token']
+        refresh_token = response.json['auth']['refresh_token']
+        response = client.delete('/api/auth/', headers={'Authorization': f'Bearer {access_token}'})
+        assert response.status_code == 204
+        response = client.delete('/api/auth/', headers={'Authorization': f'Bearer {refresh_token}'})
+        assert response.status_code == 204
+        response = client.get('/api/urls/', headers={'Authorization': f'Bearer {access_token}'})
+        assert response.status_code == 401
+        response = client.post('/api/auth/refresh', headers={'Authorization': f'Bearer {refresh_token}'})
+        assert response.status_code == 401
+        with application.app_context():
+            revocation_list.init_app(application)
+            assert revocation_list.is_revoked(get_jti(access_token))
+    finally:
+        with application.app_context():
+            redis_client.delete(f'{USER_KEYS_DOMAIN}:{USER_USERNAME}')
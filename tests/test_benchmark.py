@@ -0,0 +1,46 @@
+# coding=utf-8
+
+"""tests.test_benchmark file."""
+
+from json import loads
+
+from flask.testing import FlaskCliRunner
+
+from shortipy.services.redis import redis_client
+
+
+def test_bench(runner: FlaskCliRunner):
+    """Test bench CLI command: refused without a dedicated database, seeded links and benchmark user are removed
+    afterwards.
+
+    :param runner: Flask CLI runner.
+    :type runner: FlaskCliRunner
+    """
+    result = runner.invoke(args=['bench', '-l', '20', '-n', '5', '-o', 'json'])
+    assert result.exit_code != 0
+    assert '--redis-url' in result.output
+    keys = set(redis_client.keys('url:*'))
+    result = runner.invoke(args=['bench', '-l', '20', '-n', '5', '-o', 'json', '-r', runner.app.config['REDIS_URL']])
+    assert result.exception is None
+    results = loads(result.output.strip().splitlines()[-1])
+    assert results['backend'] == 'redis'
+    assert results['links'] == 20
+    for name in ('seed', 'resolve', 'insert', 'list', 'login'):
+        assert results[name]['per_second'] > 0
+    assert results['resolve']['p50_ms'] <= results['resolve']['p99_ms']
+    assert results['list']['urls'] >= 25
+    assert set(redis_client.keys('url:*')) == keys
+    assert not redis_client.keys('user:benchmark-*')
+
+
+def test_bench_fake(runner: FlaskCliRunner):
+    """Test bench CLI command against the in-process Redis stand-in.
+
+    :param runner: Flask CLI runner.
+    :type runner: FlaskCliRunner
+    """
+    result = runner.invoke(args=['bench', '-l', '10', '-n', '3', '-b', 'resolve', '--fake', '-o', 'json'])
+    assert result.exception is None
+    results = loads(result.output.strip().splitlines()[-1])
+    assert results['backend'] == 'fake'
+    assert set(results) == {'version', 'links', 'requests', 'seed', 'resolve', 'backend'}
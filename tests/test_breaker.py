@@ -0,0 +1,94 @@
+# coding=utf-8
+
+"""tests.test_breaker file."""
+
+from time import sleep
+
+from flask.testing import FlaskClient
+from pytest import MonkeyPatch, raises
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from shortipy.services import url as url_service
+from shortipy.services.breaker import BREAKER_CLOSED, BREAKER_OPEN, CircuitBreaker, CircuitOpenError
+from shortipy.services.url import url_breaker
+
+from tests import URL_KEY_TEST, URL_KEY_TEST_WRONG, URL_VALUE_TEST
+
+
+def fail():
+    """Simulate an unreachable backend."""
+    raise RedisConnectionError('Backend unreachable')
+
+
+def test_circuit_breaker():
+    """Test CircuitBreaker: opens after consecutive failures, fails fast, closes after a successful probe."""
+    breaker = CircuitBreaker()
+    breaker.failure_threshold = 2
+    breaker.reset_timeout = 0.05
+    for _ in range(2):
+        with raises(RedisConnectionError):
+            breaker.call(fail)
+    assert breaker.get_stats()['state'] == BREAKER_OPEN
+    with raises(CircuitOpenError):
+        breaker.call(lambda: 'value')
+
+    sleep(0.06)
+    with raises(RedisConnectionError):
+        breaker.call(fail)
+    assert breaker.get_stats() == {'state': BREAKER_OPEN, 'failures': 3, 'opened': 2, 'rejected': 1}
+
+    sleep(0.06)
+    assert breaker.call(lambda: 'value') == 'value'
+    assert breaker.get_stats()['state'] == BREAKER_CLOSED
+    assert breaker.get_stats()['failures'] == 0
+
+
+def test_circuit_breaker_other_errors():
+    """Test CircuitBreaker wrong: errors other than backend failures are not counted."""
+    breaker = CircuitBreaker()
+    breaker.failure_threshold = 1
+
+    def error():
+        raise ValueError('Not a backend failure')
+
+    with raises(ValueError):
+        breaker.call(error)
+    assert breaker.get_stats()['state'] == BREAKER_CLOSED
+
+
+def test_resolve_stale(client: FlaskClient, monkeypatch: MonkeyPatch):
+    """Test resolve while Redis is unreachable: last-known-good url is served, unknown ones fail fast.
+
+    :param client: Flask client.
+    :type client: FlaskClient
+    :param monkeypatch: Pytest monkeypatch.
+    :type monkeypatch: MonkeyPatch
+    """
+    assert client.get(f'/{URL_KEY_TEST}').location == URL_VALUE_TEST
+    monkeypatch.setattr(url_service, '_resolve_url', lambda key: fail())
+    url_breaker.failure_threshold = 2
+
+    for _ in range(3):
+        response = client.get(f'/{URL_KEY_TEST}')
+        assert response.status_code == 302
+        assert response.location == URL_VALUE_TEST
+    assert url_breaker.get_stats()['state'] == BREAKER_OPEN
+
+    response = client.get(f'/{URL_KEY_TEST_WRONG}')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] is not None
+
+
+def test_resolve_stale_max_age(client: FlaskClient, monkeypatch: MonkeyPatch):
+    """Test resolve while Redis is unreachable wrong: last-known-good url is too old.
+
+    :param client: Flask client.
+    :type client: FlaskClient
+    :param monkeypatch: Pytest monkeypatch.
+    :type monkeypatch: MonkeyPatch
+    """
+    assert client.get(f'/{URL_KEY_TEST}').status_code == 302
+    monkeypatch.setattr(url_service, '_resolve_url', lambda key: fail())
+    monkeypatch.setattr(url_service.url_cache, 'ttl', 0.0)
+    sleep(0.01)
+    assert client.get(f'/{URL_KEY_TEST}').status_code == 503
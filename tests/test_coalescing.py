@@ -0,0 +1,77 @@
+# coding=utf-8
+
+"""tests.test_coalescing file."""
+
+from threading import Event, Thread
+
+from flask import Flask
+from pytest import raises
+
+from shortipy.services.coalescing import SingleFlight
+from shortipy.services.url import url_flight, get_url_value
+
+from tests import URL_KEY_TEST, URL_VALUE_TEST
+
+
+def test_single_flight_collapse():
+    """Test SingleFlight: concurrent calls for the same key are collapsed."""
+    flight = SingleFlight()
+    started = Event()
+    release = Event()
+    results = []
+
+    def backend(value: str) -> str:
+        started.set()
+        release.wait(5)
+        return value
+
+    def call():
+        results.append(flight.run('key', backend, 'value'))
+
+    leader = Thread(target=call)
+    leader.start()
+    started.wait(5)
+    followers = [Thread(target=call) for _ in range(4)]
+    for follower in followers:
+        follower.start()
+    while flight.get_stats()['collapsed'] < 4:
+        pass
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert results == ['value'] * 5
+    assert flight.get_stats() == {'calls': 1, 'collapsed': 4, 'in_flight': 0}
+
+
+def test_single_flight_error():
+    """Test SingleFlight wrong: backend error is raised and the key released."""
+    flight = SingleFlight()
+
+    def backend():
+        raise ValueError('Backend error')
+
+    with raises(ValueError, match='Backend error'):
+        flight.run('key', backend)
+    assert flight.get_stats()['in_flight'] == 0
+    assert flight.run('key', lambda: 'value') == 'value'
+
+
+def test_single_flight_disabled():
+    """Test SingleFlight disabled: calls go straight to the backend."""
+    flight = SingleFlight()
+    flight.enabled = False
+    assert flight.run('key', lambda: 'value') == 'value'
+    assert flight.get_stats()['calls'] == 0
+
+
+def test_get_url_value_coalescing(application: Flask):
+    """Test get url value through the coalescing layer.
+
+    :param application: Flask application.
+    :type application: Flask
+    """
+    with application.app_context():
+        url_flight.reset_stats()
+        assert get_url_value(URL_KEY_TEST) == URL_VALUE_TEST
+        assert url_flight.get_stats()['calls'] == 1
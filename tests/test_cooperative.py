@@ -0,0 +1,50 @@
+# coding=utf-8
+
+"""tests.test_cooperative file."""
+
+from secrets import token_bytes
+
+from flask import Flask
+from pytest import raises
+
+from shortipy import create_app, create_resolver_app
+from shortipy.services.redis import redis_client
+from shortipy.services.auth import USER_KEYS_DOMAIN, insert_user
+from shortipy.services.hash import hash_pool
+
+from tests import USER_USERNAME, USER_PASSWORD
+
+
+def test_cooperative_mode_requires_gevent_patching():
+    """Test cooperative mode refused without gevent monkey patching (or without gevent)."""
+    options = {'TESTING': True, 'SECRET_KEY': token_bytes(32), 'COOPERATIVE_MODE': True}
+    with raises(Exception, match='gevent'):
+        create_app(options)
+    with raises(Exception, match='gevent'):
+        create_resolver_app(options)
+
+
+def test_hash_pool_offload(application: Flask):
+    """Test password checks run through the offload function (cooperative mode runs them off the gevent hub).
+
+    :param application: Flask application.
+    :type application: Flask
+    """
+    offloaded = []
+
+    def offload(function, *args):
+        offloaded.append(function.__name__)
+        return function(*args)
+
+    with application.app_context():
+        insert_user(USER_USERNAME, USER_PASSWORD)
+    hash_pool.offload = offload
+    try:
+        client = application.test_client()
+        assert client.post('/api/auth/', json={'username': USER_USERNAME, 'password': USER_PASSWORD}).status_code == 200
+        assert client.post('/api/auth/', json={'username': 'unknown', 'password': USER_PASSWORD}).status_code == 401
+        assert offloaded.count('check_password_hash') == 2
+    finally:
+        hash_pool.offload = None
+        with application.app_context():
+            redis_client.delete(f'{USER_KEYS_DOMAIN}:{USER_USERNAME}')
@@ -0,0 +1,105 @@
+# coding=utf-8
+
+"""tests.test_health file."""
+
+from time import sleep
+
+from flask.testing import FlaskClient
+
+from shortipy import create_resolver_app
+from shortipy.services.health import health_probe
+from shortipy.services.redis import add_listener, redis_listeners
+from shortipy.services.url import RESERVED_KEYS, generate_key, url_breaker
+
+
+def test_healthz(client: FlaskClient):
+    """Test liveness.
+
+    :param client: Flask client.
+    :type client: FlaskClient
+    """
+    response = client.get('/healthz')
+    assert response.status_code == 200
+    assert response.json == {'status': 'ok'}
+
+
+def test_readyz(client: FlaskClient):
+    """Test readiness: no Redis command is executed by the probe requests.
+
+    :param client: Flask client.
+    :type client: FlaskClient
+    """
+    assert client.get('/readyz').status_code == 200
+    commands = []
+
+    def listener(command: str, _: float):
+        commands.append(command)
+
+    add_listener(listener)
+    try:
+        for _ in range(5):
+            response = client.get('/readyz')
+            assert response.status_code == 200
+    finally:
+        redis_listeners.remove(listener)
+    assert response.json['status'] == 'ready'
+    assert set(response.json['checks']) == {'redis', 'breaker', 'warmup', 'pool'}
+    assert response.json['checks']['redis']['ok']
+    assert set(commands) <= {'PING'}  # Background probe only.
+
+
+def test_readyz_breaker_open(client: FlaskClient):
+    """Test readiness wrong: circuit breaker open.
+
+    :param client: Flask client.
+    :type client: FlaskClient
+    """
+    url_breaker.state = 'open'
+    try:
+        response = client.get('/readyz')
+    finally:
+        url_breaker.reset()
+    assert response.status_code == 503
+    assert response.json['status'] == 'not_ready'
+
+
+def test_readyz_redis_unreachable():
+    """Test readiness wrong: Redis unreachable."""
+    app = create_resolver_app({'TESTING': True, 'REDIS_URL': 'redis://127.0.0.1:1/0', 'REDIS_RETRIES': 0,
+                               'REDIS_SOCKET_CONNECT_TIMEOUT': 0.1, 'REDIS_POOL_PREWARM': 0})
+    try:
+        response = app.test_client().get('/readyz')
+        assert response.status_code == 503
+        assert response.json['checks']['redis']['error'] is not None
+    finally:
+        health_probe.stop()
+
+
+def test_health_probe_stop(client: FlaskClient):
+    """Test health probe stopped: no more pings in background, restarted by the next readiness check.
+
+    :param client: Flask client.
+    :type client: FlaskClient
+    """
+    health_probe.interval = 0.05
+    assert client.get('/readyz').status_code == 200
+    health_probe.stop()
+    commands = []
+
+    def listener(command: str, _: float):
+        commands.append(command)
+
+    add_listener(listener)
+    try:
+        sleep(0.2)
+        assert not commands
+        assert client.get('/readyz').status_code == 200
+        assert commands == ['PING']
+    finally:
+        redis_listeners.remove(listener)
+
+
+def test_generate_key_reserved():
+    """Test generated keys are never reserved."""
+    assert 'readyz' in RESERVED_KEYS
+    assert all(generate_key() not in RESERVED_KEYS for _ in range(100))
@@ -0,0 +1,95 @@
+# coding=utf-8
+
+"""tests.test_keyspace file."""
+
+from flask import Flask
+from flask.testing import FlaskCliRunner
+
+from shortipy.services.redis import redis_client
+from shortipy.services.metrics import collect_url_keyspace
+from shortipy.services.url import (
+    URL_KEY_LENGTH_KEY, URL_KEY_COUNTS_KEY, URL_KEY_ATTEMPTS_KEY, url_keyspace, insert_url, insert_urls, delete_urls
+)
+
+from tests import URL_KEY_TEST, URL_VALUE_TEST
+
+
+def test_keyspace_grow(application: Flask):
+    """Test key space: urls counted by key length and key length grown once occupancy crosses the threshold.
+
+    :param application: Flask application.
+    :type application: Flask
+    """
+    url_keys = []
+    with application.app_context():
+        redis_client.delete(URL_KEY_LENGTH_KEY, URL_KEY_COUNTS_KEY, URL_KEY_ATTEMPTS_KEY)
+        redis_client.set(url_keyspace.counted_key, 1)
+        url_keyspace.alphabet, url_keyspace.min_length, url_keyspace.max_length = 'ab', 2, 3
+        url_keyspace.grow_threshold, url_keyspace.sync_interval = 0.5, 0.0
+        try:
+            url_keys.extend(insert_urls([URL_VALUE_TEST, URL_VALUE_TEST]))
+            assert [len(url_key) for url_key in url_keys] == [2, 2]
+            # Keys generated again after a collision are generated after syncing the first insert.
+            assert url_keyspace.get_occupancy() < url_keyspace.grow_threshold
+            url_keys.append(insert_url(URL_VALUE_TEST))
+            assert len(url_keys[-1]) == 3
+            assert redis_client.get(URL_KEY_LENGTH_KEY) == '3'
+            assert url_keyspace.counts == {2: 2}
+            url_keyspace.sync()
+            assert url_keyspace.counts == {2: 2, 3: 1}
+            assert url_keyspace.get_occupancy() == 1 / 8
+            assert sum(url_keyspace.get_attempts().values()) == 3
+            samples = {(name, labels): value for name, labels, value in collect_url_keyspace()}
+            assert samples[('shortipy_url_keys', (('length', '3'),))] == 1
+            assert samples[('shortipy_url_key_length', ())] == 3
+            delete_urls(url_keys)
+            url_keyspace.sync()
+            assert url_keyspace.counts == {2: 0, 3: 0}
+        finally:
+            delete_urls(url_keys)
+            redis_client.delete(URL_KEY_LENGTH_KEY, URL_KEY_COUNTS_KEY, URL_KEY_ATTEMPTS_KEY)
+
+
+def test_keyspace_recount(application: Flask, runner: FlaskCliRunner):
+    """Test key space counts never recounted (e.g. after an upgrade): negative counts read as 0 until recounted.
+
+    :param application: Flask application (it sets the test url).
+    :type application: Flask
+    :param runner: Flask CLI Runner.
+    :type runner: FlaskCliRunner
+    """
+    with application.app_context():
+        redis_client.delete(URL_KEY_COUNTS_KEY, url_keyspace.counted_key)
+        redis_client.hset(URL_KEY_COUNTS_KEY, len(URL_KEY_TEST), -3)
+    try:
+        result = runner.invoke(args=['urls', 'stats', '-s', '1'])
+        assert 'never recounted' in result.output
+        assert url_keyspace.counts[len(URL_KEY_TEST)] == 0
+        result = runner.invoke(args=['urls', 'stats', '--recount', '-s', '1'])
+        assert 'never recounted' not in result.output
+        with application.app_context():
+            assert int(redis_client.hget(URL_KEY_COUNTS_KEY, len(URL_KEY_TEST))) >= 1
+            assert redis_client.get(url_keyspace.counted_key) == '1'
+    finally:
+        with application.app_context():
+            redis_client.delete(URL_KEY_COUNTS_KEY)
+
+
+def test_keyspace_stats(application: Flask, runner: FlaskCliRunner):
+    """Test CLI stats: urls recounted by key length and memory per url sampled.
+
+    :param application: Flask application (it sets the test url).
+    :type application: Flask
+    :param runner: Flask CLI Runner.
+    :type runner: FlaskCliRunner
+    """
+    try:
+        result = runner.invoke(args=['urls', 'stats', '--recount', '-s', '10'])
+        assert result.exit_code == 0
+        assert f'{len(URL_KEY_TEST)}: ' in result.output
+        assert 'Key length: 6 (alphabet of 26 characters)' in result.output
+        assert 'Memory per url: ' in result.output
+        assert ' of them in indexes ' in result.output
+    finally:
+        with application.app_context():
+            redis_client.delete(URL_KEY_COUNTS_KEY)
@@ -0,0 +1,116 @@
+# coding=utf-8
+
+"""tests.test_metrics file."""
+
+from json import dump
+from os import getpid, path
+from secrets import token_bytes
+
+from flask import Flask
+
+from shortipy import create_app, create_resolver_app
+from shortipy.services.metrics import METRICS_FILE_PREFIX, METRICS_ARCHIVE_FILE, metrics
+
+from tests import URL_KEY_TEST, URL_KEY_TEST_WRONG
+
+
+def create_metrics_app(options: dict | None = None) -> Flask:
+    """Create application with metrics enabled.
+
+    :param options: Additional options (default: None).
+    :type options: dict | None
+    :return: Flask application.
+    :rtype: Flask
+    """
+    metrics.reset()
+    return create_app({'TESTING': True, 'SECRET_KEY': token_bytes(32), 'METRICS_ENABLED': True, **(options or {})})
+
+
+def test_metrics(application: Flask):  # pylint: disable=unused-argument
+    """Test metrics endpoint: requests, Redis commands and pool.
+
+    :param application: Flask application (it sets the test url).
+    :type application: Flask
+    """
+    client = create_metrics_app().test_client()
+    assert client.get(f'/{URL_KEY_TEST}').status_code == 302
+    assert client.get(f'/{URL_KEY_TEST_WRONG}').status_code == 404
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert '# TYPE shortipy_requests_total counter' in text
+    assert 'shortipy_requests_total{endpoint="resolution.resolve",method="GET",status="302"} 1' in text
+    assert 'shortipy_requests_total{endpoint="resolution.resolve",method="GET",status="404"} 1' in text
+    assert 'shortipy_request_duration_seconds_bucket{endpoint="resolution.resolve",le="+Inf"} 2' in text
+    assert 'shortipy_request_duration_seconds_count{endpoint="resolution.resolve"} 2' in text
+    assert 'shortipy_redis_command_duration_seconds_count{command="MGET"}' in text
+    assert 'shortipy_redis_pool_connections{state="idle"}' in text
+    assert 'shortipy_url_breaker_state{state="closed"} 1' in text
+
+
+def test_metrics_multiprocess(application: Flask, tmp_path):  # pylint: disable=unused-argument
+    """Test metrics aggregation of multiple processes: exited processes snapshots are archived.
+
+    :param application: Flask application (it sets the test url).
+    :type application: Flask
+    :param tmp_path: Temporary directory.
+    """
+    client = create_metrics_app({'METRICS_MULTIPROCESS_DIR': str(tmp_path)}).test_client()
+    assert client.get(f'/{URL_KEY_TEST}').status_code == 302
+    with open(path.join(tmp_path, f'{METRICS_FILE_PREFIX}999999999.json'), 'w', encoding='utf8') as file:
+        dump({
+            'pid': 999999999,
+            'buckets': list(metrics.buckets),
+            'counters': [['shortipy_requests_total',
+                          [['endpoint', 'resolution.resolve'], ['method', 'GET'], ['status', '302']], 2]],
+            'histograms': [],
+            'gauges': [['shortipy_redis_pool_connections', [['state', 'idle']], 100]]
+        }, file)
+    for _ in range(2):
+        text = client.get('/metrics').get_data(as_text=True)
+        assert 'shortipy_requests_total{endpoint="resolution.resolve",method="GET",status="302"} 3' in text
+        assert 'shortipy_redis_pool_connections{state="idle"} 100' not in text
+        assert not path.exists(path.join(tmp_path, f'{METRICS_FILE_PREFIX}999999999.json'))
+        assert path.exists(path.join(tmp_path, METRICS_ARCHIVE_FILE))
+
+
+def test_metrics_multiprocess_reused_pid(application: Flask, tmp_path):  # pylint: disable=unused-argument
+    """Test metrics of an exited process with the same pid (reused): archived by the first flush, then closed.
+
+    :param application: Flask application (it sets the test url).
+    :type application: Flask
+    :param tmp_path: Temporary directory.
+    """
+    client = create_metrics_app({'METRICS_MULTIPROCESS_DIR': str(tmp_path), 'METRICS_FLUSH_INTERVAL': 0}).test_client()
+    metrics._pid = None  # pylint: disable=protected-access
+    with open(path.join(tmp_path, f'{METRICS_FILE_PREFIX}{getpid()}.json'), 'w', encoding='utf8') as file:
+        dump({
+            'pid': getpid(),
+            'buckets': list(metrics.buckets),
+            'counters': [['shortipy_requests_total',
+                          [['endpoint', 'resolution.resolve'], ['method', 'GET'], ['status', '302']], 5]],
+            'histograms': [],
+            'gauges': [['shortipy_url_shm_lookups_total', [['result', 'hit']], 7]]
+        }, file)
+    assert client.get(f'/{URL_KEY_TEST}').status_code == 302
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'shortipy_requests_total{endpoint="resolution.resolve",method="GET",status="302"} 6' in text
+    assert 'shortipy_url_shm_lookups_total{result="hit"} 7' in text
+    metrics.close()
+    metrics.reset()
+    assert not path.exists(path.join(tmp_path, f'{METRICS_FILE_PREFIX}{getpid()}.json'))
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'shortipy_requests_total{endpoint="resolution.resolve",method="GET",status="302"} 6' in text
+
+
+def test_metrics_disabled(application: Flask):
+    """Test metrics disabled by default.
+
+    :param application: Flask application.
+    :type application: Flask
+    """
+    assert application.test_client().get('/metrics').status_code == 404
+    assert create_resolver_app({'TESTING': True, 'METRICS_ENABLED': True}).test_client().get(
+        '/metrics').status_code == 200
@@ -0,0 +1,49 @@
+# coding=utf-8
+
+"""tests.test_profiling file."""
+
+from json import loads
+from logging import WARNING
+from secrets import token_bytes
+
+from flask import Flask
+
+from shortipy import create_app
+
+from tests import URL_KEY_TEST
+
+
+def test_server_timing(application: Flask):  # pylint: disable=unused-argument
+    """Test "Server-Timing" header.
+
+    :param application: Flask application (it sets the test url).
+    :type application: Flask
+    """
+    client = create_app({
+        'TESTING': True, 'SECRET_KEY': token_bytes(32), 'PROFILING_ENABLED': True, 'SERVER_TIMING_ENABLED': True
+    }).test_client()
+    response = client.get(f'/{URL_KEY_TEST}')
+    assert response.status_code == 302
+    timings = response.headers.getlist('Server-Timing')
+    assert timings[0].startswith('redis;desc="1 commands";dur=')
+    assert timings[1].startswith('app;dur=')
+
+
+def test_slow_request_log(application: Flask, caplog):  # pylint: disable=unused-argument
+    """Test slow request log.
+
+    :param application: Flask application (it sets the test url).
+    :type application: Flask
+    :param caplog: Log capture.
+    """
+    client = create_app({
+        'TESTING': True, 'SECRET_KEY': token_bytes(32), 'PROFILING_ENABLED': True, 'SLOW_REQUEST_THRESHOLD_MS': 0
+    }).test_client()
+    with caplog.at_level(WARNING):
+        response = client.get(f'/{URL_KEY_TEST}')
+    assert 'Server-Timing' not in response.headers
+    entry = loads(caplog.records[-1].getMessage().removeprefix('Slow request: '))
+    assert entry['endpoint'] == 'resolution.resolve'
+    assert entry['status'] == 302
+    assert entry['redis_commands'] == 1
+    assert entry['redis_slowest_command'] == 'MGET'
@@ -0,0 +1,134 @@
+# coding=utf-8
+
+"""tests.test_ratelimit file."""
+
+from secrets import token_bytes
+
+from flask import Flask
+
+from shortipy import create_app, create_resolver_app
+from shortipy.services.redis import redis_client
+from shortipy.services.auth import API_KEY_HEADER
+from shortipy.services.ratelimit import RATELIMIT_KEYS_DOMAIN
+
+from tests import URL_KEY_TEST, URL_VALUE_TEST
+
+
+def create_limited_app(capacity: int, rate: float, local_threshold: float, **options) -> Flask:
+    """Create application with rate limiting enabled on resolution.
+
+    :param capacity: Bucket capacity.
+    :type capacity: int
+    :param rate: Bucket refill rate.
+    :type rate: float
+    :param local_threshold: Local pre-check threshold.
+    :type local_threshold: float
+    :param options: Other application options.
+    :return: Flask application.
+    :rtype: Flask
+    """
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': token_bytes(32),
+        'RATELIMIT_ENABLED': True,
+        'RATELIMIT_LIMITS': {'resolution.resolve': (capacity, rate)},
+        'RATELIMIT_LOCAL_THRESHOLD': local_threshold,
+        **options
+    })
+    with app.app_context():
+        for key in redis_client.keys(f'{RATELIMIT_KEYS_DOMAIN}:*'):
+            redis_client.delete(key)
+        redis_client.set(f'url:{URL_KEY_TEST}', URL_VALUE_TEST)
+    return app
+
+
+def test_rate_limit_resolve():
+    """Test rate limit on resolve: over-limit clients get 429 and rate limit headers."""
+    client = create_limited_app(2, 0.01, 1.0).test_client()
+    for remaining in (1, 0):
+        response = client.get(f'/{URL_KEY_TEST}')
+        assert response.status_code == 302
+        assert response.headers['X-RateLimit-Limit'] == '2'
+        assert response.headers['X-RateLimit-Remaining'] == str(remaining)
+    response = client.get(f'/{URL_KEY_TEST}')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert response.headers['X-RateLimit-Remaining'] == '0'
+
+
+def test_rate_limit_local_pre_check():
+    """Test rate limit local pre-check: tokens taken locally are accounted with the next Redis call."""
+    app = create_limited_app(10, 0.01, 0.5)
+    client = app.test_client()
+    for _ in range(4):
+        assert client.get(f'/{URL_KEY_TEST}').status_code == 302
+    with app.app_context():
+        keys = redis_client.keys(f'{RATELIMIT_KEYS_DOMAIN}:*')
+        assert len(keys) == 1
+        assert round(float(redis_client.hget(keys[0], 'tokens'))) == 9
+    for _ in range(6):
+        assert client.get(f'/{URL_KEY_TEST}').status_code == 302
+    assert client.get(f'/{URL_KEY_TEST}').status_code == 429
+
+
+def test_rate_limit_unlimited(client):
+    """Test rate limit disabled by default.
+
+    :param client: Flask Client.
+    """
+    response = client.get(f'/{URL_KEY_TEST}')
+    assert response.status_code == 302
+    assert 'X-RateLimit-Limit' not in response.headers
+
+
+def test_rate_limit_invalid_api_keys():
+    """Test rate limit with invalid API keys: limited by IP address, even if rotated."""
+    client = create_limited_app(2, 0.01, 1.0).test_client()
+    statuses = [client.get(f'/{URL_KEY_TEST}', headers={API_KEY_HEADER: f'bogus-{index}'}).status_code
+                for index in range(4)]
+    assert statuses == [302, 302, 429, 429]
+
+
+def test_rate_limit_local_processes():
+    """Test rate limit local pre-check split by processes: each one admits its share of the tokens locally."""
+    app = create_limited_app(10, 0.01, 0.5, RATELIMIT_LOCAL_PROCESSES=2)
+    client = app.test_client()
+    for _ in range(4):
+        assert client.get(f'/{URL_KEY_TEST}').status_code == 302
+    with app.app_context():
+        keys = redis_client.keys(f'{RATELIMIT_KEYS_DOMAIN}:*')
+        assert round(float(redis_client.hget(keys[0], 'tokens'))) == 6
+
+
+def test_rate_limit_resolver():
+    """Test rate limit on the resolver application: limited by IP address, API keys are not looked up."""
+    app = create_resolver_app({
+        'TESTING': True,
+        'RATELIMIT_ENABLED': True,
+        'RATELIMIT_LIMITS': {'resolution.resolve': (2, 0.01)}
+    })
+    with app.app_context():
+        for key in redis_client.keys(f'{RATELIMIT_KEYS_DOMAIN}:*'):
+            redis_client.delete(key)
+    assert app.test_client().get(f'/{URL_KEY_TEST}', headers={API_KEY_HEADER: 'bogus'}).status_code == 302
+    with app.app_context():
+        assert redis_client.keys(f'{RATELIMIT_KEYS_DOMAIN}:*') == [
+            f'{RATELIMIT_KEYS_DOMAIN}:resolution.resolve:ip:127.0.0.1'
+        ]
+
+
+def test_rate_limit_redis_unavailable():
+    """Test rate limit with Redis unavailable: requests are admitted, without rate limit headers."""
+    app = create_resolver_app({
+        'TESTING': True,
+        'REDIS_URL': 'redis://127.0.0.1:1/0',
+        'REDIS_RETRIES': 0,
+        'REDIS_SOCKET_CONNECT_TIMEOUT': 0.1,
+        'REDIS_POOL_PREWARM': 0,
+        'RATELIMIT_ENABLED': True,
+        'RATELIMIT_LIMITS': {'resolution.resolve': (2, 0.01)}
+    })
+    for _ in range(3):
+        response = app.test_client().get(f'/{URL_KEY_TEST}')
+        assert response.status_code != 429
+        assert 'X-RateLimit-Limit' not in response.headers
@@ -0,0 +1,82 @@
+# coding=utf-8
+
+"""tests.test_redis file."""
+
+from os import close, fork, pipe, read, set_blocking, waitpid, write, _exit
+from threading import Thread
+from time import sleep
+
+from flask import Flask
+from pytest import MonkeyPatch
+from redis import BlockingConnectionPool
+
+from shortipy import create_app
+from shortipy.services import redis
+from shortipy.services.redis import redis_client, get_pool_stats, prewarm_pool, fork_without_prewarm
+
+
+def test_pool_prewarm(application: Flask):
+    """Test pool pre-warming: connections are opened at startup and left idle.
+
+    :param application: Flask application.
+    :type application: Flask
+    """
+    assert application.config['REDIS_POOL_PREWARM'] == 2
+    stats = get_pool_stats()
+    assert stats['idle'] >= 2
+    assert stats['in_use'] == 0
+
+
+def test_pool_prewarm_forked(application: Flask, monkeypatch: MonkeyPatch):
+    """Test pool pre-warming in forked processes: workers pre-warm, helper processes (e.g. the hash pool ones) do not.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param monkeypatch: Pytest monkeypatch.
+    :type monkeypatch: MonkeyPatch
+    """
+    assert application.config['REDIS_POOL_PREWARM'] == 2
+    reader, writer = pipe()
+    monkeypatch.setattr(redis, 'prewarm_pool', lambda *_: write(writer, b'x'))
+    try:
+        for forker in (fork, lambda: fork_without_prewarm(fork)):
+            pid = forker()
+            if pid == 0:
+                sleep(0.2)
+                _exit(0)
+            waitpid(pid, 0)
+        set_blocking(reader, False)
+        assert read(reader, 16) == b'x'
+    finally:
+        close(reader)
+        close(writer)
+
+
+def test_pool_prewarm_unreachable():
+    """Test pool pre-warming wrong: Redis unreachable, no connection opened and nothing raised."""
+    app = create_app({'TESTING': True, 'SECRET_KEY': 'test', 'REDIS_URL': 'redis://127.0.0.1:1/0',
+                      'REDIS_SOCKET_CONNECT_TIMEOUT': 0.1, 'REDIS_RETRIES': 0})
+    with app.app_context():
+        assert prewarm_pool(2) == 0
+
+
+def test_pool_bounded():
+    """Test bounded pool: waits for a free connection are counted."""
+    app = create_app({'TESTING': True, 'SECRET_KEY': 'test', 'REDIS_URL': 'redis://127.0.0.1:6379/0',
+                      'REDIS_MAX_CONNECTIONS': 1, 'REDIS_POOL_PREWARM': 1})
+    with app.app_context():
+        pool = redis_client.connection_pool
+        assert isinstance(pool, BlockingConnectionPool)
+        assert get_pool_stats() == {'in_use': 0, 'idle': 1, 'created': 1, 'max': 1, 'waits': 0, 'wait_seconds': 0.0}
+
+        thread = Thread(target=redis_client.blpop, args=('test_pool_bounded', 0.2))
+        thread.start()
+        sleep(0.05)
+        assert get_pool_stats()['in_use'] == 1
+        assert redis_client.ping()
+        thread.join(5)
+
+        stats = get_pool_stats()
+        assert stats['waits'] == 1
+        assert stats['wait_seconds'] > 0
+        assert stats['in_use'] == 0
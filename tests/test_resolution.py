@@ -2,8 +2,11 @@
 
 """tests.test_resolution file."""
 
+from flask import Flask
 from flask.testing import FlaskClient
 
+from shortipy.services.url import insert_url, update_url, delete_url, get_url_redirect
+
 from tests import URL_KEY_TEST, URL_KEY_TEST_WRONG, URL_VALUE_TEST
 
 
@@ -22,3 +25,59 @@ def test_resolve(client: FlaskClient):
     response_wrong = client.get(f'/{URL_KEY_TEST_WRONG}')  # follow_redirects=True
     assert response_wrong.status_code == 404
     # assert len(response_wrong.history) == 0
+
+
+def test_resolve_redirect_policy(application: Flask, client: FlaskClient):
+    """Test resolve with url redirect policy: redirect code and cache headers.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    with application.app_context():
+        url_key = insert_url(URL_VALUE_TEST, (301, 3600))
+    try:
+        response = client.get(f'/{url_key}')
+        assert response.status_code == 301
+        assert response.headers['Location'] == URL_VALUE_TEST
+        assert response.cache_control.public
+        assert response.cache_control.max_age == 3600
+
+        with application.app_context():
+            update_url(url_key, URL_VALUE_TEST, (307, None), keep_redirect=False)
+        response = client.get(f'/{url_key}')
+        assert response.status_code == 307
+        assert response.cache_control.max_age is None
+
+        with application.app_context():
+            update_url(url_key, URL_VALUE_TEST, None, keep_redirect=False)
+            assert get_url_redirect(url_key) is None
+        assert client.get(f'/{url_key}').status_code == 302
+    finally:
+        with application.app_context():
+            delete_url(url_key)
+            assert get_url_redirect(url_key) is None
+
+
+def test_purge_hook(application: Flask):
+    """Test purge hook: called after url update and delete.
+
+    :param application: Flask application.
+    :type application: Flask
+    """
+    purged = []
+    application.config['URL_PURGE_HOOK'] = purged.append
+    with application.app_context():
+        url_key = insert_url(URL_VALUE_TEST)
+        assert not purged
+        update_url(url_key, URL_VALUE_TEST)
+        delete_url(url_key)
+    assert purged == [url_key, url_key]
+
+    def failing_hook(_: str):
+        raise Exception('CDN unreachable')
+
+    application.config['URL_PURGE_HOOK'] = failing_hook
+    with application.app_context():
+        delete_url(insert_url(URL_VALUE_TEST))
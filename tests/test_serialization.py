@@ -0,0 +1,65 @@
+# coding=utf-8
+
+"""tests.test_serialization file."""
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from secrets import token_bytes
+
+from flask import Flask
+from markupsafe import Markup
+
+from shortipy import create_app
+from shortipy.controllers.api.url import UrlSchema
+from shortipy.services.serialization import OrJSONProvider
+
+from tests import URL_VALUE_TEST, URL_VALUE_BIS_TEST
+
+
+@dataclass
+class Point:
+    """Point class."""
+
+    x: int | float
+    y: int | float
+
+
+def test_orjson_provider(application: Flask):
+    """Test OrJSONProvider: same output of the default provider.
+
+    :param application: Flask application.
+    :type application: Flask
+    """
+    provider = OrJSONProvider(application)
+    for obj in (
+            {'urls': [{'key': 'abc', 'value': URL_VALUE_TEST, 'links': {'self': '/api/urls/abc'}}]},
+            {'b': 1, 'a': [None, True, 'x']},
+            {'unicode': 'città'},
+            {'date': datetime(2022, 10, 1, tzinfo=timezone.utc), 'markup': Markup('<b>'), 'point': Point(1, 2)},
+            {1: 'non string key'},
+            {'floats': [1.5, 0.001, 1e15], 'point': Point(0.5, 1e16)}
+    ):
+        for kwargs in ({}, {'separators': (',', ':')}, {'indent': 2}):
+            assert provider.dumps(obj, **kwargs) == application.json.dumps(obj, **kwargs)
+    floats = [1e16, 1e-07, float('nan'), float('inf')]
+    assert provider.dumps(floats, separators=(',', ':')) == '[1e16,1e-7,null,null]'
+    assert provider.dumps(floats) == application.json.dumps(floats)
+    assert provider.loads('{"a": [1, "b"]}') == {'a': [1, 'b']}
+
+
+def test_orjson_provider_app():
+    """Test OrJSONProvider set by configuration."""
+    app = create_app({'TESTING': True, 'SECRET_KEY': token_bytes(32), 'JSON_PROVIDER': 'orjson'})
+    assert isinstance(app.json, OrJSONProvider)
+
+
+def test_url_schema_dump_fast(application: Flask):
+    """Test UrlSchema fast dump: same output of UrlSchema(many=True).dump.
+
+    :param application: Flask application.
+    :type application: Flask
+    """
+    urls = {'abcdef': URL_VALUE_TEST, 'a b/c?d': URL_VALUE_BIS_TEST, 'città': URL_VALUE_TEST}
+    with application.test_request_context():
+        expected = UrlSchema(many=True).dump([{'key': key, 'value': value} for key, value in urls.items()])
+        assert application.json.dumps(UrlSchema.dump_fast(urls)) == application.json.dumps(expected)
@@ -0,0 +1,145 @@
+# coding=utf-8
+
+"""tests.test_shm file."""
+
+from time import time
+
+from flask import Flask
+from pytest import raises
+from redis.exceptions import RedisError
+
+from shortipy import create_app
+from shortipy.services.redis import redis_client
+from shortipy.services.shm import SharedUrlTable
+from shortipy.services.url import url_shm, insert_url, delete_url, refresh_shared_urls, follow_shared_urls
+
+from tests import URL_KEY_TEST, URL_VALUE_TEST, URL_VALUE_BIS_TEST
+
+
+def test_shared_url_table(tmp_path):
+    """Test SharedUrlTable: a reader sees the writer changes.
+
+    :param tmp_path: Temporary directory.
+    """
+    writer = SharedUrlTable()
+    writer.path, writer.slots, writer.slot_size = str(tmp_path / 'urls'), 8, 128
+    writer.create()
+    writer.beat()
+    reader = SharedUrlTable()
+    reader.path = writer.path
+
+    assert writer.set('first', URL_VALUE_TEST)
+    assert writer.set('second', URL_VALUE_BIS_TEST, (301, 60))
+    assert reader.get('first') == (URL_VALUE_TEST, None)
+    assert reader.get('second') == (URL_VALUE_BIS_TEST, (301, 60))
+    assert reader.get('third') is None
+
+    writer.delete('first')
+    assert writer.set('second', URL_VALUE_TEST, (308, None))
+    assert reader.get('first') is None
+    assert reader.get('second') == (URL_VALUE_TEST, (308, None))
+    assert reader.slots == 8
+    assert reader.get_stats() == {'mapped': True, 'hits': 3, 'misses': 2, 'stale': 0}
+
+    # Refresher gone (or out of sync with Redis): readers fall back to Redis.
+    writer.beat(time() - reader.max_age - 1)
+    assert reader.get('second') is None
+    assert reader.get_stats()['stale'] == 1
+    writer.beat()
+    assert reader.get('second') == (URL_VALUE_TEST, (308, None))
+
+
+def test_shared_url_table_wrong(tmp_path):
+    """Test SharedUrlTable wrong: missing file, too long values and full table.
+
+    :param tmp_path: Temporary directory.
+    """
+    reader = SharedUrlTable()
+    reader.path = str(tmp_path / 'missing')
+    assert reader.get('first') is None
+
+    writer = SharedUrlTable()
+    writer.path, writer.slots, writer.slot_size = str(tmp_path / 'urls'), 4, 64
+    writer.create()
+    assert not writer.set('first', 'x' * 64)
+    assert not writer.set('k' * 33, URL_VALUE_TEST[:16])
+    assert all(writer.set(key, URL_VALUE_TEST[:16]) for key in ('a', 'b', 'c'))
+    assert not writer.set('d', URL_VALUE_TEST[:16])
+
+
+def test_shm_refresh(application: Flask, tmp_path):
+    """Test shm-refresh CLI command and resolve from the shared-memory table.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param tmp_path: Temporary directory.
+    """
+    table_path = str(tmp_path / 'urls')
+    app = create_app({**application.config, 'URL_SHM_ENABLED': True, 'URL_SHM_PATH': table_path})
+    with app.app_context():
+        key = insert_url(URL_VALUE_BIS_TEST)
+    try:
+        result = app.test_cli_runner().invoke(args=['urls', 'shm-refresh', '--once'])
+        assert 'Loaded' in result.output
+        # Changed behind the table back: still served from it.
+        with app.app_context():
+            redis_client.set(f'url:{URL_KEY_TEST}', URL_VALUE_BIS_TEST)
+        client = app.test_client()
+        hits = url_shm.get_stats()['hits']
+        assert client.get(f'/{URL_KEY_TEST}').location == URL_VALUE_TEST
+        assert client.get(f'/{key}').location == URL_VALUE_BIS_TEST
+        assert url_shm.get_stats()['hits'] == hits + 2
+
+        writer = SharedUrlTable()
+        writer.path = table_path
+        writer.create()
+        writer.beat()
+        with app.app_context():
+            delete_url(key)
+            refresh_shared_urls(writer, [key, URL_KEY_TEST])
+        url_shm.close()
+        assert client.get(f'/{key}').status_code == 404
+        assert client.get(f'/{URL_KEY_TEST}').location == URL_VALUE_BIS_TEST
+    finally:
+        url_shm.close()
+        with app.app_context():
+            redis_client.delete(f'url:{key}')
+
+
+def test_follow_shared_urls_lost(tmp_path):
+    """Test shared-memory table refresher wrong: Redis lost, the error is raised (to reconnect) and no heartbeat.
+
+    :param tmp_path: Temporary directory.
+    """
+    app = create_app({'TESTING': True, 'SECRET_KEY': 'test', 'REDIS_URL': 'redis://127.0.0.1:1/0',
+                      'REDIS_SOCKET_CONNECT_TIMEOUT': 0.1, 'REDIS_POOL_PREWARM': 0})
+    writer = SharedUrlTable()
+    writer.path, writer.slots, writer.slot_size = str(tmp_path / 'urls'), 8, 128
+    writer.create()
+    reader = SharedUrlTable()
+    reader.path = writer.path
+    try:
+        with app.app_context(), raises(RedisError):
+            follow_shared_urls(writer, 300.0)
+        assert writer.set('first', URL_VALUE_TEST)
+        assert reader.get('first') is None
+        assert reader.get_stats()['stale'] == 1
+    finally:
+        writer.close()
+
+
+def test_url_changes_published(application: Flask):
+    """Test url writes are published on the url changes channel.
+
+    :param application: Flask application.
+    :type application: Flask
+    """
+    with application.app_context():
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe('url_changes')
+        pubsub.get_message(timeout=1.0)
+        key = insert_url(URL_VALUE_TEST)
+        delete_url(key)
+        messages = [pubsub.get_message(timeout=1.0) for _ in range(2)]
+        pubsub.close()
+    assert [message['data'] for message in messages] == [key, key]
@@ -9,9 +9,11 @@ from flask import Flask
 from flask.testing import FlaskCliRunner
 from pytest import raises
 
-from shortipy import CONFIG_FILENAME, VERSION, create_app
+from shortipy import CONFIG_FILENAME, VERSION, create_app, create_resolver_app
 from shortipy.services.config import Config
 
+from tests import URL_KEY_TEST, URL_VALUE_TEST
+
 
 def test_create_app(application: Flask):
     """Test factory and config.
@@ -41,6 +43,21 @@ def test_create_app(application: Flask):
                 rmdir(application.instance_path)
 
 
+def test_create_resolver_app(application: Flask):  # pylint: disable=unused-argument
+    """Test resolver factory: only the resolution (and health checks) are registered.
+
+    :param application: Flask application (it sets the test url).
+    :type application: Flask
+    """
+    resolver_app = create_resolver_app({'TESTING': True})
+    assert {rule.endpoint for rule in resolver_app.url_map.iter_rules()} == {
+        'static', 'resolution.resolve', 'health.healthz', 'health.readyz'
+    }
+    response = resolver_app.test_client().get(f'/{URL_KEY_TEST}')
+    assert response.status_code == 302
+    assert response.headers['Location'] == URL_VALUE_TEST
+
+
 def test_config(application: Flask):  # pylint: disable=too-many-branches
     """Test config.
 
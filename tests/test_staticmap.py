@@ -0,0 +1,127 @@
+# coding=utf-8
+
+"""tests.test_staticmap file."""
+
+from io import StringIO
+from os import listdir
+
+from flask import Flask
+from flask.testing import FlaskCliRunner
+
+from shortipy.services.redis import redis_client
+from shortipy.services.staticmap import StaticUrlMap, write_binary_map, write_nginx_map
+from shortipy.services.url import (
+    URL_CHANGELOG_KEY, URL_TOMBSTONES_KEY, URL_TOMBSTONES_FLOOR_KEY, insert_url, insert_urls, update_url, delete_url,
+    delete_urls, get_url_version
+)
+
+from tests import URL_KEY_TEST, URL_VALUE_TEST, URL_VALUE_BIS_TEST
+
+
+def test_static_map(tmp_path):
+    """Test binary table lookups and nginx map escaping.
+
+    :param tmp_path: Temporary directory.
+    """
+    entries = [(f'key{index:03}', f'https://example.com/{index}', 301 if index % 2 else 0, -1)
+               for index in range(100)]
+    filename = str(tmp_path / 'urls.bin')
+    assert write_binary_map(filename, reversed(entries), 7) == 100
+    with StaticUrlMap(filename) as static_map:
+        assert static_map.version == 7
+        assert list(static_map) == entries
+        assert all(static_map.get(entry[0]) == entry for entry in entries)
+        assert static_map.get('key100') is None
+        assert static_map.get('a') is None
+
+    file = StringIO()
+    assert write_nginx_map(file, [('key', 'https://example.com/?q="a b";$x', 308, 60)], 7) == 1
+    assert '    "/key" "https://example.com/?q=%22a%20b%22%3B%24x";\n' in file.getvalue()
+    assert '    "/key" 308;\n' in file.getvalue()
+
+
+def test_compile_map(application: Flask, runner: FlaskCliRunner, tmp_path):
+    """Test compile-map CLI command, full and incremental.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param runner: Flask CLI runner.
+    :type runner: FlaskCliRunner
+    :param tmp_path: Temporary directory.
+    """
+    output = str(tmp_path / 'map')
+    with application.app_context():
+        key = insert_url(URL_VALUE_TEST, (301, None))
+    try:
+        result = runner.invoke(args=['urls', 'compile-map', '-o', output])
+        assert result.exception is None
+        assert 'Compiled' in result.output
+        with StaticUrlMap(f'{output}/urls.bin') as static_map:
+            assert static_map.get(key) == (key, URL_VALUE_TEST, 301, -1)
+            assert static_map.get(URL_KEY_TEST) == (URL_KEY_TEST, URL_VALUE_TEST, 0, -1)
+        with open(f'{output}/urls.map', encoding='utf8') as file:
+            assert f'    "/{key}" "{URL_VALUE_TEST}";\n' in file.read()
+
+        with application.app_context():
+            update_url(key, URL_VALUE_BIS_TEST)
+            other = insert_url(URL_VALUE_TEST)
+            delete_url(other)
+        result = runner.invoke(args=['urls', 'compile-map', '-o', output, '--incremental'])
+        assert '(2 changed)' in result.output
+        with StaticUrlMap(f'{output}/urls.bin') as static_map:
+            assert static_map.get(key) == (key, URL_VALUE_BIS_TEST, 301, -1)
+            assert static_map.get(other) is None
+            assert static_map.get(URL_KEY_TEST) is not None
+        with open(f'{output}/urls.delta.map', encoding='utf8') as file:
+            delta = file.read()
+        assert f'    "/{key}" "{URL_VALUE_BIS_TEST}";\n' in delta
+        assert f'    "/{other}" "";\n' in delta
+        assert f'"/{URL_KEY_TEST}"' not in delta
+    finally:
+        with application.app_context():
+            delete_url(key)
+
+
+def test_compile_map_tombstones(application: Flask, runner: FlaskCliRunner, tmp_path):
+    """Test deleted urls: moved from the changelog to the capped tombstones, incremental compiles falling back
+    to full ones once tombstones they need were trimmed.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param runner: Flask CLI runner.
+    :type runner: FlaskCliRunner
+    :param tmp_path: Temporary directory.
+    """
+    output = str(tmp_path / 'map')
+    application.config['URL_TOMBSTONES_MAXLEN'] = 1
+    with application.app_context():
+        redis_client.delete(URL_TOMBSTONES_KEY, URL_TOMBSTONES_FLOOR_KEY)
+        keys = insert_urls([URL_VALUE_TEST, URL_VALUE_TEST, URL_VALUE_TEST])
+    try:
+        assert runner.invoke(args=['urls', 'compile-map', '-o', output]).exception is None
+        with application.app_context():
+            versions = [get_url_version(key) for key in keys]
+            assert len(set(versions)) == 3
+            delete_url(keys[0])
+            assert get_url_version(keys[0]) == 0
+            assert redis_client.zscore(URL_CHANGELOG_KEY, keys[0]) is None
+            assert redis_client.zscore(URL_TOMBSTONES_KEY, keys[0]) > max(versions)
+        result = runner.invoke(args=['urls', 'compile-map', '-o', output, '--incremental'])
+        assert '(1 changed)' in result.output
+
+        with application.app_context():
+            delete_url(keys[1])
+            delete_url(keys[2])
+            assert redis_client.zrange(URL_TOMBSTONES_KEY, 0, -1) == [keys[2]]
+            assert redis_client.get(URL_TOMBSTONES_FLOOR_KEY) is not None
+        result = runner.invoke(args=['urls', 'compile-map', '-o', output, '--incremental'])
+        compiled = result.output.split()[1]
+        assert f'({compiled} changed)' in result.output
+        with StaticUrlMap(f'{output}/urls.bin') as static_map:
+            assert all(static_map.get(key) is None for key in keys)
+        assert not [filename for filename in listdir(output) if filename.endswith('.tmp')]
+    finally:
+        application.config['URL_TOMBSTONES_MAXLEN'] = 100000
+        with application.app_context():
+            delete_urls(keys)
+            redis_client.delete(URL_TOMBSTONES_KEY, URL_TOMBSTONES_FLOOR_KEY)
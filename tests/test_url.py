@@ -2,14 +2,23 @@
 
 """tests.test_url file."""
 
+from datetime import datetime, timezone
+
 from flask import Flask
 from flask.testing import FlaskCliRunner, FlaskClient
+from pytest import MonkeyPatch
 
 from shortipy.services.exceptions import MethodVersionNotFound
 from shortipy.services.redis import redis_client
-from shortipy.services.url import URL_KEYS_DOMAIN, insert_url, delete_url
-
-from tests import URL_KEY_TEST, URL_VALUE_TEST, URL_VALUE_BIS_TEST
+from shortipy.services.auth import API_KEY_HEADER, set_admin
+from shortipy.services.url import (
+    URL_KEYS_DOMAIN, URL_CREATED_KEY, URL_OWNERS_KEY, USER_URLS_DOMAIN, URL_STREAM_KEY, URL_STREAM_TRIMMED_KEY,
+    insert_url, insert_urls, update_url, delete_url, delete_urls
+)
+from shortipy.services.urlchanges import get_url_changes
+from shortipy.services.urlindex import get_user_urls, search_urls
+
+from tests import URL_KEY_TEST, URL_KEY_TEST_WRONG, URL_VALUE_TEST, URL_VALUE_BIS_TEST, USER_USERNAME
 from tests.test_auth import Auth
 
 
@@ -236,7 +245,8 @@ def test_url_list_api_get(application: Flask, client: FlaskClient):
     """
     with application.app_context():
         redis_client.flushdb()
-        url_key = insert_url(URL_VALUE_TEST)
+        url_key = insert_url(URL_VALUE_TEST, owner=USER_USERNAME)
+        other_key = insert_url(URL_VALUE_BIS_TEST)
     try:
         with Auth(application, client) as access_token:
             response = client.get('/api/urls/', headers={'Authorization': f'Bearer {access_token}'})
@@ -245,9 +255,70 @@ def test_url_list_api_get(application: Flask, client: FlaskClient):
             assert response.json['urls'][0]['key'] == url_key
             assert response.json['urls'][0]['value'] == URL_VALUE_TEST
             assert response.json['urls'][0]['links']['self'] == f'/api/urls/{url_key}'
+            assert response.json['next_cursor'] is None
     finally:
         with application.app_context():
             delete_url(url_key)
+            delete_url(other_key)
+            assert redis_client.exists(f'{USER_URLS_DOMAIN}:{USER_USERNAME}') == 0
+
+
+def test_url_list_api_get_cursor(application: Flask, client: FlaskClient):
+    """Test UrlListAPI GET: caller's urls by cursor pagination, oldest first.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    url_keys = []
+    try:
+        with Auth(application, client) as access_token:
+            headers = {'Authorization': f'Bearer {access_token}'}
+            for _ in range(3):
+                response = client.post('/api/urls/', headers=headers, json={'value': URL_VALUE_TEST})
+                url_keys.append(response.json['url']['key'])
+            response = client.get('/api/urls/?count=2', headers=headers)
+            assert response.status_code == 200
+            assert [url['key'] for url in response.json['urls']] == url_keys[:2]
+            next_cursor = response.json['next_cursor']
+            response = client.get(f'/api/urls/?count=2&cursor={next_cursor}', headers=headers)
+            assert [url['key'] for url in response.json['urls']] == url_keys[2:]
+            assert response.json['next_cursor'] is None
+            assert client.get('/api/urls/?count=0', headers=headers).status_code == 422
+    finally:
+        with application.app_context():
+            for url_key in url_keys:
+                delete_url(url_key)
+
+
+def test_url_list_api_get_all(application: Flask, client: FlaskClient):
+    """Test UrlListAPI GET: all urls, page by page (scanned), administrators only.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    with application.app_context():
+        url_keys = [insert_url(URL_VALUE_TEST) for _ in range(5)]
+    try:
+        with Auth(application, client) as access_token:
+            headers = {'Authorization': f'Bearer {access_token}'}
+            assert client.get('/api/urls/?all=true', headers=headers).status_code == 403
+            with application.app_context():
+                set_admin(USER_USERNAME, True)
+            listed, cursor = [], 0
+            while cursor is not None:
+                response = client.get(f'/api/urls/?all=true&count=2&cursor={cursor}', headers=headers)
+                assert response.status_code == 200
+                listed.extend(url['key'] for url in response.json['urls'])
+                cursor = response.json['next_cursor']
+            assert set(url_keys + [URL_KEY_TEST]) <= set(listed)
+            assert len(listed) == len(set(listed))
+    finally:
+        with application.app_context():
+            delete_urls(url_keys)
 
 
 def test_url_api_get(application: Flask, client: FlaskClient):
@@ -315,6 +386,31 @@ def test_url_api_put_wrong_method_version_not_found(application: Flask, client:
             delete_url(url_key)
 
 
+def test_url_api_reserved_key(application: Flask, client: FlaskClient):
+    """Test UrlAPI with a reserved key (stored before it was reserved): not found, whatever the method.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    with application.app_context():
+        redis_client.set(f'{URL_KEYS_DOMAIN}:search', URL_VALUE_TEST)
+    try:
+        with Auth(application, client) as access_token:
+            headers = {'Authorization': f'Bearer {access_token}'}
+            assert client.get('/api/urls/search', headers=headers).status_code != 200
+            response = client.put('/api/urls/search', headers=headers, json={'value': URL_VALUE_BIS_TEST})
+            assert response.status_code == 404
+            assert client.delete('/api/urls/search', headers=headers).status_code == 404
+            assert client.get('/api/urls/healthz', headers=headers).status_code == 404
+            with application.app_context():
+                assert redis_client.get(f'{URL_KEYS_DOMAIN}:search') == URL_VALUE_TEST
+    finally:
+        with application.app_context():
+            redis_client.delete(f'{URL_KEYS_DOMAIN}:search')
+
+
 def test_url_api_put_wrong_missing(application: Flask, client: FlaskClient):
     """Test UrlAPI PUT wrong: missing value.
 
@@ -456,3 +552,436 @@ def test_url_api_delete(application: Flask, client: FlaskClient):
     finally:
         with application.app_context():
             redis_client.delete(f'{URL_KEYS_DOMAIN}:{url_key}')
+
+
+def test_url_resolve_api_post_wrong_unauthorized(client: FlaskClient):
+    """Test UrlResolveAPI POST wrong: unauthorized.
+
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    response = client.post('/api/urls/resolve', json={'keys': [URL_KEY_TEST]})
+    assert response.status_code == 401
+
+
+def test_url_resolve_api_post_wrong_empty(application: Flask, client: FlaskClient):
+    """Test UrlResolveAPI POST wrong: empty keys.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    with Auth(application, client) as access_token:
+        response = client.post('/api/urls/resolve', headers={'Authorization': f'Bearer {access_token}'},
+                               json={'keys': []})
+        assert response.status_code == 422
+
+
+def test_url_resolve_api_post(application: Flask, client: FlaskClient):
+    """Test UrlResolveAPI POST.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    with application.app_context():
+        url_key = insert_url(URL_VALUE_TEST)
+        url_key_bis = insert_url(URL_VALUE_BIS_TEST)
+    try:
+        with Auth(application, client) as access_token:
+            response = client.post('/api/urls/resolve', headers={'Authorization': f'Bearer {access_token}'},
+                                   json={'keys': [url_key, URL_KEY_TEST_WRONG, url_key_bis, url_key]})
+            assert response.status_code == 200
+            assert [url['key'] for url in response.json['urls']] == [url_key, URL_KEY_TEST_WRONG, url_key_bis]
+            assert response.json['urls'][0]['value'] == URL_VALUE_TEST
+            assert response.json['urls'][0]['links']['self'] == f'/api/urls/{url_key}'
+            assert response.json['urls'][1]['value'] is None
+            assert response.json['urls'][2]['value'] == URL_VALUE_BIS_TEST
+    finally:
+        with application.app_context():
+            delete_url(url_key)
+            delete_url(url_key_bis)
+
+
+def test_url_api_get_etag(application: Flask, client: FlaskClient):
+    """Test UrlAPI GET: ETag and conditional request.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    with application.app_context():
+        url_key = insert_url(URL_VALUE_TEST)
+    try:
+        with Auth(application, client) as access_token:
+            headers = {'Authorization': f'Bearer {access_token}'}
+            response = client.get(f'/api/urls/{url_key}', headers=headers)
+            etag = response.headers['ETag']
+            response = client.get(f'/api/urls/{url_key}', headers={**headers, 'If-None-Match': etag})
+            assert response.status_code == 304
+            assert response.headers['ETag'] == etag
+            client.put(f'/api/urls/{url_key}', headers=headers, json={'value': URL_VALUE_BIS_TEST})
+            response = client.get(f'/api/urls/{url_key}', headers={**headers, 'If-None-Match': etag})
+            assert response.status_code == 200
+            assert response.headers['ETag'] != etag
+            assert response.json['url']['value'] == URL_VALUE_BIS_TEST
+            with application.app_context():
+                delete_url(url_key)
+            for if_none_match in (etag, '"0"', '*'):
+                response = client.get(f'/api/urls/{url_key}', headers={**headers, 'If-None-Match': if_none_match})
+                assert response.status_code == 404
+    finally:
+        with application.app_context():
+            redis_client.delete(f'{URL_KEYS_DOMAIN}:{url_key}')
+
+
+def test_url_list_api_get_etag(application: Flask, client: FlaskClient):
+    """Test UrlListAPI GET: ETag and conditional request.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    with application.app_context():
+        url_key = insert_url(URL_VALUE_TEST, owner=USER_USERNAME)
+        other_key = insert_url(URL_VALUE_BIS_TEST, owner=USER_USERNAME)
+    try:
+        with Auth(application, client) as access_token:
+            headers = {'Authorization': f'Bearer {access_token}'}
+            etag = client.get('/api/urls/', headers=headers).headers['ETag']
+            response = client.get('/api/urls/', headers={**headers, 'If-None-Match': etag})
+            assert response.status_code == 304
+            assert {'Authorization', API_KEY_HEADER} <= set(response.vary)
+            with application.app_context():
+                set_admin(USER_USERNAME, True)
+            response = client.get('/api/urls/', headers={**headers, 'If-None-Match': etag}, query_string={'all': True})
+            assert response.status_code == 200
+            assert response.headers['ETag'] != etag
+            with application.app_context():
+                delete_url(url_key)
+            response = client.get('/api/urls/', headers={**headers, 'If-None-Match': etag})
+            assert response.status_code == 200
+            assert url_key not in [url['key'] for url in response.json['urls']]
+    finally:
+        with application.app_context():
+            redis_client.delete(f'{URL_KEYS_DOMAIN}:{url_key}')
+            delete_url(other_key)
+
+
+def test_url_created_api_get(application: Flask, client: FlaskClient):
+    """Test UrlCreatedAPI GET: urls by creation time range, order and cursor, administrators only.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    application.config['URL_CREATED_INDEX'] = True
+    with application.app_context():
+        redis_client.delete(URL_CREATED_KEY)
+        url_keys = [insert_url(URL_VALUE_TEST) for _ in range(3)]
+        created = redis_client.zscore(URL_CREATED_KEY, url_keys[1]) / 1000000
+    try:
+        with Auth(application, client) as access_token:
+            headers = {'Authorization': f'Bearer {access_token}'}
+            assert client.get('/api/urls/created', headers=headers).status_code == 403
+            with application.app_context():
+                set_admin(USER_USERNAME, True)
+            response = client.get('/api/urls/created?count=2', headers=headers)
+            assert response.status_code == 200
+            assert [url['key'] for url in response.json['urls']] == url_keys[:2]
+            next_cursor = response.json['next_cursor']
+            response = client.get(f'/api/urls/created?count=2&cursor={next_cursor}', headers=headers)
+            assert [url['key'] for url in response.json['urls']] == url_keys[2:]
+            assert response.json['next_cursor'] is None
+            response = client.get('/api/urls/created?order=desc', headers=headers)
+            assert [url['key'] for url in response.json['urls']] == url_keys[::-1]
+            since = datetime.fromtimestamp(created, timezone.utc).isoformat()
+            response = client.get('/api/urls/created', headers=headers, query_string={'since': since})
+            assert [url['key'] for url in response.json['urls']] == url_keys[1:]
+            assert response.json['urls'][0]['created'] == since
+            response = client.get('/api/urls/created', headers=headers, query_string={'until': since})
+            assert [url['key'] for url in response.json['urls']] == url_keys[:2]
+            with application.app_context():
+                delete_url(url_keys[0])
+                assert redis_client.zscore(URL_CREATED_KEY, url_keys[0]) is None
+            application.config['URL_CREATED_INDEX'] = False
+            assert client.get('/api/urls/created', headers=headers).status_code == 404
+    finally:
+        with application.app_context():
+            delete_urls(url_keys)
+
+
+def test_index_created(application: Flask, runner: FlaskCliRunner):
+    """Test CLI index-created: existing urls are added to the creation index, with their stream creation time.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param runner: Flask CLI Runner.
+    :type runner: FlaskCliRunner
+    """
+    with application.app_context():
+        redis_client.delete(URL_CREATED_KEY)
+        url_key = insert_url(URL_VALUE_TEST)
+    try:
+        result = runner.invoke(args=['urls', 'index-created'])
+        assert 'Done.' in result.output
+        with application.app_context():
+            assert redis_client.zscore(URL_CREATED_KEY, url_key) is not None
+            assert redis_client.zscore(URL_CREATED_KEY, url_key) % 1000 == 0
+            assert redis_client.zscore(URL_CREATED_KEY, URL_KEY_TEST) is not None
+    finally:
+        with application.app_context():
+            delete_url(url_key)
+            redis_client.delete(URL_CREATED_KEY)
+
+
+def test_index_owners(application: Flask, runner: FlaskCliRunner):
+    """Test CLI index-owners: urls without owner are assigned to the passed user (and listed), others are kept.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param runner: Flask CLI Runner.
+    :type runner: FlaskCliRunner
+    """
+    with application.app_context():
+        url_key = insert_url(URL_VALUE_TEST, owner=f'{USER_USERNAME}-other')
+    try:
+        result = runner.invoke(args=['urls', 'index-owners', '-o', USER_USERNAME])
+        assert 'Done.' in result.output
+        with application.app_context():
+            assert redis_client.hget(URL_OWNERS_KEY, URL_KEY_TEST) == USER_USERNAME
+            assert redis_client.hget(URL_OWNERS_KEY, url_key) == f'{USER_USERNAME}-other'
+            urls, _ = get_user_urls(USER_USERNAME)
+            assert urls[URL_KEY_TEST] == URL_VALUE_TEST
+            assert url_key not in urls
+        result = runner.invoke(args=['urls', 'index-owners', '-o', f'{USER_USERNAME}-other'])
+        assert 'Assigned 0 urls.' in result.output
+    finally:
+        with application.app_context():
+            delete_url(url_key)
+            redis_client.hdel(URL_OWNERS_KEY, URL_KEY_TEST)
+            redis_client.delete(f'{USER_URLS_DOMAIN}:{USER_USERNAME}')
+
+
+def test_url_search_api_get(application: Flask, client: FlaskClient):
+    """Test UrlSearchAPI GET: urls by domain and substring, kept up to date by writes, administrators only.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    application.config['URL_SEARCH_INDEX'] = True
+    with application.app_context():
+        url_keys = sorted([insert_url('https://docs.Example.com/Guide?page=1'), insert_url('https://example.com/'),
+                           insert_url('https://example.org/guide'), insert_url('https://user@notexample.com:8080/')])
+    try:
+        with Auth(application, client) as access_token:
+            headers = {'Authorization': f'Bearer {access_token}'}
+            assert client.get('/api/urls/search?domain=example.com', headers=headers).status_code == 403
+            with application.app_context():
+                set_admin(USER_USERNAME, True)
+            assert client.get('/api/urls/search', headers=headers).status_code == 422
+            assert client.get('/api/urls/search?q=ab', headers=headers).status_code == 422
+
+            def search(query: str) -> list[str]:
+                response = client.get(f'/api/urls/search?{query}', headers=headers)
+                return sorted(url['value'] for url in response.json['urls']) if response.status_code == 200 else []
+
+            assert search('domain=EXAMPLE.com') == ['https://docs.Example.com/Guide?page=1', 'https://example.com/']
+            assert search('domain=notexample.com') == ['https://user@notexample.com:8080/']
+            assert search('q=GUIDE') == ['https://docs.Example.com/Guide?page=1', 'https://example.org/guide']
+            assert search('domain=example.com&q=guide') == ['https://docs.Example.com/Guide?page=1']
+            assert search('q=missing') == []
+            response = client.get('/api/urls/search?domain=com&count=1', headers=headers)
+            assert response.status_code == 404
+            response = client.get('/api/urls/search?q=https&count=3', headers=headers)
+            assert [url['key'] for url in response.json['urls']] == url_keys[:3]
+            response = client.get(f'/api/urls/search?q=https&count=3&cursor={response.json["next_cursor"]}',
+                                  headers=headers)
+            assert [url['key'] for url in response.json['urls']] == url_keys[3:]
+            assert response.json['next_cursor'] is None
+            with application.app_context():
+                assert len(redis_client.keys('url_search:*')) == 2
+                update_url(url_keys[0], URL_VALUE_TEST)
+                update_url(url_keys[1], URL_VALUE_TEST)
+                for url_key in url_keys[2:]:
+                    delete_url(url_key)
+            assert search('q=guide') == []
+            assert search('q=coffeeperry') == [URL_VALUE_TEST, URL_VALUE_TEST]
+    finally:
+        with application.app_context():
+            delete_urls(url_keys)
+            assert redis_client.keys('url_domain:*') == []
+            redis_client.delete(*redis_client.keys('url_search:*'))
+
+
+def test_index_search(application: Flask, runner: FlaskCliRunner):
+    """Test CLI index-search: existing urls are added to the search index.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param runner: Flask CLI Runner.
+    :type runner: FlaskCliRunner
+    """
+    with application.app_context():
+        url_key = insert_url(URL_VALUE_TEST)
+    try:
+        result = runner.invoke(args=['urls', 'index-search'])
+        assert 'Done.' in result.output
+        with application.app_context():
+            urls, _ = search_urls('github.com')
+            assert urls[url_key] == URL_VALUE_TEST
+            assert urls[URL_KEY_TEST] == URL_VALUE_TEST
+    finally:
+        with application.app_context():
+            delete_url(url_key)
+            redis_client.delete(*redis_client.keys('url_domain:*'), *redis_client.keys('url_trigram:*'))
+
+
+def test_url_api_redirect_policy(application: Flask, client: FlaskClient):
+    """Test UrlListAPI POST and UrlAPI PUT/GET with redirect policy.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    url_key = ''
+    try:
+        with Auth(application, client) as access_token:
+            headers = {'Authorization': f'Bearer {access_token}'}
+            response = client.post('/api/urls/', headers=headers, json={'value': URL_VALUE_TEST, 'redirect_code': 303})
+            assert response.status_code == 422
+            response = client.post('/api/urls/', headers=headers,
+                                   json={'value': URL_VALUE_TEST, 'redirect_code': 301, 'max_age': 60})
+            assert response.status_code == 201
+            url_key = response.json['url']['key']
+            assert response.json['url']['redirect_code'] == 301
+            assert response.json['url']['max_age'] == 60
+            response = client.put(f'/api/urls/{url_key}', headers=headers, json={'value': URL_VALUE_BIS_TEST})
+            assert response.json['url']['redirect_code'] == 301
+            response = client.put(f'/api/urls/{url_key}', headers=headers,
+                                  json={'value': URL_VALUE_BIS_TEST, 'redirect_code': 308})
+            assert response.json['url']['redirect_code'] == 308
+            assert 'max_age' not in response.json['url']
+            response = client.get(f'/api/urls/{url_key}', headers=headers)
+            assert response.json['url']['redirect_code'] == 308
+    finally:
+        with application.app_context():
+            delete_url(url_key)
+
+
+def test_url_changes_api_get(application: Flask, client: FlaskClient):
+    """Test UrlChangesAPI GET: writes are appended to the change feed, in order.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask Client.
+    :type client: FlaskClient
+    """
+    with Auth(application, client) as access_token:
+        headers = {'Authorization': f'Bearer {access_token}'}
+        response = client.get('/api/urls/changes', headers=headers)
+        assert response.status_code == 403
+        with application.app_context():
+            set_admin(USER_USERNAME, True)
+        response = client.get('/api/urls/changes', headers=headers, query_string={'since': 'wrong'})
+        assert response.status_code == 422
+        response = client.get('/api/urls/changes', headers=headers, query_string={'count': 0})
+        assert response.status_code == 422
+
+        with application.app_context():
+            last = redis_client.xrevrange('url_stream', count=1)
+            since = last[0][0] if last else '0'
+            url_key = insert_url(URL_VALUE_TEST, (301, None))
+            update_url(url_key, URL_VALUE_BIS_TEST)
+            delete_url(url_key)
+        response = client.get('/api/urls/changes', headers=headers, query_string={'since': since})
+        assert response.status_code == 200
+        changes = response.json['changes']
+        assert [(change['op'], change['key']) for change in changes] == [
+            ('insert', url_key), ('update', url_key), ('delete', url_key)
+        ]
+        assert changes[0]['value'] == URL_VALUE_TEST
+        assert changes[0]['redirect_code'] == 301
+        assert changes[1]['value'] == URL_VALUE_BIS_TEST
+        assert changes[1]['redirect_code'] == 301
+        assert changes[2]['value'] is None
+        assert 'redirect_code' not in changes[2]
+        assert changes[0]['version'] < changes[1]['version'] < changes[2]['version']
+        assert response.json['last_id'] == changes[-1]['id']
+        assert not response.json['truncated']
+
+        response = client.get('/api/urls/changes', headers=headers,
+                              query_string={'since': response.json['last_id'], 'count': 10})
+        assert response.json['changes'] == []
+        response = client.get('/api/urls/changes', headers=headers, query_string={'since': '1-0'})
+        assert response.json['truncated']
+
+
+def test_url_changes_trimmed(application: Flask):
+    """Test url changes trimmed from the capped stream: truncated only if changes after the passed id were trimmed.
+
+    :param application: Flask application.
+    :type application: Flask
+    """
+    application.config['URL_STREAM_MAXLEN'] = 2
+    url_keys = []
+    with application.app_context():
+        redis_client.delete(URL_STREAM_KEY, URL_STREAM_TRIMMED_KEY)
+        try:
+            url_keys.extend(insert_urls([URL_VALUE_TEST, URL_VALUE_TEST]))
+            first, second = [change['id'] for change in get_url_changes()[0]]
+            url_keys.append(insert_url(URL_VALUE_TEST))
+            assert redis_client.xlen(URL_STREAM_KEY) == 2
+            assert redis_client.get(URL_STREAM_TRIMMED_KEY) == first
+            changes, truncated = get_url_changes(first)
+            assert [change['key'] for change in changes] == url_keys[1:]
+            assert not truncated
+            assert not get_url_changes(second)[1]
+            assert get_url_changes('1-0')[1]
+        finally:
+            application.config['URL_STREAM_MAXLEN'] = 100000
+            delete_urls(url_keys)
+            redis_client.delete(URL_STREAM_TRIMMED_KEY)
+
+
+def test_tail_urls(application: Flask, runner: FlaskCliRunner):
+    """Test tail CLI command.
+
+    :param application: Flask application.
+    :type application: Flask
+    :param runner: Flask CLI runner.
+    :type runner: FlaskCliRunner
+    """
+    with application.app_context():
+        last = redis_client.xrevrange('url_stream', count=1)
+        since = last[0][0] if last else '0'
+        url_key = insert_url(URL_VALUE_TEST)
+        delete_url(url_key)
+    result = runner.invoke(args=['urls', 'tail', '--since', since])
+    lines = result.output.strip().splitlines()
+    assert len(lines) == 2
+    assert f'"key": "{url_key}"' in lines[0]
+    assert '"op": "delete"' in lines[1]
+
+
+def test_tail_urls_follow_truncated(runner: FlaskCliRunner, monkeypatch: MonkeyPatch):
+    """Test tail CLI command exiting when the followed changes get trimmed from the stream.
+
+    :param runner: Flask CLI runner.
+    :type runner: FlaskCliRunner
+    :param monkeypatch: Pytest monkeypatch.
+    :type monkeypatch: MonkeyPatch
+    """
+    results = iter([([{'id': '1-0', 'op': 'delete', 'key': URL_KEY_TEST}], False), ([], True)])
+    monkeypatch.setattr('shortipy.services.urlchanges.get_url_changes', lambda *_: next(results))
+    result = runner.invoke(args=['urls', 'tail', '--since', '0', '--follow'])
+    assert result.exit_code == 1
+    assert f'"key": "{URL_KEY_TEST}"' in result.output
@@ -0,0 +1,141 @@
+# coding=utf-8
+
+"""tests.test_warmup file."""
+
+from os import close, fork, pipe, read, waitpid, write, _exit
+from time import sleep
+
+from flask import Flask
+from flask.testing import FlaskClient
+from pytest import LogCaptureFixture, MonkeyPatch
+
+from shortipy import create_resolver_app
+from shortipy.services.redis import redis_client
+from shortipy.services.hits import HitCounter
+from shortipy.services.url import URL_HITS_KEY, url_cache, url_hits
+from shortipy.services.warmup import WarmUp, warm_up
+
+from tests import URL_KEY_TEST, URL_KEY_TEST_WRONG, URL_VALUE_TEST, URL_VALUE_BIS_TEST
+
+
+def test_url_hits(application: Flask, client: FlaskClient):
+    """Test resolutions are counted in the hot keys sorted set, when flushed (by default only if warm-up is set).
+
+    :param application: Flask application.
+    :type application: Flask
+    :param client: Flask client.
+    :type client: FlaskClient
+    """
+    assert not url_hits.enabled
+    url_hits.enabled, url_hits.flush_interval = True, 0.2
+    try:
+        url_hits.flush()
+        redis_client.delete(URL_HITS_KEY)
+        for _ in range(3):
+            assert client.get(f'/{URL_KEY_TEST}').status_code == 302
+        assert client.get(f'/{URL_KEY_TEST_WRONG}').status_code == 404
+        assert redis_client.zscore(URL_HITS_KEY, URL_KEY_TEST) is None
+        sleep(0.5)
+        assert redis_client.zscore(URL_HITS_KEY, URL_KEY_TEST) == 3
+        assert url_hits.top(10) == [URL_KEY_TEST]
+    finally:
+        url_hits.stop()
+        url_hits.enabled, url_hits.flush_interval = False, application.config['URL_HITS_FLUSH_INTERVAL']
+        redis_client.delete(URL_HITS_KEY)
+
+
+def test_url_hits_decay(application: Flask):
+    """Test hit counts decay: scores multiplied by the decay factor, once per decay interval across processes.
+
+    :param application: Flask application.
+    :type application: Flask
+    """
+    counters = [HitCounter(URL_HITS_KEY), HitCounter(URL_HITS_KEY)]
+    with application.app_context():
+        redis_client.delete(URL_HITS_KEY, f'{URL_HITS_KEY}:decayed')
+        try:
+            redis_client.zadd(URL_HITS_KEY, {URL_KEY_TEST: 8, URL_KEY_TEST_WRONG: 2})
+            assert counters[0].decay()
+            assert not counters[1].decay()
+            assert redis_client.zscore(URL_HITS_KEY, URL_KEY_TEST) == 4
+            assert redis_client.zscore(URL_HITS_KEY, URL_KEY_TEST_WRONG) == 1
+            counters[1].decay_interval = 0.01
+            redis_client.delete(f'{URL_HITS_KEY}:decayed')
+            sleep(0.02)
+            counters[1].hit(URL_KEY_TEST_WRONG)
+            assert counters[1].flush() == 1
+            assert redis_client.zscore(URL_HITS_KEY, URL_KEY_TEST) == 2
+            assert counters[1].top(2) == [URL_KEY_TEST, URL_KEY_TEST_WRONG]
+        finally:
+            redis_client.delete(URL_HITS_KEY, f'{URL_HITS_KEY}:decayed')
+
+
+def test_warm_up(application: Flask):
+    """Test warm-up: most resolved urls are served from the local cache, without calling Redis.
+
+    :param application: Flask application.
+    :type application: Flask
+    """
+    with application.app_context():
+        redis_client.zadd(URL_HITS_KEY, {URL_KEY_TEST: 10, URL_KEY_TEST_WRONG: 5})
+    app = create_resolver_app({**application.config, 'URL_WARMUP_SIZE': 10, 'URL_CACHE_TTL': 60})
+    try:
+        assert warm_up.wait(5)
+        assert warm_up.get_stats()['loaded'] == 1
+        assert warm_up.get_stats()['error'] is None
+        assert url_cache.get(URL_KEY_TEST) == (URL_VALUE_TEST, None)
+
+        with app.app_context():
+            redis_client.set(f'url:{URL_KEY_TEST}', URL_VALUE_BIS_TEST)
+        assert app.test_client().get(f'/{URL_KEY_TEST}').location == URL_VALUE_TEST
+    finally:
+        with app.app_context():
+            redis_client.delete(URL_HITS_KEY)
+
+
+def test_warm_up_forked(monkeypatch: MonkeyPatch):
+    """Test warm-up in a worker forked while it runs (e.g. gunicorn with preload): restarted, so it gets ready.
+
+    :param monkeypatch: Pytest monkeypatch.
+    :type monkeypatch: MonkeyPatch
+    """
+    monkeypatch.setattr(warm_up, 'run', lambda: None)
+    monkeypatch.setattr(warm_up, 'size', 10)
+    monkeypatch.setattr(warm_up, 'timeout', 0.2)
+    reader, writer = pipe()
+    try:
+        warm_up.start()
+        pid = fork()
+        if pid == 0:
+            write(writer, b'1' if warm_up.wait(5) else b'0')
+            _exit(0)
+        waitpid(pid, 0)
+        assert read(reader, 1) == b'1'
+        assert warm_up.wait(5)
+    finally:
+        close(reader)
+        close(writer)
+        monkeypatch.undo()
+        warm_up.size = 0
+        warm_up.start()
+
+
+def test_warm_up_without_cache_ttl(application: Flask, caplog: LogCaptureFixture):
+    """Test warm-up without URL_CACHE_TTL: a warning is logged (preloaded urls are only served if Redis is down).
+
+    :param application: Flask application.
+    :type application: Flask
+    :param caplog: Log capture.
+    :type caplog: LogCaptureFixture
+    """
+    create_resolver_app({**application.config, 'URL_WARMUP_SIZE': 10, 'URL_CACHE_TTL': 0})
+    assert warm_up.wait(5)
+    assert 'URL_CACHE_TTL is 0' in caplog.text
+
+
+def test_warm_up_disabled():
+    """Test warm-up disabled: ready at once."""
+    disabled = WarmUp()
+    disabled.start()
+    assert disabled.is_ready()
+    assert disabled.get_stats() == {'ready': True, 'done': True, 'loaded': 0, 'seconds': None, 'error': None}